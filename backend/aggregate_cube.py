@@ -0,0 +1,101 @@
+from collections import Counter as _Counter
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+# ------------------------------------------------------------
+# Aggregate cube built at ingest
+# Document counts keyed by (partner, transaction_type, status, delayed,
+# expected-date month). Counting and group-by questions are answered from
+# the cube cells, so their cost depends on cardinality, not row count.
+# ------------------------------------------------------------
+
+CUBE_DIMENSIONS = ("partner", "transaction_type", "status", "delayed", "month")
+
+CellKey = Tuple[Optional[str], Any, Optional[str], bool, Optional[str]]
+
+
+def _iso_date(value: Optional[str]) -> Optional[date]:
+    # Dates arrive validated as "YYYY-MM-DD" or None (see edi_schema)
+    return date.fromisoformat(value) if value else None
+
+
+def is_row_delayed(status: Any, expected: Optional[date], actual: Optional[date]) -> bool:
+    """
+    Same rule CHECK_DELAY uses: delayed by dates or flagged delayed by status.
+    """
+    if status and status.lower() == "delayed":
+        return True
+    return bool(expected and actual and actual > expected)
+
+
+def _month_matches(month: Optional[str], wanted: str) -> bool:
+    # "2025-03" matches exactly, "2025" any month of that year and a bare
+    # "03" that month in any year
+    if month is None:
+        return False
+    if len(wanted) == 4:
+        return month[:4] == wanted
+    return month == wanted if len(wanted) > 2 else month[5:7] == wanted
+
+
+@dataclass(frozen=True)
+class AggregateCube:
+    cells: Dict[CellKey, int]
+
+    @property
+    def statuses(self) -> List[str]:
+        return sorted({k[2] for k in self.cells if k[2]})
+
+    def _select(
+        self,
+        partner: Optional[str] = None,
+        transaction_type: Any = None,
+        status: Optional[str] = None,
+        delayed: Optional[bool] = None,
+        month: Optional[str] = None,
+    ):
+        for key, count in self.cells.items():
+            p, t, s, d, m = key
+            if partner is not None and p != partner:
+                continue
+            if transaction_type is not None and t != transaction_type:
+                continue
+            if status is not None and s != status:
+                continue
+            if delayed is not None and d != delayed:
+                continue
+            if month is not None and not _month_matches(m, month):
+                continue
+            yield key, count
+
+    def count(self, **filters: Any) -> int:
+        return sum(count for _, count in self._select(**filters))
+
+    def group(self, by: str, **filters: Any) -> List[Tuple[Any, int]]:
+        """
+        Counts per value of one dimension, largest first.
+        """
+        pos = CUBE_DIMENSIONS.index(by)
+        totals: _Counter = _Counter()
+        for key, count in self._select(**filters):
+            totals[key[pos]] += count
+        return sorted(totals.items(), key=lambda kv: (-kv[1], str(kv[0])))
+
+
+def build_aggregate_cube(
+    partners: List[Any],
+    transaction_types: List[Any],
+    statuses: List[Any],
+    expected_dates: List[Any],
+    actual_dates: List[Any],
+    canonical_partner=None,
+) -> AggregateCube:
+    cells: _Counter = _Counter()
+    for p, t, s, exp, act in zip(partners, transaction_types, statuses, expected_dates, actual_dates):
+        partner = canonical_partner(p) if canonical_partner else p
+        status = s.lower() if s else None
+        exp_date = _iso_date(exp)
+        month = exp_date.isoformat()[:7] if exp_date else None
+        cells[(partner, t, status, is_row_delayed(s, exp_date, _iso_date(act)), month)] += 1
+    return AggregateCube(cells=dict(cells))
@@ -1,10 +1,67 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
 import requests
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+from .metrics import Counter, stage
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL = "mistral"
+PROMPT_VERSION = 1   # bump with any prompt change; persisted explanations are keyed by it
+# Explanations depend only on the facts text; failed calls are never cached
+EXPLAIN_CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", "1024"))
+
+LLM_CALLS = Counter(
+    "edi_llm_calls_total",
+    "Explanation requests by outcome (ok, fallback, skipped).",
+    ("outcome",),
+)
+EXPLAIN_CACHE_LOOKUPS = Counter(
+    "edi_explain_cache_lookups_total",
+    "Live explanation cache lookups by result (hit, precomputed hit, miss).",
+    ("result",),
+)
+
+_explanations = OrderedDict()   # facts → (explanation, warmed by precomputation)
+_explanations_lock = Lock()
+
+
+def cached_explanation(facts: str) -> Optional[str]:
+    with _explanations_lock:
+        hit = _explanations.get(facts)
+    return hit[0] if hit is not None else None
+
+
+def clear_explanation_cache():
+    with _explanations_lock:
+        _explanations.clear()
 
 
-def explain_facts(facts: str) -> str:
+def explanation_entries() -> list:
+    # [facts, explanation, precomputed], least recently used first
+    with _explanations_lock:
+        return [[facts, text, precomputed] for facts, (text, precomputed) in _explanations.items()]
+
+
+def load_explanations(entries) -> int:
+    for facts, text, precomputed in entries:
+        _remember(facts, text, bool(precomputed))
+    return len(entries)
+
+
+def _remember(facts: str, explanation: str, precomputed: bool) -> None:
+    if EXPLAIN_CACHE_SIZE <= 0:
+        return
+    with _explanations_lock:
+        _explanations[facts] = (explanation, precomputed)
+        _explanations.move_to_end(facts)
+        while len(_explanations) > EXPLAIN_CACHE_SIZE:
+            _explanations.popitem(last=False)
+
+
+def explain_facts(facts: str, precompute: bool = False, use_cache: bool = True) -> str:
     """
     AI explanation layer (STRICT + SAFE MODE).
 
@@ -17,6 +74,7 @@ def explain_facts(facts: str) -> str:
 
     # 🚨 EARLY EXIT FOR SYSTEM MESSAGES (NO AI CALL)
     if not facts:
+        LLM_CALLS.inc(outcome="skipped")
         return facts
 
     lower_facts = facts.lower().strip()
@@ -25,8 +83,22 @@ def explain_facts(facts: str) -> str:
         or lower_facts.startswith("unsupported")
         or lower_facts.startswith("no edi data")
     ):
+        LLM_CALLS.inc(outcome="skipped")
         return facts
 
+    # Cached explanation (live traffic or idle-time precomputation); the
+    # model warm-up passes use_cache=False so it always reaches the LLM
+    hit = None
+    if use_cache:
+        with _explanations_lock:
+            hit = _explanations.get(facts)
+            if hit is not None:
+                _explanations.move_to_end(facts)
+        if not precompute:
+            EXPLAIN_CACHE_LOOKUPS.inc(result="miss" if hit is None else "precomputed" if hit[1] else "hit")
+    if hit is not None:
+        return hit[0]
+
     # -----------------------------
     # AI PROMPT (ONLY FOR REAL DATA)
     # -----------------------------
@@ -68,25 +140,29 @@ Rewrite the above facts into a clear, neutral explanation.
 """
 
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "top_p": 0.9
-                }
-            },
-            timeout=20
-        )
+        with stage("explain"):
+            response = requests.post(
+                OLLAMA_URL,
+                json={
+                    "model": MODEL,
+                    "prompt": prompt,
+                    "stream": False,
+                    "options": {
+                        "temperature": 0.1,
+                        "top_p": 0.9
+                    }
+                },
+                timeout=20
+            )
 
         response.raise_for_status()
         data = response.json()
         explanation = data.get("response")
 
         if explanation and explanation.strip():
+            LLM_CALLS.inc(outcome="ok")
+            if use_cache:
+                _remember(facts, explanation.strip(), precompute)
             return explanation.strip()
 
     except Exception:
@@ -94,4 +170,5 @@ Rewrite the above facts into a clear, neutral explanation.
         pass
 
     # ✅ FINAL SAFETY FALLBACK
+    LLM_CALLS.inc(outcome="fallback")
     return facts
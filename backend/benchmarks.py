@@ -0,0 +1,384 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+from .synthetic_data import SyntheticConfig, generate_csv, generate_x12, partner_names
+
+# ------------------------------------------------------------
+# Backend benchmark suite
+# Usage:
+#   python -m backend.benchmarks --sizes 10000 100000 1000000 --out bench.json
+#   python -m backend.benchmarks --sizes 10000 --compare bench.json
+# The Ollama call is replaced by an identity function unless --with-llm
+# is given, so the numbers measure the backend and not the model server.
+# ------------------------------------------------------------
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_REPEAT = 5
+EMBEDDING_BENCH_DIM = 384               # MiniLM-L6
+EMBEDDING_BENCH_MAX_VECTORS = 250_000   # bytes scale linearly; per-million figures are projected
+EMBEDDING_BENCH_QUERIES = 50
+EMBEDDING_BENCH_TOP_K = 10
+
+
+def _time_call(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    p95_idx = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+    return {
+        "runs": len(samples),
+        "min_s": samples[0],
+        "median_s": statistics.median(samples),
+        "p95_s": samples[p95_idx],
+        "mean_s": statistics.fmean(samples),
+    }
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _embedding_store_bench(size: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """
+    Memory, top-k recall against float32 and scoring throughput of each
+    EMBEDDING_PRECISION, on clustered unit vectors shaped like MiniLM's.
+    """
+    import numpy as np
+
+    from .embeddings import EMBEDDING_PRECISIONS, quantize
+
+    n = min(size, EMBEDDING_BENCH_MAX_VECTORS)
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((256, EMBEDDING_BENCH_DIM)).astype(np.float32)
+    matrix = centers[rng.integers(0, len(centers), n)]
+    matrix += 0.8 * rng.standard_normal(matrix.shape).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    queries = matrix[rng.integers(0, n, EMBEDDING_BENCH_QUERIES)]
+    queries = queries + 0.5 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(EMBEDDING_BENCH_DIM)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    k = min(EMBEDDING_BENCH_TOP_K, n)
+
+    def _top(scores):
+        return set(np.argpartition(-scores, k - 1)[:k].tolist())
+
+    # The representation embeddings.py started from: one Python float per dimension
+    sample = matrix[:1000].tolist()
+    list_bytes = sum(sys.getsizeof(v) + sum(sys.getsizeof(x) for x in v) for v in sample) / len(sample)
+
+    exact = None
+    out: Dict[str, Any] = {
+        "vectors": n,
+        "dim": EMBEDDING_BENCH_DIM,
+        "top_k": k,
+        "python_lists_mb_per_million": list_bytes * 1e6 / 2**20,
+    }
+    for precision in EMBEDDING_PRECISIONS:
+        store = quantize(matrix, precision)
+        tops = [_top(store.dot(q)) for q in queries]
+        if exact is None:
+            exact = tops
+        timing = _time_call(lambda: store.dot(queries[0]), repeat)
+        out[precision] = {
+            "mb": store.nbytes / 2**20,
+            "mb_per_million": store.nbytes / n * 1e6 / 2**20,
+            "recall_at_k": float(np.mean([len(t & e) / k for t, e in zip(tops, exact)])),
+            "score": timing,
+            "vectors_per_s": n / timing["median_s"],
+        }
+        del store
+    return out
+
+
+def _dataset_path(data_dir: str, config: SyntheticConfig) -> str:
+    name = f"edi_{config.rows}_p{config.partners}_s{config.seed}.csv"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        generate_csv(path, config)
+    return path
+
+
+def _x12_path(data_dir: str, config: SyntheticConfig) -> str:
+    name = f"edi_{config.rows}_p{config.partners}_s{config.seed}.x12"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        generate_x12(path, config)
+    return path
+
+
+def _intent_questions(config: SyntheticConfig) -> Dict[str, str]:
+    partner = partner_names(max(1, config.partners))[0]
+    return {
+        "GET_STATUS": "what's the status of PO1001",
+        "CHECK_DELAY": "is PO1001 delayed",
+        "CHECK_DELAY_ALL": "show delayed items",
+        "CHECK_OVERDUE": "which invoices are past due",
+        "GET_LIFECYCLE": "lifecycle of PO1001",
+        "FILTER_BY_PARTNER": f"show documents from {partner}",
+        "CHECK_COMPLETION": "is PO1001 complete",
+        "LIST_DOCUMENTS": "list all invoices",
+        "DATE_WINDOW": "ASNs expected between May 1 and May 3",
+        "UNKNOWN": "1001",
+    }
+
+
+def run_size(size: int, data_dir: str, repeat: int, partners: int, seed: int) -> Dict[str, Any]:
+    from . import ingest_jobs, intent_router, lifecycle_routes, main, rag_service
+
+    config = SyntheticConfig(rows=size, partners=partners, seed=seed)
+    path = _dataset_path(data_dir, config)
+    result: Dict[str, Any] = {"rows": size, "file_bytes": os.path.getsize(path)}
+
+    # ---------------- X12 ingest ----------------
+    # Runs first so the CSV ingest below is the dataset the query timings use
+    from .x12_parser import iter_x12_chunks
+
+    x12_path = _x12_path(data_dir, config)
+    x12_mb = os.path.getsize(x12_path) / (1024 * 1024)
+
+    def _parse_x12():
+        with open(x12_path, "rb") as fh:
+            for _ in iter_x12_chunks(fh):
+                pass
+
+    parse_stats = _time_call(_parse_x12, max(1, min(repeat, 3)))
+    t0 = time.perf_counter()
+    ingest_jobs.ingest_path_inline(x12_path)
+    x12_ingest_s = time.perf_counter() - t0
+    result["x12"] = {
+        "file_mb": x12_mb,
+        "parse": parse_stats,
+        "parse_mb_per_s": x12_mb / parse_stats["median_s"],
+        "ingest_s": x12_ingest_s,
+        "ingest_mb_per_s": x12_mb / x12_ingest_s,
+    }
+
+    # ---------------- ingest ----------------
+    ingest_runs = max(1, min(repeat, 3))
+    job = None
+    samples = []
+    for _ in range(ingest_runs):
+        t0 = time.perf_counter()
+        job = ingest_jobs.ingest_path_inline(path)
+        samples.append(time.perf_counter() - t0)
+    result["ingest"] = {
+        "total_s": statistics.median(samples),
+        "runs": ingest_runs,
+        "stages_s": job.timings if job else {},
+        "rows_per_s": size / statistics.median(samples) if samples else None,
+    }
+
+    # ---------------- classify_intent ----------------
+    questions = _intent_questions(config)
+    t0 = time.perf_counter()
+    intent_router._ensure_exemplar_embeddings()
+    result["classify_model_load_s"] = time.perf_counter() - t0
+
+    def _cold():
+        with intent_router._cache_lock:
+            intent_router._intent_cache.clear()
+        for q in questions.values():
+            intent_router.classify_intent(q)
+
+    def _warm():
+        for q in questions.values():
+            intent_router.classify_intent(q)
+
+    n_q = len(questions)
+    cold = _time_call(_cold, repeat)
+    _warm()
+    warm = _time_call(_warm, repeat)
+    result["classify_intent"] = {
+        "cold_per_question": {k: v / n_q if k.endswith("_s") else v for k, v in cold.items()},
+        "warm_per_question": {k: v / n_q if k.endswith("_s") else v for k, v in warm.items()},
+    }
+
+    # ---------------- answer_question per intent ----------------
+    # Classification is warm here, so each timing is query execution + facts
+    answers: Dict[str, Any] = {}
+    for label, q in questions.items():
+        routed = intent_router.classify_intent(q)["intent"]
+        stats = _time_call(
+            lambda q=q: main.answer_question(question=q, rows=main.edi_rows, indexes=main.edi_indexes),
+            repeat,
+        )
+        stats["routed_intent"] = routed
+        answers[label] = stats
+    result["answer_question"] = answers
+
+    # Facts size for list-style answers: bounded by FACT_TOKEN_BUDGET, not rows
+    from .result_sets import estimate_tokens
+
+    result["fact_tokens"] = {
+        label: estimate_tokens(rag_service._answer_routed(
+            q, main.edi_rows, **intent_router.classify_intent(q), indexes=main.edi_indexes, explain=lambda f: f
+        ))
+        for label, q in questions.items()
+        if label in ("CHECK_DELAY_ALL", "CHECK_OVERDUE", "FILTER_BY_PARTNER", "LIST_DOCUMENTS", "DATE_WINDOW")
+    }
+
+    # ---------------- date windows ----------------
+    # Index lookups only: cost follows the window's row count, not the dataset
+    dates = main.edi_indexes.dates
+    windows = {
+        "day": (date(2025, 5, 1), date(2025, 5, 1)),
+        "week": (date(2025, 5, 1), date(2025, 5, 7)),
+        "quarter": (date(2025, 4, 1), date(2025, 6, 30)),
+    }
+    result["date_window"] = {
+        label: {
+            "rows": dates.count("expected_date", lo, hi),
+            "all_types": _time_call(lambda lo=lo, hi=hi: dates.range("expected_date", lo, hi), repeat),
+            "one_type": _time_call(lambda lo=lo, hi=hi: dates.range("expected_date", lo, hi, 856), repeat),
+        }
+        for label, (lo, hi) in windows.items()
+    }
+
+    # ---------------- hybrid retrieval ----------------
+    # Search only: the question vector is encoded once up front
+    value_vectors = main._ensure_row_embeddings()
+    retrieval = main.edi_indexes.retrieval
+    free_text = "shipment sent late"
+    q_vec = intent_router.embed_question(free_text)
+    result["retrieval"] = {
+        "patterns": len(retrieval.pattern_codes),
+        "keyword": _time_call(lambda: retrieval.search(free_text), repeat),
+        "hybrid": _time_call(lambda: retrieval.search(free_text, q_vec, value_vectors), repeat),
+    }
+
+    # ---------------- embedding store ----------------
+    result["embedding_store"] = _embedding_store_bench(size, repeat, seed)
+
+    # ---------------- batch vs loop ----------------
+    # Cold cache both ways, so the batch gains come from single-call encoding
+    batch = list(questions.values()) * 8
+
+    def _loop():
+        intent_router.clear_intent_cache()
+        for q in batch:
+            main.answer_question(question=q, rows=main.edi_rows, indexes=main.edi_indexes)
+
+    def _batched():
+        intent_router.clear_intent_cache()
+        rag_service.answer_questions(batch, rows=main.edi_rows, indexes=main.edi_indexes)
+
+    loop_stats = _time_call(_loop, repeat)
+    batch_stats = _time_call(_batched, repeat)
+    result["batch_vs_loop"] = {
+        "questions": len(batch),
+        "loop": loop_stats,
+        "batch": batch_stats,
+        "loop_questions_per_s": len(batch) / loop_stats["median_s"],
+        "batch_questions_per_s": len(batch) / batch_stats["median_s"],
+    }
+
+    # ---------------- lifecycle routes ----------------
+    result["lifecycle"] = {
+        "po_list": _time_call(lifecycle_routes.get_po_list, repeat),
+        "po_detail": _time_call(lambda: lifecycle_routes.get_lifecycle("PO1001"), repeat),
+    }
+
+    result["max_rss_mb"] = _max_rss_mb()
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Flattens both result trees and reports median ratios (current / baseline).
+    """
+    def _flatten(tree: Any, prefix: str = "") -> Dict[str, float]:
+        flat: Dict[str, float] = {}
+        if isinstance(tree, dict):
+            for k, v in tree.items():
+                flat.update(_flatten(v, f"{prefix}.{k}" if prefix else str(k)))
+        elif isinstance(tree, (int, float)) and (prefix.endswith("median_s") or prefix.endswith("total_s")):
+            flat[prefix] = float(tree)
+        return flat
+
+    cur = _flatten(current.get("results", {}))
+    base = _flatten(baseline.get("results", {}))
+    lines = []
+    for key in sorted(cur.keys() & base.keys()):
+        if base[key] > 0:
+            lines.append(f"{key}: {base[key]:.6f}s → {cur[key]:.6f}s ({cur[key] / base[key]:.2f}x)")
+    return lines
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the EDI assistant backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--partners", type=int, default=SyntheticConfig.partners)
+    parser.add_argument("--seed", type=int, default=SyntheticConfig.seed)
+    parser.add_argument("--data-dir", default=os.path.join("bench_results", "data"))
+    parser.add_argument("--out", default=os.path.join("bench_results", "bench.json"))
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--with-llm", action="store_true", help="keep the real Ollama explain call")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    from . import precompute, rag_service
+    # Idle-time precomputation would answer the timed questions from its cache
+    precompute.PRECOMPUTE_MAX_DOCUMENTS = precompute.PRECOMPUTE_MAX_EXPLANATIONS = 0
+    if not args.with_llm:
+        rag_service.explain_facts = lambda facts: facts
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "partners": args.partners,
+            "seed": args.seed,
+            "with_llm": args.with_llm,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} rows ...", flush=True)
+        report["results"][str(size)] = run_size(size, args.data_dir, args.repeat, args.partners, args.seed)
+
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        for line in compare(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,6 +1,28 @@
+import csv
+import io
+import os
+from typing import BinaryIO, Iterator, List, Tuple
+
 import pandas as pd
 from fastapi import UploadFile
 
+from .edi_schema import RejectReport, validate_chunk
+from .x12_parser import is_x12, iter_x12_chunks
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional: faster multi-threaded parser
+    pa = None
+    pa_csv = None
+
+# Rows per pandas chunk when ingesting large uploads
+CSV_CHUNK_ROWS = 50_000
+# Bytes per pyarrow read block (pyarrow chunks by bytes, not rows)
+CSV_BLOCK_BYTES = 8 * 1024 * 1024
+# "pyarrow" when installed, otherwise pandas' C parser
+CSV_ENGINE = os.getenv("CSV_ENGINE", "pyarrow" if pa_csv is not None else "c")
+
 
 def parse_csv(file: UploadFile):
     """
@@ -8,9 +30,63 @@ def parse_csv(file: UploadFile):
     No embeddings, no AI yet.
     """
     file.file.seek(0)
-    df = pd.read_csv(file.file)
+    frames = [chunk for chunk, _ in iter_edi_chunks(file.file, RejectReport())]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
 
     # Convert DataFrame to list of dicts
     rows = df.to_dict(orient="records")
 
     return rows
+
+
+def _read_header(fh: BinaryIO) -> List[str]:
+    start = fh.tell()
+    first = fh.readline().decode("utf-8-sig")
+    fh.seek(start)
+    return next(csv.reader(io.StringIO(first)), [])
+
+
+def iter_csv_chunks(fh: BinaryIO, chunksize: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Streams a CSV file as all-text DataFrame chunks (missing values stay
+    missing, nothing is type-inferred) so callers can report progress.
+    """
+    if CSV_ENGINE == "pyarrow" and pa_csv is not None:
+        header = _read_header(fh)
+        reader = pa_csv.open_csv(
+            fh,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header},
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(
+        fh,
+        chunksize=chunksize,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        engine="c",
+    )
+
+
+def iter_edi_chunks(fh: BinaryIO, report: RejectReport) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """
+    Yields (typed chunk, raw rows read) pairs; rows failing the EDI schema
+    are dropped from the chunk and recorded in report. Raw X12 interchanges
+    are detected by their ISA header; their report "line" is the ordinal of
+    the extracted document.
+    """
+    if is_x12(fh):
+        chunks, line = iter_x12_chunks(fh), 1
+    else:
+        chunks, line = iter_csv_chunks(fh), 2   # first data row, after the header
+    for chunk in chunks:
+        yield validate_chunk(chunk, line, report), len(chunk)
+        line += len(chunk)
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from .aggregate_cube import AggregateCube, build_aggregate_cube
+from .date_index import DateIndex, build_date_index
+from .document_index import DocumentIdIndex, build_document_id_index
+from .partner_index import PartnerIndex, build_partner_index, normalize_partner
+from .retrieval_index import TEXT_COLUMNS, RetrievalIndex, build_retrieval_index
+from .row_store import RowStore
+
+# ------------------------------------------------------------
+# Query-side indexes built once per ingested dataset.
+# Built from plain column lists so ingest workers can build them
+# off the request path; everything in here must stay picklable.
+# ------------------------------------------------------------
+
+INDEX_COLUMNS = (
+    "transaction_type",
+    "document_id",
+    "related_document_id",
+    "partner",
+    "status",
+    "created_date",
+    "expected_date",
+    "actual_date",
+    "remarks",
+)
+
+
+@dataclass(frozen=True)
+class DatasetIndexes:
+    partners: PartnerIndex
+    document_ids: DocumentIdIndex
+    cube: AggregateCube
+    retrieval: RetrievalIndex
+    dates: DateIndex
+
+
+def columns_from_rows(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    if isinstance(rows, RowStore):
+        return {name: rows.column(name) for name in INDEX_COLUMNS}
+    return {name: [row.get(name) for row in rows] for name in INDEX_COLUMNS}
+
+
+def build_dataset_indexes(columns: Dict[str, List[Any]]) -> DatasetIndexes:
+    size = len(next(iter(columns.values()), []))
+
+    def _col(name: str) -> List[Any]:
+        return columns[name] if name in columns else [None] * size
+
+    partners = build_partner_index(_col("partner"), _col("transaction_type"))
+    return DatasetIndexes(
+        partners=partners,
+        document_ids=build_document_id_index(_col("document_id"), _col("transaction_type")),
+        cube=build_aggregate_cube(
+            _col("partner"),
+            _col("transaction_type"),
+            _col("status"),
+            _col("expected_date"),
+            _col("actual_date"),
+            canonical_partner=lambda p: partners.canonical_by_key.get(normalize_partner(p)),
+        ),
+        retrieval=build_retrieval_index({name: _col(name) for name in TEXT_COLUMNS}),
+        dates=build_date_index(
+            _col("transaction_type"), _col("created_date"), _col("expected_date"), _col("actual_date"),
+        ),
+    )
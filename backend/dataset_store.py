@@ -0,0 +1,299 @@
+import json
+import os
+import pickle
+import re
+import shutil
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .embeddings import EmbeddingStore, quantize
+from .row_store import RowStore, load_row_store, save_row_store
+
+# ------------------------------------------------------------
+# Shared, versioned dataset snapshots
+# With EDI_DATASET_DIR set (ideally on tmpfs, e.g. /dev/shm/edi), every
+# ingest writes a snapshot there and every uvicorn worker attaches to the
+# newest one by memory-mapping it, so N workers share one copy of the
+# row arrays and see the same dataset without re-uploading.
+#   <dir>/v<N>/     row store arrays + meta.pkl (layout, indexes)
+#                   + index-<i>.npy (numeric and string arrays of the
+#                     query and lifecycle indexes, mmap'd like the rows)
+#                   + SOURCE (upload hash, for re-upload dedup)
+#   <dir>/CURRENT   newest committed version number
+# A worker attaching to a version pruned meanwhile moves on to CURRENT.
+# Unset, everything stays in process memory as before.
+# ------------------------------------------------------------
+
+DATASET_DIR = os.getenv("EDI_DATASET_DIR")
+KEEP_VERSIONS = int(os.getenv("EDI_DATASET_KEEP_VERSIONS", "2"))
+
+_META_FILE = "meta.pkl"
+_EMBEDDINGS_FILE = "embeddings.npy"            # float32, float16 or int8 (EMBEDDING_PRECISION)
+_EMBEDDING_SCALES_FILE = "embedding_scales.npy"  # per-vector scales of int8 embeddings
+_SOURCE_FILE = "SOURCE"   # sha256 of the uploaded file the snapshot was built from
+_REJECTED_FILE = "rejected.json"   # schema reject report of that upload
+_VERSION_DIR_RE = re.compile(r"^v(\d+)$")
+_INDEX_ARRAY_FILE = "index-{}.npy"
+SHARED_ARRAY_MIN_BYTES = 4096   # smaller index arrays stay inside meta.pkl
+
+_current_key: Optional[Tuple[int, int]] = None
+_current_version: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    rows: RowStore
+    dataset_indexes: Any
+    lifecycle_positions: Dict[str, Any]
+    content_hash: Optional[str] = None
+
+
+class _IndexPickler(pickle.Pickler):
+    # Writes large plain arrays next to meta.pkl instead of into it
+    def __init__(self, fh, directory: str):
+        super().__init__(fh, protocol=pickle.HIGHEST_PROTOCOL)
+        self._directory = directory
+        self._saved: Dict[int, Tuple[str, np.ndarray]] = {}
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.kind not in "biufU" or obj.nbytes < SHARED_ARRAY_MIN_BYTES:
+            return None
+        saved = self._saved.get(id(obj))
+        if saved is None:
+            name = _INDEX_ARRAY_FILE.format(len(self._saved))
+            np.save(os.path.join(self._directory, name), obj)
+            saved = self._saved[id(obj)] = (name, obj)   # obj kept alive so its id stays unique
+        return saved[0]
+
+
+class _IndexUnpickler(pickle.Unpickler):
+    def __init__(self, fh, directory: str):
+        super().__init__(fh)
+        self._directory = directory
+
+    def persistent_load(self, name):
+        return np.load(os.path.join(self._directory, name), mmap_mode="r")
+
+
+def enabled() -> bool:
+    return bool(DATASET_DIR)
+
+
+def _version_dir(version: int) -> str:
+    return os.path.join(DATASET_DIR, f"v{version}")
+
+
+def _current_path() -> str:
+    return os.path.join(DATASET_DIR, "CURRENT")
+
+
+@contextmanager
+def _dir_lock() -> Iterator[None]:
+    # Serializes commits from ingest jobs running in different workers
+    import fcntl
+
+    with open(os.path.join(DATASET_DIR, ".lock"), "a") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _read_current() -> Optional[int]:
+    try:
+        with open(_current_path(), encoding="ascii") as fh:
+            return int(fh.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def current_version() -> Optional[int]:
+    """
+    Newest committed version. Re-reads CURRENT only when its inode or
+    mtime changed, so calling this on every request costs one stat().
+    """
+    global _current_key, _current_version
+    try:
+        st = os.stat(_current_path())
+    except FileNotFoundError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    if key != _current_key:
+        _current_version = _read_current()
+        _current_key = key
+    return _current_version
+
+
+# =====================================================
+# WRITE (ingest worker, then API process)
+# =====================================================
+
+def write_staging(
+    job_id: str,
+    rows: RowStore,
+    dataset_indexes: Any,
+    lifecycle_positions: Dict[str, Any],
+    content_hash: Optional[str] = None,
+    rejected: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Writes a complete snapshot into a private staging directory. Runs in
+    the ingest worker process; commit() makes it visible.
+    """
+    staging = os.path.join(DATASET_DIR, f".staging-{job_id}")
+    os.makedirs(staging, exist_ok=True)
+    layout = save_row_store(staging, rows)
+    with open(os.path.join(staging, _META_FILE), "wb") as fh:
+        _IndexPickler(fh, staging).dump(
+            {"layout": layout, "dataset_indexes": dataset_indexes, "lifecycle_positions": lifecycle_positions},
+        )
+    if content_hash:
+        with open(os.path.join(staging, _SOURCE_FILE), "w", encoding="ascii") as fh:
+            fh.write(content_hash)
+    if rejected is not None:
+        # Kept for dedup hits, which report the original upload's rejects
+        with open(os.path.join(staging, _REJECTED_FILE), "w", encoding="utf-8") as fh:
+            json.dump(rejected, fh)
+    return staging
+
+
+def clone_staging(version: int, job_id: str) -> Optional[str]:
+    """
+    Stages an existing version again (hard links, so no data is copied)
+    so a re-upload of its source file can be committed as the next
+    version. None when the version has been pruned meanwhile.
+    """
+    source = _version_dir(version)
+    staging = os.path.join(DATASET_DIR, f".staging-{job_id}")
+    try:
+        os.makedirs(staging, exist_ok=True)
+        for name in os.listdir(source):
+            if name.startswith("."):
+                continue   # half-written embeddings of another worker
+            try:
+                os.link(os.path.join(source, name), os.path.join(staging, name))
+            except OSError:
+                shutil.copy2(os.path.join(source, name), os.path.join(staging, name))
+    except FileNotFoundError:
+        discard(staging)
+        return None
+    return staging
+
+
+def commit(staging: str) -> int:
+    """
+    Publishes a staged snapshot as the next version and returns it.
+    """
+    with _dir_lock():
+        version = (_read_current() or 0) + 1
+        os.rename(staging, _version_dir(version))
+        tmp = f"{_current_path()}.{os.getpid()}"
+        with open(tmp, "w", encoding="ascii") as fh:
+            fh.write(str(version))
+        os.replace(tmp, _current_path())
+        _prune(version)
+    return version
+
+
+def discard(staging: str) -> None:
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def _prune(latest: int) -> None:
+    # Workers still mapping a removed version keep their pages until they move on
+    for name in os.listdir(DATASET_DIR):
+        m = _VERSION_DIR_RE.match(name)
+        if m and int(m.group(1)) <= latest - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(DATASET_DIR, name), ignore_errors=True)
+
+
+def source_hash(version: int) -> Optional[str]:
+    try:
+        with open(os.path.join(_version_dir(version), _SOURCE_FILE), encoding="ascii") as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def rejected_report(version: int) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(_version_dir(version), _REJECTED_FILE), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def find_version(content_hash: str) -> Optional[int]:
+    """Newest kept version built from a file with this hash."""
+    versions = sorted(
+        (int(m.group(1)) for m in map(_VERSION_DIR_RE.match, os.listdir(DATASET_DIR)) if m),
+        reverse=True,
+    )
+    return next((v for v in versions if source_hash(v) == content_hash), None)
+
+
+# =====================================================
+# ATTACH (every API worker)
+# =====================================================
+
+def _load(version: int) -> Snapshot:
+    directory = _version_dir(version)
+    with open(os.path.join(directory, _META_FILE), "rb") as fh:
+        meta = _IndexUnpickler(fh, directory).load()
+    return Snapshot(
+        version=version,
+        rows=load_row_store(directory, meta["layout"]),
+        dataset_indexes=meta["dataset_indexes"],
+        lifecycle_positions=meta["lifecycle_positions"],
+        content_hash=source_hash(version),
+    )
+
+
+def load(version: int) -> Snapshot:
+    """
+    Maps a committed version. One pruned before its files were all mapped
+    (another worker committed KEEP_VERSIONS newer ones meanwhile) is
+    replaced by the newest version; the returned Snapshot says which.
+    """
+    while True:
+        try:
+            return _load(version)
+        except FileNotFoundError:
+            latest = _read_current()
+            if latest is None or latest <= version:
+                raise
+            version = latest
+
+
+def load_embeddings(version: int) -> Optional[EmbeddingStore]:
+    directory = _version_dir(version)
+    path = os.path.join(directory, _EMBEDDINGS_FILE)
+    try:
+        vectors = np.load(path, mmap_mode="r")
+        scales = None
+        if vectors.dtype == np.int8:
+            scales = np.load(os.path.join(directory, _EMBEDDING_SCALES_FILE), mmap_mode="r")
+    except FileNotFoundError:
+        return None   # not saved yet, or the version was pruned
+    return EmbeddingStore(vectors, scales)
+
+
+def save_embeddings(version: int, embeddings: Any) -> None:
+    # Written once by whichever worker needs them first; others map the
+    # files. Scales go first: a present vectors file means a complete store.
+    directory = _version_dir(version)
+    if not os.path.isdir(directory):
+        return
+    store = embeddings if isinstance(embeddings, EmbeddingStore) else quantize(embeddings, "float32")
+    if store.scales is not None:
+        tmp = os.path.join(directory, f".embedding-scales-{os.getpid()}.npy")
+        np.save(tmp, store.scales)
+        os.replace(tmp, os.path.join(directory, _EMBEDDING_SCALES_FILE))
+    tmp = os.path.join(directory, f".embeddings-{os.getpid()}.npy")
+    np.save(tmp, store.vectors)
+    os.replace(tmp, os.path.join(directory, _EMBEDDINGS_FILE))
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------
+# Sorted date indexes built at ingest
+# For every (date column, transaction_type) the rows that have a date are
+# kept as day ordinals in ascending order, with their row positions in
+# the same order. A time window is two binary searches per type, so a
+# range query costs O(types · log n + result size) instead of a scan.
+# ------------------------------------------------------------
+
+DATE_INDEX_COLUMNS = ("created_date", "expected_date", "actual_date")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+IndexKey = Tuple[str, Any]   # (column, transaction_type)
+
+
+def _ordinals(values: List[Optional[str]]) -> np.ndarray:
+    # Dates arrive validated as "YYYY-MM-DD" or None (see edi_schema);
+    # missing dates become 0, which no real ordinal uses
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format="%Y-%m-%d", errors="coerce")
+    days = parsed.to_numpy(dtype="datetime64[D]", na_value=np.datetime64("NaT"))
+    ordinals = days.astype(np.int64) + _EPOCH_ORDINAL
+    ordinals[np.isnat(days)] = 0
+    return ordinals.astype(np.int32)
+
+
+@dataclass(frozen=True)
+class DateIndex:
+    ordinals: Dict[IndexKey, np.ndarray]    # ascending day ordinals (int32)
+    positions: Dict[IndexKey, np.ndarray]   # row positions in the same order (int32)
+
+    def transaction_types(self, column: str) -> List[Any]:
+        return [t for c, t in self.ordinals if c == column]
+
+    def span(self, column: str) -> Optional[Tuple[date, date]]:
+        """Earliest and latest date in column, None when it has no dates."""
+        arrays = [self.ordinals[(column, t)] for t in self.transaction_types(column)]
+        if not arrays:
+            return None
+        return (
+            date.fromordinal(int(min(a[0] for a in arrays))),
+            date.fromordinal(int(max(a[-1] for a in arrays))),
+        )
+
+    def _bounds(self, key: IndexKey, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        ordinals = self.ordinals[key]
+        lo = int(np.searchsorted(ordinals, start.toordinal(), "left")) if start else 0
+        hi = int(np.searchsorted(ordinals, end.toordinal(), "right")) if end else len(ordinals)
+        return lo, max(lo, hi)
+
+    def _keys(self, column: str, transaction_type: Any) -> List[IndexKey]:
+        if column not in DATE_INDEX_COLUMNS:
+            raise ValueError(f"field must be one of {', '.join(DATE_INDEX_COLUMNS)}")
+        if transaction_type is None:
+            return [(column, t) for t in self.transaction_types(column)]
+        key = (column, transaction_type)
+        return [key] if key in self.ordinals else []
+
+    def count(
+        self,
+        column: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        transaction_type: Any = None,
+    ) -> int:
+        total = 0
+        for key in self._keys(column, transaction_type):
+            lo, hi = self._bounds(key, start, end)
+            total += hi - lo
+        return total
+
+    def range(
+        self,
+        column: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        transaction_type: Any = None,
+    ) -> np.ndarray:
+        """
+        Row positions whose column falls in [start, end] (either bound may
+        be open), ordered by date. Rows without that date never match.
+        """
+        ordinals, positions = [], []
+        for key in self._keys(column, transaction_type):
+            lo, hi = self._bounds(key, start, end)
+            if hi > lo:
+                ordinals.append(self.ordinals[key][lo:hi])
+                positions.append(self.positions[key][lo:hi])
+        if not positions:
+            return np.empty(0, dtype=np.int32)
+        if len(positions) == 1:
+            return positions[0]
+        # Each per-type slice is already sorted; merge them by date
+        order = np.argsort(np.concatenate(ordinals), kind="stable")
+        return np.concatenate(positions)[order]
+
+
+def build_date_index(
+    transaction_types: List[Any],
+    created_dates: List[Optional[str]],
+    expected_dates: List[Optional[str]],
+    actual_dates: List[Optional[str]],
+) -> DateIndex:
+    type_codes, type_values = pd.factorize(pd.Series(transaction_types, dtype=object), use_na_sentinel=False)
+    ordinals: Dict[IndexKey, np.ndarray] = {}
+    positions: Dict[IndexKey, np.ndarray] = {}
+    for column, values in zip(DATE_INDEX_COLUMNS, (created_dates, expected_dates, actual_dates)):
+        days = _ordinals(values)
+        present = np.flatnonzero(days != 0)
+        # One sort by (type, date) instead of one per type
+        order = present[np.lexsort((days[present], type_codes[present]))]
+        cuts = np.flatnonzero(np.diff(type_codes[order])) + 1
+        for chunk in np.split(order, cuts):
+            if not len(chunk):
+                continue
+            value = type_values[type_codes[chunk[0]]]
+            key = (column, None if pd.isna(value) else value)
+            ordinals[key] = np.ascontiguousarray(days[chunk])
+            positions[key] = chunk.astype(np.int32)
+    return DateIndex(ordinals=ordinals, positions=positions)
@@ -0,0 +1,74 @@
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+import numpy as np
+
+from .edi_schema import TYPE_CODES
+
+# ------------------------------------------------------------
+# Numeric-suffix index for document IDs
+# "1001" → PO1001 (850), INV1001 (810), ... so bare numeric IDs can be
+# checked for ambiguity or resolved with a type hint in one lookup.
+# ------------------------------------------------------------
+
+_NUMERIC_SUFFIX_RE = re.compile(r"(\d+)$")
+
+
+def numeric_key(value: Any) -> Optional[str]:
+    """
+    Numeric part of a document ID (or a bare number), without leading zeros.
+    """
+    if not value:
+        return None
+    m = _NUMERIC_SUFFIX_RE.search(value.strip())
+    return str(int(m.group(1))) if m else None
+
+
+@dataclass(frozen=True)
+class DocumentIdIndex:
+    # One entry per distinct document ID, sorted by numeric part; plain
+    # arrays, so shared snapshots can mmap them
+    numbers: np.ndarray   # numeric parts (fixed-width str), ascending
+    ids: np.ndarray       # document IDs, first-seen order within a number
+    types: np.ndarray     # transaction_type of each ID's first row (int64, -1 unknown)
+
+    def candidates(self, number: Any, doc_type: Optional[str] = None) -> List[str]:
+        """
+        Sorted document IDs sharing this numeric part, optionally only
+        those of one document type ("PO", "INVOICE", ...).
+        """
+        key = numeric_key(number)
+        if key is None:
+            return []
+        lo = int(np.searchsorted(self.numbers, key, "left"))
+        hi = int(np.searchsorted(self.numbers, key, "right"))
+        code = TYPE_CODES.get(doc_type) if doc_type else None
+        return sorted({str(self.ids[i]) for i in range(lo, hi) if code is None or self.types[i] == code})
+
+    def resolve(self, number: Any, doc_type: Optional[str] = None) -> Optional[str]:
+        """
+        The single matching document ID, or None when missing or ambiguous.
+        """
+        found = self.candidates(number, doc_type)
+        return found[0] if len(found) == 1 else None
+
+
+def build_document_id_index(document_ids: List[Any], transaction_types: List[Any]) -> DocumentIdIndex:
+    numbers, ids, types = [], [], []
+    seen = set()
+    for doc_id, t in zip(document_ids, transaction_types):
+        key = numeric_key(doc_id)
+        if key is not None and doc_id not in seen:
+            # Repeated rows of one document keep the first row's type
+            seen.add(doc_id)
+            numbers.append(key)
+            ids.append(doc_id)
+            types.append(int(t) if isinstance(t, (int, np.integer)) else -1)
+    number_array = np.array(numbers, dtype=str) if numbers else np.array([], dtype="<U1")
+    order = np.argsort(number_array, kind="stable")
+    return DocumentIdIndex(
+        numbers=number_array[order],
+        ids=(np.array(ids, dtype=str) if ids else np.array([], dtype="<U1"))[order],
+        types=np.array(types, dtype=np.int64)[order],
+    )
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------
+# Declared EDI CSV schema
+# Every upload is read as text and converted column by column, so the
+# dataset is typed the same way regardless of what pandas would infer:
+#   transaction_type → int, dates → canonical "YYYY-MM-DD" strings,
+#   everything else → stripped str, missing → None (never NaN).
+# Rows that violate the schema are dropped and reported.
+# ------------------------------------------------------------
+
+# The one code ↔ name map; routing, retrieval and answers all import it
+TYPE_LABELS = {850: "PO", 855: "ACK", 856: "ASN", 810: "INVOICE", 997: "FA"}
+TYPE_CODES = {label: code for code, label in TYPE_LABELS.items()}
+TYPE_DESCRIPTIONS = {
+    850: "purchase order",
+    855: "purchase order acknowledgment",
+    856: "advance ship notice shipment",
+    810: "inv invoice",
+    997: "functional acknowledgment",
+}
+TRANSACTION_TYPES = tuple(TYPE_LABELS)
+MAX_REJECTED_SAMPLE = 100
+
+
+class SchemaError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    kind: str                       # "str" | "int" | "date"
+    required: bool = False          # column must exist and every row needs a value
+    allowed: Optional[FrozenSet[Any]] = None
+
+
+EDI_SCHEMA = (
+    ColumnSpec("transaction_type", "int", required=True, allowed=frozenset(TRANSACTION_TYPES)),
+    ColumnSpec("document_id", "str", required=True),
+    ColumnSpec("related_document_id", "str"),
+    ColumnSpec("partner", "str"),
+    ColumnSpec("status", "str"),
+    ColumnSpec("created_date", "date"),
+    ColumnSpec("expected_date", "date"),
+    ColumnSpec("actual_date", "date"),
+    ColumnSpec("remarks", "str"),
+)
+
+
+@dataclass
+class RejectReport:
+    count: int = 0
+    sample: List[Dict[str, Any]] = field(default_factory=list)   # first rejected rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "sample": self.sample}
+
+
+def check_header(columns: Sequence[str]) -> None:
+    missing = [s.name for s in EDI_SCHEMA if s.required and s.name not in columns]
+    if missing:
+        raise SchemaError(f"CSV is missing required column(s): {', '.join(missing)}")
+
+
+def _distinct_text(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Factorizes a text column into (codes, table of stripped distinct values).
+    The table ends with None, so code -1 (missing) maps to None. CSV text
+    repeats heavily, so conversions below run once per distinct value.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    table = np.array([v.strip() or None for v in uniques.tolist()] + [None], dtype=object)
+    return codes, table
+
+
+def _convert(spec: ColumnSpec, table: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns (converted table, per-entry invalid flags)
+    present = pd.Series(table).notna()
+    if spec.kind == "int":
+        numbers = pd.to_numeric(pd.Series(table), errors="coerce")
+        invalid = present & (numbers.isna() | (numbers % 1 != 0))
+        if spec.allowed is not None:
+            invalid |= present & ~numbers.isin(spec.allowed)
+        return numbers.to_numpy(), invalid.to_numpy()
+    if spec.kind == "date":
+        parsed = pd.to_datetime(pd.Series(table), format="%Y-%m-%d", errors="coerce")
+        canonical = parsed.dt.strftime("%Y-%m-%d").astype(object).where(parsed.notna(), None)
+        return canonical.to_numpy(), (present & parsed.isna()).to_numpy()
+    return table, np.zeros(len(table), dtype=bool)
+
+
+def validate_chunk(df: pd.DataFrame, first_line: int, report: RejectReport) -> pd.DataFrame:
+    """
+    Converts one all-text chunk to the declared types. first_line is the
+    CSV line number of the chunk's first data row, used in the report.
+    """
+    check_header(list(df.columns))
+    out: Dict[str, np.ndarray] = {}
+    problems = []   # (bool mask per row, reason)
+
+    for spec in EDI_SCHEMA:
+        if spec.name not in df.columns:
+            out[spec.name] = np.full(len(df), None, dtype=object)
+            continue
+        codes, table = _distinct_text(df[spec.name])
+        if spec.required:
+            # Blank and whitespace-only values strip to None like absent ones
+            problems.append((pd.isna(table)[codes], f"missing {spec.name}"))
+        converted, invalid = _convert(spec, table)
+        if invalid.any():
+            problems.append((invalid[codes], f"invalid {spec.name}"))
+        out[spec.name] = converted[codes]
+
+    # Undeclared columns are kept as text
+    declared = {s.name for s in EDI_SCHEMA}
+    for name in df.columns:
+        if name not in declared:
+            codes, table = _distinct_text(df[name])
+            out[str(name)] = table[codes]
+
+    rejected = np.zeros(len(df), dtype=bool)
+    for mask, _ in problems:
+        rejected |= mask
+
+    if rejected.any():
+        report.count += int(rejected.sum())
+        for pos in np.flatnonzero(rejected):
+            if len(report.sample) >= MAX_REJECTED_SAMPLE:
+                break
+            report.sample.append({
+                "line": first_line + int(pos),
+                "reasons": [reason for mask, reason in problems if mask[pos]],
+            })
+
+    # dtype=object keeps None for missing text (pandas would infer NaN strings)
+    clean = pd.DataFrame(out, dtype=object)[~rejected]
+    for spec in EDI_SCHEMA:
+        if spec.kind == "int" and spec.required:
+            clean[spec.name] = clean[spec.name].astype(np.int64)
+    return clean.reset_index(drop=True)
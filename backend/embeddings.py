@@ -1,6 +1,84 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
+# ------------------------------------------------------------
+# Reduced-precision embedding storage
+# EMBEDDING_PRECISION picks how encoded vectors are kept in memory (and
+# in shared snapshots): float32 (4 bytes per dimension), float16 (2) or
+# int8 (1, plus one float32 scale per vector). Scores are computed block
+# by block against the stored matrix, so only SCORE_BLOCK_ROWS vectors
+# are ever widened to float32 at once; take() widens just the rows asked
+# for. int8 scores about as fast as float32; float16 is slower to widen
+# on CPUs without native half-precision conversion.
+# ------------------------------------------------------------
+
+EMBEDDING_PRECISIONS = ("float32", "float16", "int8")
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32")
+SCORE_BLOCK_ROWS = 1024   # widened per step; small enough to stay in cache
+
+
+@dataclass(frozen=True)
+class EmbeddingStore:
+    vectors: np.ndarray                  # (n, dim) float32, float16 or int8
+    scales: Optional[np.ndarray] = None  # (n,) float32 per-vector scale, int8 only
+
+    @property
+    def precision(self) -> str:
+        return "int8" if self.scales is not None else self.vectors.dtype.name
+
+    @property
+    def shape(self):
+        return self.vectors.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def dot(self, query: Any) -> np.ndarray:
+        """Dot product of every stored vector with query (float32)."""
+        q = np.asarray(query, dtype=np.float32)
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ q
+        out = np.empty(len(self.vectors), dtype=np.float32)
+        for lo in range(0, len(self.vectors), SCORE_BLOCK_ROWS):
+            hi = lo + SCORE_BLOCK_ROWS
+            out[lo:hi] = self.vectors[lo:hi].astype(np.float32) @ q
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def take(self, positions: Sequence[int]) -> np.ndarray:
+        """The vectors at positions, as float32."""
+        positions = np.asarray(positions, dtype=np.int64)
+        out = self.vectors[positions].astype(np.float32)
+        if self.scales is not None:
+            out *= self.scales[positions, None]
+        return out
+
+
+def quantize(vectors: Any, precision: str = EMBEDDING_PRECISION) -> EmbeddingStore:
+    if isinstance(vectors, EmbeddingStore):
+        if vectors.precision == precision:
+            return vectors
+        vectors = vectors.take(np.arange(len(vectors)))
+    if precision not in EMBEDDING_PRECISIONS:
+        raise ValueError(f"precision must be one of {', '.join(EMBEDDING_PRECISIONS)}")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if precision != "int8":
+        return EmbeddingStore(np.ascontiguousarray(matrix, dtype=precision))
+    # Symmetric per-vector scale: the largest component maps to ±127
+    peak = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.rint(matrix / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return EmbeddingStore(codes, scales)
+
 
 def generate_embeddings(texts: list[str]) -> list[list[float]]:
     """
@@ -31,7 +109,7 @@ def find_similar_rows(
     """
     Find top-k similar rows using cosine similarity.
     """
-    if not row_embeddings:
+    if row_embeddings is None or len(row_embeddings) == 0:
         return []
 
     similarities = cosine_similarity(
@@ -0,0 +1,483 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+from fastapi import UploadFile
+
+from .csv_utils import iter_edi_chunks
+from . import dataset_store
+from .dataset_index import INDEX_COLUMNS, build_dataset_indexes
+from .edi_schema import EDI_SCHEMA, RejectReport, SchemaError
+from .lifecycle_index import build_lifecycle_positions, materialize_lifecycle_indexes
+from .row_store import build_row_store
+
+# ------------------------------------------------------------
+# Upload ingest jobs
+# CSV parsing, type normalization and lifecycle grouping run in a
+# worker process so request threads never hold the GIL for a big file.
+#
+# Uploads are hashed (sha256) while they are spooled to disk. Re-uploading
+# the file behind the current dataset, or one of the last
+# DEDUP_CACHE_SIZE datasets, reuses what was already built (rows,
+# indexes, embeddings) instead of parsing it again. In shared-snapshot
+# mode the kept snapshot versions play the role of that cache.
+# ------------------------------------------------------------
+
+MAX_CONCURRENT_INGEST_JOBS = int(os.getenv("MAX_CONCURRENT_INGEST_JOBS", "2"))
+MAX_PENDING_INGEST_JOBS = int(os.getenv("MAX_PENDING_INGEST_JOBS", "8"))
+MAX_FINISHED_JOBS = 50
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "2"))   # built datasets kept per process, current included
+UPLOAD_SPOOL_BYTES = 1 << 20
+
+_mp_context = get_context("spawn")
+_executor: Optional[ProcessPoolExecutor] = None
+_manager = None
+_progress = None
+_pool_lock = Lock()
+
+_jobs: Dict[str, "IngestJob"] = {}
+_jobs_lock = Lock()
+_job_seq = 0
+_published_seq = 0
+_publish_lock = Lock()
+
+# content hash → built dataset (in-process mode only), guarded by _publish_lock
+_datasets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_current_hash: Optional[str] = None
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    seq: int
+    filename: Optional[str]
+    bytes_total: int
+    status: str = "queued"            # queued | running | publishing | done | failed
+    rows_processed: int = 0
+    rows_loaded: Optional[int] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    bytes_read: int = 0
+    rejected: Optional[Dict[str, Any]] = None   # rows dropped by the EDI schema
+    content_hash: Optional[str] = None          # sha256 of the uploaded file
+    dedup: Optional[str] = None                 # "current" | "cached" when an existing dataset was reused
+    done: Event = field(default_factory=Event, repr=False)
+
+    def is_active(self) -> bool:
+        return self.status in {"queued", "running", "publishing"}
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = 1.0 if self.status == "done" else (
+            min(self.bytes_read / self.bytes_total, 0.99) if self.bytes_total else 0.0
+        )
+        now = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "filename": self.filename,
+            "progress": round(progress, 4),
+            "rows_processed": self.rows_processed,
+            "rows_loaded": self.rows_loaded,
+            "bytes_total": self.bytes_total,
+            "error": self.error,
+            "rejected_rows": self.rejected,
+            "content_sha256": self.content_hash,
+            "dedup_hit": self.dedup is not None,
+            "dedup": self.dedup,
+            "queued_seconds": round((self.started_at or now) - self.submitted_at, 4),
+            "elapsed_seconds": round(now - self.submitted_at, 4),
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+        }
+
+
+# =====================================================
+# WORKER PROCESS SIDE
+# =====================================================
+
+def _run_ingest(path: str, job_id: str, progress, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs in a worker process. Returns the compact row store and lifecycle
+    row positions; no per-row dicts cross the process boundary.
+    """
+    t0 = time.perf_counter()
+    progress[job_id] = {"status": "running", "started_at": time.time(), "rows": 0, "bytes": 0}
+    frames = []
+    rows = 0
+    report = RejectReport()
+    try:
+        with open(path, "rb") as fh:
+            for chunk, raw_rows in iter_edi_chunks(fh, report):
+                frames.append(chunk)
+                rows += raw_rows
+                progress[job_id] = {
+                    "status": "running",
+                    "started_at": progress[job_id]["started_at"],
+                    "rows": rows,
+                    "bytes": fh.tell(),
+                }
+    finally:
+        os.unlink(path)
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    frames.clear()
+    if df.empty:
+        raise SchemaError(f"CSV has no valid rows ({report.count} rejected)")
+    t_parse = time.perf_counter()
+
+    store = build_row_store(df, date_columns=[s.name for s in EDI_SCHEMA if s.kind == "date"])
+    del df
+    t_store = time.perf_counter()
+
+    values = {name: store.column(name) for name in INDEX_COLUMNS}
+    positions = build_lifecycle_positions(
+        values["transaction_type"],
+        values["document_id"],
+        values["related_document_id"],
+    )
+    dataset_indexes = build_dataset_indexes(values)
+    t_index = time.perf_counter()
+
+    if dataset_store.enabled():
+        # Multi-worker mode: hand back a staged snapshot instead of the data
+        staging = dataset_store.write_staging(
+            job_id, store, dataset_indexes, positions, content_hash, rejected=report.to_dict()
+        )
+        return {
+            "row_count": len(store),
+            "snapshot": staging,
+            "rejected": report.to_dict(),
+            "timings": {
+                "parse_seconds": t_parse - t0,
+                "store_seconds": t_store - t_parse,
+                "index_seconds": t_index - t_store,
+                "snapshot_seconds": time.perf_counter() - t_index,
+            },
+        }
+
+    return {
+        "row_count": len(store),
+        "rows": store,
+        "lifecycle_positions": positions,
+        "dataset_indexes": dataset_indexes,
+        "rejected": report.to_dict(),
+        "timings": {
+            "parse_seconds": t_parse - t0,
+            "store_seconds": t_store - t_parse,
+            "index_seconds": t_index - t_store,
+        },
+    }
+
+
+# =====================================================
+# API PROCESS SIDE
+# =====================================================
+
+def _ensure_pool() -> ProcessPoolExecutor:
+    global _executor, _manager, _progress
+    with _pool_lock:
+        if _executor is None:
+            _manager = _mp_context.Manager()
+            _progress = _manager.dict()
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_CONCURRENT_INGEST_JOBS,
+                mp_context=_mp_context,
+            )
+    return _executor
+
+
+def shutdown_pool() -> None:
+    """
+    Stops worker processes and the progress manager (app shutdown).
+    """
+    global _executor, _manager, _progress
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
+            _progress = None
+
+
+def _prune_finished_jobs() -> None:
+    finished = [j for j in _jobs.values() if not j.is_active()]
+    finished.sort(key=lambda j: j.seq)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        _jobs.pop(job.job_id, None)
+
+
+def _publish(job: IngestJob, payload: Dict[str, Any]) -> None:
+    global _published_seq
+    from . import main
+    from . import lifecycle_routes
+
+    t0 = time.perf_counter()
+    if "snapshot" in payload:
+        with _publish_lock:
+            if job.seq > _published_seq:
+                main.attach_shared_dataset(dataset_store.commit(payload["snapshot"]))
+                _published_seq = job.seq
+            else:
+                dataset_store.discard(payload["snapshot"])
+        job.timings["publish_seconds"] = time.perf_counter() - t0
+        return
+
+    rows = payload["rows"]
+    indexes = payload.get("lifecycle_indexes") or materialize_lifecycle_indexes(rows, payload["lifecycle_positions"])
+
+    with _publish_lock:
+        # A slower, older upload must never overwrite a newer one
+        if job.seq > _published_seq:
+            _keep_embeddings()
+            lifecycle_routes.install_indexes(rows, indexes)
+            main.install_dataset(
+                rows, payload["dataset_indexes"],
+                row_embeddings=payload.get("row_embeddings"), content_hash=job.content_hash,
+            )
+            _published_seq = job.seq
+            _remember(job.content_hash, {
+                "rows": rows,
+                "lifecycle_indexes": indexes,
+                "dataset_indexes": payload["dataset_indexes"],
+                "row_count": payload["row_count"],
+                "rejected": payload["rejected"],
+                "row_embeddings": payload.get("row_embeddings"),
+            })
+    job.timings["publish_seconds"] = time.perf_counter() - t0
+
+
+def _keep_embeddings() -> None:
+    # Before the current dataset is replaced, keep its lazily computed
+    # embeddings with its cache entry so a re-upload does not re-encode
+    from . import main
+
+    entry = _datasets.get(_current_hash) if _current_hash else None
+    if entry is not None and main.edi_indexes is entry["dataset_indexes"] and main.edi_row_embeddings is not None:
+        entry["row_embeddings"] = main.edi_row_embeddings
+
+
+def _remember(content_hash: Optional[str], entry: Dict[str, Any]) -> None:
+    global _current_hash
+    _current_hash = content_hash
+    if not content_hash or DEDUP_CACHE_SIZE <= 0:
+        return
+    _datasets[content_hash] = entry
+    _datasets.move_to_end(content_hash)
+    while len(_datasets) > DEDUP_CACHE_SIZE:
+        _datasets.popitem(last=False)
+
+
+def _on_done(job: IngestJob, future: Future) -> None:
+    try:
+        payload = future.result()
+        job.status = "publishing"
+        job.rows_processed = payload["row_count"]
+        job.rejected = payload["rejected"]
+        job.timings.update(payload["timings"])
+        _publish(job, payload)
+        job.rows_loaded = payload["row_count"]
+        job.bytes_read = job.bytes_total
+        job.status = "done"
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc) or exc.__class__.__name__
+    finally:
+        job.finished_at = time.time()
+        if _progress is not None:
+            _progress.pop(job.job_id, None)
+        job.done.set()
+
+    if job.status == "done":
+        from . import main
+        Thread(target=main.warm_up_explainer, daemon=True).start()
+        Thread(target=main.warm_up_retrieval, daemon=True).start()
+
+
+def _spool_suffix(name: Optional[str]) -> str:
+    # The parser sniffs the content (CSV or X12); the suffix only helps
+    # whoever looks at the temp directory
+    ext = os.path.splitext(name or "")[1].lower()
+    return ext if 1 < len(ext) <= 8 and ext[1:].isalnum() else ".upload"
+
+
+def _spool(file: UploadFile) -> Tuple[str, str]:
+    # Copies the upload to disk and hashes it in the same pass
+    digest = hashlib.sha256()
+    file.file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="edi-upload-", suffix=_spool_suffix(file.filename), delete=False) as tmp:
+        while True:
+            block = file.file.read(UPLOAD_SPOOL_BYTES)
+            if not block:
+                break
+            digest.update(block)
+            tmp.write(block)
+    return tmp.name, digest.hexdigest()
+
+
+def _reuse_dataset(job: IngestJob) -> bool:
+    """
+    Finishes job from an already built dataset with the same content hash.
+    False when there is none and the upload has to be ingested.
+    """
+    global _published_seq
+    from . import main
+
+    t0 = time.perf_counter()
+    if dataset_store.enabled():
+        current = dataset_store.current_version()
+        if current is not None and dataset_store.source_hash(current) == job.content_hash:
+            job.dedup = "current"
+            with _publish_lock:
+                _published_seq = max(_published_seq, job.seq)
+            main.attach_shared_dataset(current)
+            job.rejected = dataset_store.rejected_report(current)
+        else:
+            version = dataset_store.find_version(job.content_hash)
+            staging = dataset_store.clone_staging(version, job.job_id) if version is not None else None
+            if staging is None:
+                return False
+            job.dedup = "cached"
+            job.rejected = dataset_store.rejected_report(version)
+            _publish(job, {"snapshot": staging})
+        job.rows_loaded = len(main.edi_rows)
+    else:
+        with _publish_lock:
+            entry = _datasets.get(job.content_hash)
+            if entry is not None and job.content_hash == _current_hash:
+                job.dedup = "current"
+                _published_seq = max(_published_seq, job.seq)
+        if entry is None:
+            return False
+        if job.dedup is None:
+            job.dedup = "cached"
+            _publish(job, entry)
+        job.rows_loaded = entry["row_count"]
+        job.rejected = entry["rejected"]
+
+    job.rows_processed = job.rows_loaded
+    job.bytes_read = job.bytes_total
+    job.timings["dedup_seconds"] = time.perf_counter() - t0
+    job.status = "done"
+    job.started_at = job.finished_at = time.time()
+    job.done.set()
+    if job.dedup == "cached":
+        Thread(target=main.warm_up_retrieval, daemon=True).start()
+    return True
+
+
+def submit_upload(file: UploadFile) -> IngestJob:
+    """
+    Spools the upload to disk and enqueues it for a worker process, or
+    finishes it on the spot when the same content was already ingested.
+    Raises IngestQueueFull when too many jobs are already pending.
+    """
+    global _job_seq
+    executor = _ensure_pool()
+
+    with _jobs_lock:
+        active = sum(1 for j in _jobs.values() if j.is_active())
+        if active >= MAX_PENDING_INGEST_JOBS:
+            raise IngestQueueFull(f"{active} ingest jobs already pending")
+        _job_seq += 1
+        # Registered (queued) before spooling, so concurrent uploads see the slot taken
+        job = IngestJob(job_id=uuid.uuid4().hex, seq=_job_seq, filename=file.filename, bytes_total=0)
+        _jobs[job.job_id] = job
+        _prune_finished_jobs()
+
+    try:
+        path, job.content_hash = _spool(file)
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc) or exc.__class__.__name__
+        job.finished_at = time.time()
+        job.done.set()
+        raise
+    job.bytes_total = os.path.getsize(path)
+
+    try:
+        reused = _reuse_dataset(job)
+    except Exception:
+        reused = False   # fall back to a normal ingest
+    if reused:
+        os.unlink(path)
+        return job
+
+    future = executor.submit(_run_ingest, path, job.job_id, _progress, job.content_hash)
+    future.add_done_callback(lambda f: _on_done(job, f))
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+    # Pull the latest worker-side progress while the job is running
+    if job.status in {"queued", "running"} and _progress is not None:
+        info = _progress.get(job_id)
+        if info:
+            job.status = "running"
+            job.started_at = info["started_at"]
+            job.rows_processed = info["rows"]
+            job.bytes_read = info["bytes"]
+    return job
+
+
+def wait_for_job(job_id: str, timeout: Optional[float] = None) -> Optional[IngestJob]:
+    job = get_job(job_id)
+    if job is not None:
+        job.done.wait(timeout)
+    return get_job(job_id)
+
+
+def ingest_path_inline(path: str) -> IngestJob:
+    """
+    Runs the same parse → index → publish pipeline in the calling process.
+    Used by benchmarks and scripts that have no worker pool; never
+    deduplicated, so repeated runs measure a full ingest.
+    """
+    global _job_seq
+    with _jobs_lock:
+        _job_seq += 1
+        seq = _job_seq
+
+    with tempfile.NamedTemporaryFile(prefix="edi-inline-", suffix=_spool_suffix(path), delete=False) as tmp:
+        with open(path, "rb") as src:
+            shutil.copyfileobj(src, tmp)
+        work_path = tmp.name
+
+    job = IngestJob(
+        job_id=uuid.uuid4().hex,
+        seq=seq,
+        filename=os.path.basename(path),
+        bytes_total=os.path.getsize(work_path),
+    )
+    job.started_at = time.time()
+    payload = _run_ingest(work_path, job.job_id, {})
+    job.timings.update(payload["timings"])
+    job.rejected = payload["rejected"]
+    _publish(job, payload)
+    job.rows_processed = job.rows_loaded = payload["row_count"]
+    job.bytes_read = job.bytes_total
+    job.status = "done"
+    job.finished_at = time.time()
+    job.done.set()
+    return job
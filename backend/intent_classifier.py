@@ -0,0 +1,400 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+import zlib
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ------------------------------------------------------------
+# Lightweight intent classifier
+# Hashed character 2-4-grams (plus whole words) into a fixed feature space
+# and one linear layer per intent, trained with logistic regression on
+# the router's exemplars and, when INTENT_LOG_PATH is set, on the
+# questions MiniLM has already routed. Predicting is a few dozen hashes
+# and a (features × intents) gather, tens of microseconds on one core.
+# OFF_TOPIC_EXAMPLES train an UNKNOWN class, so off-topic questions are
+# not forced into an EDI intent.
+#
+# With INTENT_CLASSIFIER=ngram the router asks this model first and only
+# encodes the question with MiniLM when the top probability is below
+# NGRAM_MIN_CONFIDENCE or the prediction is UNKNOWN (an unusual phrasing
+# of a real question looks off-topic too). Only MiniLM decisions are
+# logged, so the model never trains on its own output.
+#
+#   python -m backend.intent_classifier train --out intent_ngram.npz
+#   python -m backend.intent_classifier evaluate [--labeled file.jsonl]
+# ------------------------------------------------------------
+
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "minilm")   # "minilm" | "ngram"
+NGRAM_MIN_CONFIDENCE = float(os.getenv("NGRAM_MIN_CONFIDENCE", "0.6"))
+NGRAM_MODEL_PATH = os.getenv("NGRAM_MODEL_PATH")   # trained offline; else trained on first use
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH")     # JSONL of MiniLM-routed questions
+
+NGRAM_BITS = 14
+NGRAM_FEATURES = 1 << NGRAM_BITS
+NGRAM_MAX = 4   # character 2- to 4-grams, plus whole words
+NGRAM_REGULARIZATION_C = 1000.0   # few examples per intent; weak regularization keeps probabilities decisive
+
+_HASH_BASE = np.uint64(257)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_HASH_SHIFT = np.uint64(64 - NGRAM_BITS)
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+_model = None
+_model_lock = Lock()
+_log_lock = Lock()
+
+
+def _normalize(text: str) -> str:
+    # Document numbers carry no intent: "invoice 245" and "invoice 88" match
+    return _SPACE_RE.sub(" ", _DIGITS_RE.sub("0", str(text).lower())).strip()
+
+
+def features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashed feature ids and their L2-normalized counts. The hash is
+    computed with numpy over the whole string (no per-n-gram Python work)
+    and does not depend on PYTHONHASHSEED, so saved models stay valid.
+    """
+    s = f" {_normalize(text)} ".encode("utf-8")
+    codes = np.frombuffer(s, dtype=np.uint8).astype(np.uint64)
+    parts = [np.array([zlib.crc32(w) for w in s.split()], dtype=np.uint64)]
+    # Rolling polynomial hash: the (n+1)-grams extend the n-grams by one byte
+    h = codes
+    for n in range(2, NGRAM_MAX + 1):
+        if len(h) < 2:
+            break
+        h = h[:-1] * _HASH_BASE + codes[n - 1:]
+        parts.append(h)
+    hashed = np.sort((np.concatenate(parts) * _HASH_MIX) >> _HASH_SHIFT)   # top NGRAM_BITS bits
+    if not len(hashed):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    starts = np.flatnonzero(np.concatenate(([True], hashed[1:] != hashed[:-1])))
+    counts = np.diff(np.append(starts, len(hashed))).astype(np.float32)
+    return hashed[starts].astype(np.int64), counts / np.float32(np.sqrt(counts @ counts))
+
+
+@dataclass(frozen=True)
+class NgramIntentModel:
+    intents: Tuple[str, ...]
+    weights: np.ndarray   # (NGRAM_FEATURES, intents) float32
+    bias: np.ndarray      # (intents,) float32
+
+    def probabilities(self, text: str) -> np.ndarray:
+        ids, values = features(text)
+        logits = values @ self.weights[ids] + self.bias
+        logits = np.exp(logits - logits.max())
+        return logits / logits.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely intent and its probability."""
+        probs = self.probabilities(text)
+        best = int(np.argmax(probs))
+        return self.intents[best], float(probs[best])
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, intents=np.array(self.intents), weights=self.weights, bias=self.bias)
+
+
+def load_model(path: str) -> NgramIntentModel:
+    with np.load(path) as data:
+        return NgramIntentModel(
+            intents=tuple(str(i) for i in data["intents"]),
+            weights=data["weights"].astype(np.float32),
+            bias=data["bias"].astype(np.float32),
+        )
+
+
+def read_log(path: Optional[str]) -> List[Tuple[str, str]]:
+    """(question, intent) pairs from a decision log; the latest label wins."""
+    if not path or not os.path.exists(path):
+        return []
+    labels: Dict[str, Tuple[str, str]] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+                labels[_normalize(entry["question"])] = (entry["question"], entry["intent"])
+            except (ValueError, KeyError, TypeError):
+                continue   # a torn line from a concurrent writer
+    return list(labels.values())
+
+
+# Off-topic questions labeled UNKNOWN. Without them every question lands
+# in some EDI intent, often confidently enough to skip the MiniLM check.
+OFF_TOPIC_EXAMPLES = [
+    "who is the CEO",
+    "who founded the company",
+    "what is the capital of Germany",
+    "what's the weather like tomorrow",
+    "will it rain this weekend",
+    "tell me a story",
+    "write a haiku about summer",
+    "sing me a song",
+    "what is the meaning of life",
+    "how old are you",
+    "who made you",
+    "what's your name",
+    "hi there",
+    "good morning",
+    "thank you",
+    "bye",
+    "how do I change my password",
+    "how do I log out",
+    "can you book a meeting room",
+    "send an email to my manager",
+    "what's on my calendar",
+    "recommend a movie",
+    "best pizza place nearby",
+    "how tall is mount everest",
+    "what is 12 times 7",
+    "convert 10 miles to kilometers",
+    "who is the president",
+    "latest football scores",
+    "what's the stock price of apple",
+    "explain quantum physics",
+    "how do I cook pasta",
+    "play some music",
+    "set an alarm for 7am",
+    "what year is it",
+    "lorem ipsum dolor",
+    "zxcv bnm",
+    "test",
+    "help me with my homework",
+    "what does HTTP stand for",
+    "write python code to sort a list",
+]
+
+
+def training_examples(exemplars: Dict[str, List[str]], log_path: Optional[str] = None) -> List[Tuple[str, str]]:
+    examples = [(q, intent) for intent, samples in exemplars.items() for q in samples]
+    examples += [(q, "UNKNOWN") for q in OFF_TOPIC_EXAMPLES]
+    return examples + read_log(log_path)
+
+
+def train(examples: Sequence[Tuple[str, str]]) -> NgramIntentModel:
+    from scipy.sparse import csr_matrix
+    from sklearn.linear_model import LogisticRegression
+
+    intents = tuple(sorted({intent for _, intent in examples}))
+    if len(intents) < 2:
+        raise ValueError("training needs examples of at least two intents")
+    indptr, indices, data = [0], [], []
+    for question, _ in examples:
+        ids, values = features(question)
+        indices.extend(ids.tolist())
+        data.extend(values.tolist())
+        indptr.append(len(indices))
+    x = csr_matrix((data, indices, indptr), shape=(len(examples), NGRAM_FEATURES), dtype=np.float32)
+    y = [intents.index(intent) for _, intent in examples]
+
+    clf = LogisticRegression(C=NGRAM_REGULARIZATION_C, max_iter=2000)
+    clf.fit(x, y)
+    coef = clf.coef_.astype(np.float32)
+    bias = clf.intercept_.astype(np.float32)
+    if len(intents) == 2:
+        # Binary logistic regression is a softmax over (0, w·x + b)
+        coef = np.vstack([np.zeros_like(coef), coef])
+        bias = np.concatenate([np.zeros_like(bias), bias])
+    return NgramIntentModel(intents=intents, weights=np.ascontiguousarray(coef.T), bias=bias)
+
+
+def ngram_model(exemplars: Dict[str, List[str]]) -> NgramIntentModel:
+    """The serving model: NGRAM_MODEL_PATH, else trained once from exemplars + log."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            if NGRAM_MODEL_PATH and os.path.exists(NGRAM_MODEL_PATH):
+                _model = load_model(NGRAM_MODEL_PATH)
+            else:
+                _model = train(training_examples(exemplars, INTENT_LOG_PATH))
+        return _model
+
+
+def reset_model() -> None:
+    global _model
+    with _model_lock:
+        _model = None
+
+
+def log_decision(question: str, intent: str, score: float) -> None:
+    if not INTENT_LOG_PATH:
+        return
+    line = json.dumps({"question": question, "intent": intent, "score": round(score, 4)}) + "\n"
+    with _log_lock:
+        with open(INTENT_LOG_PATH, "a", encoding="utf-8") as fh:
+            fh.write(line)
+
+
+# =====================================================
+# OFFLINE EVALUATION
+# Held-out paraphrases of each exemplar intent plus off-topic questions.
+# Labels are the embedding-stage decision (before the deterministic
+# overrides), which is the step the n-gram model replaces.
+# =====================================================
+
+EVAL_QUESTIONS = [
+    ("status of PO4521", "GET_STATUS"),
+    ("where does invoice 7781 stand", "GET_STATUS"),
+    ("what state is order 332 in", "GET_STATUS"),
+    ("give me the status for ASN1200", "GET_STATUS"),
+    ("PO9001 current status", "GET_STATUS"),
+    ("is order 3321 late", "CHECK_DELAY"),
+    ("which shipments are delayed", "CHECK_DELAY"),
+    ("any delays on PO4521", "CHECK_DELAY"),
+    ("show me late deliveries", "CHECK_DELAY"),
+    ("are any orders behind schedule", "CHECK_DELAY"),
+    ("is INV7781 overdue", "CHECK_OVERDUE"),
+    ("show past due invoices", "CHECK_OVERDUE"),
+    ("which payments are overdue", "CHECK_OVERDUE"),
+    ("list invoices past their due date", "CHECK_OVERDUE"),
+    ("any overdue bills", "CHECK_OVERDUE"),
+    ("lifecycle for PO4521", "GET_LIFECYCLE"),
+    ("history of order 332", "GET_LIFECYCLE"),
+    ("timeline of PO9001", "GET_LIFECYCLE"),
+    ("what happened with order 3321", "GET_LIFECYCLE"),
+    ("full activity for PO77", "GET_LIFECYCLE"),
+    ("documents from Walmart", "FILTER_BY_PARTNER"),
+    ("show Costco invoices", "FILTER_BY_PARTNER"),
+    ("list everything for Target", "FILTER_BY_PARTNER"),
+    ("any orders from Amazon", "FILTER_BY_PARTNER"),
+    ("Home Depot documents only", "FILTER_BY_PARTNER"),
+    ("is PO4521 completed", "CHECK_COMPLETION"),
+    ("has order 332 been completed", "CHECK_COMPLETION"),
+    ("is PO9001 fully done", "CHECK_COMPLETION"),
+    ("did order 3321 finish", "CHECK_COMPLETION"),
+    ("is the purchase order closed", "CHECK_COMPLETION"),
+    ("show all invoices", "LIST_DOCUMENTS"),
+    ("list every ASN", "LIST_DOCUMENTS"),
+    ("display all purchase orders", "LIST_DOCUMENTS"),
+    ("what documents do we have", "LIST_DOCUMENTS"),
+    ("list all documents", "LIST_DOCUMENTS"),
+    ("how many ASNs are delayed", "COUNT_DOCUMENTS"),
+    ("count the pending invoices", "COUNT_DOCUMENTS"),
+    ("number of documents", "COUNT_DOCUMENTS"),
+    ("how many purchase orders are there", "COUNT_DOCUMENTS"),
+    ("total number of invoices", "COUNT_DOCUMENTS"),
+    ("invoice counts per partner", "GROUP_COUNT"),
+    ("documents by status", "GROUP_COUNT"),
+    ("breakdown of orders by partner", "GROUP_COUNT"),
+    ("how many ASNs per month", "GROUP_COUNT"),
+    ("pending invoices grouped by partner", "GROUP_COUNT"),
+    ("what is the weather today", "UNKNOWN"),
+    ("tell me a joke", "UNKNOWN"),
+    ("who won the game last night", "UNKNOWN"),
+    ("asdf qwerty", "UNKNOWN"),
+    ("translate hello into french", "UNKNOWN"),
+    ("who is the CEO of Walmart", "UNKNOWN"),
+    ("what's the capital of France", "UNKNOWN"),
+    ("write me a poem", "UNKNOWN"),
+    ("how do I reset my password", "UNKNOWN"),
+    ("what time is it", "UNKNOWN"),
+    ("recommend a good restaurant", "UNKNOWN"),
+    ("who are you", "UNKNOWN"),
+    ("hello", "UNKNOWN"),
+    ("thanks!", "UNKNOWN"),
+    ("what is 2+2", "UNKNOWN"),
+]
+
+EVAL_THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def _read_labeled(path: str) -> List[Tuple[str, str]]:
+    with open(path, encoding="utf-8") as fh:
+        return [(e["question"], e["intent"]) for e in map(json.loads, filter(str.strip, fh))]
+
+
+def _latency(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "median_us": statistics.median(samples) * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))] * 1e6,
+    }
+
+
+def evaluate(labeled: Iterable[Tuple[str, str]], log_path: Optional[str] = None) -> Dict[str, object]:
+    """
+    Accuracy and per-question latency of MiniLM + SIMILARITY_THRESHOLD, of
+    the n-gram model alone, and of the n-gram model with MiniLM fallback
+    at each confidence threshold.
+    """
+    from . import intent_router
+
+    labeled = list(labeled)
+    held_out = {_normalize(q) for q, _ in labeled}
+    examples = [(q, i) for q, i in training_examples(intent_router._exemplars, log_path) if _normalize(q) not in held_out]
+    t0 = time.perf_counter()
+    model = train(examples)
+    train_s = time.perf_counter() - t0
+
+    intent_router._ensure_exemplar_embeddings()
+    encoder = intent_router._embed_model
+    minilm, ngram, minilm_s, ngram_s = [], [], [], []
+    for question, _ in labeled:
+        t0 = time.perf_counter()
+        q_vec = encoder.encode([question], convert_to_numpy=True, normalize_embeddings=True)[0]
+        minilm.append(intent_router._embedding_intent(q_vec)[0])
+        minilm_s.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        ngram.append(model.predict(question))
+        ngram_s.append(time.perf_counter() - t0)
+
+    truth = [intent for _, intent in labeled]
+
+    def accuracy(predicted: List[str]) -> float:
+        return sum(p == t for p, t in zip(predicted, truth)) / len(truth)
+
+    hybrid = {}
+    for threshold in EVAL_THRESHOLDS:
+        # Same rule as the router: UNKNOWN is never settled by the n-gram model
+        settled = [c >= threshold and p != "UNKNOWN" for p, c in ngram]
+        picked = [p if ok else m for (p, _), m, ok in zip(ngram, minilm, settled)]
+        hybrid[str(threshold)] = {
+            "accuracy": accuracy(picked),
+            "ngram_share": sum(settled) / len(truth),
+            "ngram_settled_wrong": sum(ok and p != t for (p, _), t, ok in zip(ngram, truth, settled)),
+            # Per question: n-gram always runs, MiniLM only on fallback
+            "mean_latency_us": (sum(ngram_s) + sum(s for s, ok in zip(minilm_s, settled) if not ok)) / len(truth) * 1e6,
+        }
+    return {
+        "questions": len(truth),
+        "training_examples": len(examples),
+        "ngram_train_s": train_s,
+        "minilm": {"accuracy": accuracy(minilm), **_latency(minilm_s)},
+        "ngram": {"accuracy": accuracy([p for p, _ in ngram]), **_latency(ngram_s)},
+        "hybrid": hybrid,
+    }
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Train or evaluate the n-gram intent classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="train from the exemplars and a decision log")
+    train_cmd.add_argument("--log", default=INTENT_LOG_PATH)
+    train_cmd.add_argument("--out", required=True)
+    eval_cmd = sub.add_parser("evaluate", help="compare with the MiniLM router")
+    eval_cmd.add_argument("--log", default=INTENT_LOG_PATH)
+    eval_cmd.add_argument("--labeled", help="JSONL of {question, intent}; default: built-in held-out set")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        from .intent_router import _exemplars
+
+        examples = training_examples(_exemplars, args.log)
+        train(examples).save(args.out)
+        print(f"Trained on {len(examples)} examples, written to {args.out}")
+    else:
+        labeled = _read_labeled(args.labeled) if args.labeled else EVAL_QUESTIONS
+        print(json.dumps(evaluate(labeled, args.log), indent=2))
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,23 +1,59 @@
 import json
+import os
+import queue
 import re
+import time
 import numpy as np
 from collections import OrderedDict
-from threading import Lock
+from concurrent.futures import Future
+from datetime import date, timedelta
+from threading import Lock, Thread
+from typing import Optional, Tuple
 from sentence_transformers import SentenceTransformer
 
+from .embeddings import quantize
+from .intent_classifier import INTENT_CLASSIFIER, NGRAM_MIN_CONFIDENCE, log_decision, ngram_model
+from .metrics import Counter, Histogram
+
 CACHE_SIZE = 500
 _intent_cache = OrderedDict()
 _cache_lock = Lock()
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ROUTER_VERSION = 3   # bump when exemplars or routing rules change; persisted decisions are keyed by it
 SIMILARITY_THRESHOLD = 0.75
 _embed_model = None
 _model_lock = Lock()
-_partner_whitelist = set()
-_partner_lock = Lock()
 _exemplars_lock = Lock()
 _exemplars_ready = False
 
+# Every intent the router can return
+INTENTS = (
+    "GET_STATUS",
+    "CHECK_DELAY",
+    "CHECK_OVERDUE",
+    "GET_LIFECYCLE",
+    "FILTER_BY_PARTNER",
+    "CHECK_COMPLETION",
+    "LIST_DOCUMENTS",
+    "COUNT_DOCUMENTS",
+    "GROUP_COUNT",
+    "DATE_WINDOW",
+    "UNKNOWN",
+)
+
+INTENT_CACHE_LOOKUPS = Counter(
+    "edi_intent_cache_lookups_total",
+    "Intent classification cache lookups by result.",
+    ("result",),
+)
+
+INTENT_CLASSIFIER_DECISIONS = Counter(
+    "edi_intent_classifier_decisions_total",
+    "Uncached questions classified, by backend (ngram, or minilm incl. fallbacks).",
+    ("backend",),
+)
+
 _exemplars = {
     "GET_STATUS": [
         "what's the status of PO1001",
@@ -68,16 +104,128 @@ _exemplars = {
         "display ASNs",
         "what documents exist",
     ],
+    "COUNT_DOCUMENTS": [
+        "how many invoices are pending",
+        "count of delayed ASNs",
+        "number of purchase orders",
+        "how many documents do we have",
+        "total invoices this month",
+    ],
+    "GROUP_COUNT": [
+        "how many invoices are pending per partner",
+        "delayed POs by partner this month",
+        "invoice count by status",
+        "breakdown of documents by type",
+        "orders per month",
+    ],
 }
 
 _exemplar_embeddings = {}
 
+# =====================================================
+# ENCODE MICRO-BATCHING
+# Concurrent single-question encodes are queued and flushed as one
+# encode() call once EMBED_BATCH_MAX_SIZE items are waiting or the oldest
+# has waited EMBED_BATCH_MAX_WAIT_MS. A max size of 1 disables batching.
+# =====================================================
+
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+EMBED_BATCH_SIZE = Histogram(
+    "edi_embed_batch_size",
+    "Questions per encode() call made by the micro-batcher.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBED_QUEUE_WAIT_SECONDS = Histogram(
+    "edi_embed_queue_wait_seconds",
+    "Time a question waited in the micro-batch queue before encoding.",
+)
+
+_encode_queue = queue.Queue()
+_encoder_thread = None
+_encoder_lock = Lock()
+
+
+def _ensure_encoder():
+    global _encoder_thread
+    with _encoder_lock:
+        if _encoder_thread is None or not _encoder_thread.is_alive():
+            _encoder_thread = Thread(target=_encoder_loop, name="embed-batcher", daemon=True)
+            _encoder_thread.start()
+
+
+def _next_batch():
+    first = _encode_queue.get()
+    batch = [first]
+    deadline = first[2] + EMBED_BATCH_MAX_WAIT_MS / 1000.0
+    while len(batch) < EMBED_BATCH_MAX_SIZE:
+        remaining = deadline - time.perf_counter()
+        try:
+            batch.append(_encode_queue.get(timeout=remaining) if remaining > 0 else _encode_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _encoder_loop():
+    while True:
+        batch = _next_batch()
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            EMBED_QUEUE_WAIT_SECONDS.observe(started - enqueued)
+        EMBED_BATCH_SIZE.observe(len(batch))
+        try:
+            vecs = _embed_model.encode(
+                [text for text, _, _ in batch], convert_to_numpy=True, normalize_embeddings=True
+            )
+        except Exception as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            continue
+        for (_, future, _), vec in zip(batch, vecs):
+            future.set_result(vec)
+
+
+def encode_question_async(text: str) -> Future:
+    """
+    Queues one question for the shared encoder; the future resolves to its
+    normalized embedding. The model must already be loaded.
+    """
+    future = Future()
+    if EMBED_BATCH_MAX_SIZE <= 1:
+        try:
+            future.set_result(
+                _embed_model.encode([text], convert_to_numpy=True, normalize_embeddings=True)[0]
+            )
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+    _ensure_encoder()
+    _encode_queue.put((text, future, time.perf_counter()))
+    return future
+
+
 def _load_model():
     global _embed_model
     with _model_lock:
         if _embed_model is None:
             _embed_model = SentenceTransformer(MODEL_NAME)
 
+def encode_texts(texts: list):
+    """
+    Normalized embeddings for arbitrary texts (dataset values, not
+    questions), encoded in one call outside the micro-batcher.
+    """
+    _load_model()
+    return _embed_model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+
+def embed_question(question: str):
+    _load_model()
+    return encode_question_async(question).result()
+
+
 def _ensure_exemplar_embeddings():
     global _exemplars_ready
     with _exemplars_lock:
@@ -86,17 +234,24 @@ def _ensure_exemplar_embeddings():
         _load_model()
         for intent, samples in _exemplars.items():
             vecs = _embed_model.encode(samples, convert_to_numpy=True, normalize_embeddings=True)
-            _exemplar_embeddings[intent] = vecs
+            _exemplar_embeddings[intent] = quantize(vecs)
         _exemplars_ready = True
 
+def warm_up_classifier():
+    # Loads or trains the n-gram model and encodes the exemplars before the
+    # first question needs them (MiniLM is also the n-gram fallback)
+    if INTENT_CLASSIFIER == "ngram":
+        ngram_model(_exemplars)
+    _ensure_exemplar_embeddings()
+
 def _cosine_max(intent_vectors, query_vec):
     if intent_vectors is None or len(intent_vectors) == 0:
         return 0.0
-    scores = intent_vectors @ query_vec
+    scores = intent_vectors.dot(query_vec)
     return float(np.max(scores))
 
 def _extract_document_id(text):
-    m = re.search(r"\b(?:PO|INV|ASN)\d+\b", text, flags=re.IGNORECASE)
+    m = re.search(r"\b(?:PO|INV|ASN|ACK|FA)\d+\b", text, flags=re.IGNORECASE)
     if m:
         return re.sub(r"[^A-Za-z0-9]", "", m.group(0)).upper()
     m2 = re.search(r"\b\d{3,}\b", text)
@@ -119,30 +274,273 @@ def _extract_document_type(text):
         t = "FA"
     return t
 
+_AGGREGATE_RE = re.compile(r"\b(?:how many|count|counts|number of|total)\b")
+_GROUP_BY_RE = re.compile(
+    r"\b(?:per|by|each|breakdown by|grouped by)\s+(partner|status|document type|type|month)s?\b"
+)
+_GROUP_BY_DIMENSION = {
+    "partner": "partner",
+    "status": "status",
+    "type": "transaction_type",
+    "document type": "transaction_type",
+    "month": "month",
+}
+_MONTH_NAMES = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+# A year is only read as one behind a preposition; "status of 2025" is an ID
+_YEAR_RE = re.compile(r"\b(?:in|during|year)\s+((?:19|20)\d{2})\b")
+_MONTH_NAME_RE = re.compile(
+    r"\b(?:(in may)|(" + "|".join(sorted(_MONTH_NAMES, key=len, reverse=True)) + r"))\b(?:\s+(20\d{2}))?"
+)
+
+def _extract_month(text):
+    """
+    "this month" / "last month" / "2025-03" / "March 2025" → "2025-03";
+    a month name without a year → "03" (that month in any year);
+    "in 2025" → "2025" (any month of that year).
+    """
+    s = text.lower()
+    today = date.today()
+    if "this month" in s:
+        return today.strftime("%Y-%m")
+    if "last month" in s:
+        return (today.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    m = re.search(r"\b(20\d{2})-(0[1-9]|1[0-2])\b", s)
+    if m:
+        return f"{m.group(1)}-{m.group(2)}"
+    m = _MONTH_NAME_RE.search(s)
+    if m:
+        month = 5 if m.group(1) else _MONTH_NAMES[m.group(2)]
+        return f"{m.group(3)}-{month:02d}" if m.group(3) else f"{month:02d}"
+    m = _YEAR_RE.search(s)
+    if m:
+        return m.group(1)
+    return None
+
+def _extract_aggregate_entities(text, indexes):
+    s = text.lower()
+    group = _GROUP_BY_RE.search(s)
+    words = set(re.findall(r"[a-z]+", s))
+    statuses = indexes.cube.statuses if indexes is not None else []
+    status = next((st for st in statuses if st != "delayed" and st in words), None)
+    return {
+        "group_by": _GROUP_BY_DIMENSION[group.group(1)] if group else None,
+        "status": status,
+        "delayed": True if re.search(r"\b(?:delay|delays|delayed|late)\b", s) else None,
+        "month": _extract_month(text),
+    }
+
+# With a day next to it, "may" is unambiguous
+_DATE_MONTHS = dict(_MONTH_NAMES, may=5)
+_MONTH_ALT = "|".join(sorted(_DATE_MONTHS, key=len, reverse=True))
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(20\d{2}))?"
+_DATE_RES = (
+    # 2025-05-01
+    ("iso", re.compile(r"\b(20\d{2})-(\d{2})-(\d{2})\b")),
+    # May 1, May 1st 2025
+    ("month_day", re.compile(r"\b(" + _MONTH_ALT + r")\.?\s+" + _DAY + r"\b" + _YEAR)),
+    # 1 May, 1st of May 2025
+    ("day_month", re.compile(r"\b" + _DAY + r"\s+(?:of\s+)?(" + _MONTH_ALT + r")\b" + _YEAR)),
+)
+# "May 1 - 15", "May 1 to 15": the second day shares the month
+_DAY_SPAN_RE = re.compile(
+    r"\b(" + _MONTH_ALT + r")\.?\s+" + _DAY + r"\s*(?:-|–|to|and|through|until)\s*" + _DAY + r"\b(?!\s+(?:" + _MONTH_ALT + r")\b)" + _YEAR
+)
+_RELATIVE_SPAN_RE = re.compile(r"\b(next|coming|last|past|previous)\s+(\d{1,3})\s+(day|week)s?\b")
+_ACTUAL_DATE_RE = re.compile(r"\b(?:shipped|delivered|received|arrived|actual|completed|acknowledged)\b")
+_CREATED_DATE_RE = re.compile(r"\b(?:created|issued|placed|raised)\b")
+# A bare "today" usually means "as of now" ("overdue today"); it is a
+# one-day window only behind a date word: "due today", "shipped yesterday"
+_DAY_WORD_RE = re.compile(
+    r"\b(?:due|expected|scheduled|arriving|shipping|delivering|shipped|delivered|received|arrived"
+    r"|acknowledged|completed|created|issued|placed)\s+(?:on\s+|for\s+)?(today|tomorrow|yesterday)\b"
+)
+_DAY_WORD_OFFSETS = {"today": 0, "tomorrow": 1, "yesterday": -1}
+# A window turns these into a DATE_WINDOW listing or count ...
+_WINDOW_INTENTS = frozenset({"UNKNOWN", "LIST_DOCUMENTS", "FILTER_BY_PARTNER", "COUNT_DOCUMENTS", "GROUP_COUNT", "DATE_WINDOW"})
+# ... and narrows these, which keep their own answer
+_WINDOW_FILTER_INTENTS = frozenset({"CHECK_DELAY", "CHECK_OVERDUE"})
+
+DateWindow = Tuple[Optional[str], Optional[str]]
+
+
+def _resolve_date(year, month, day, anchor) -> Optional[date]:
+    # A date without a year is its latest occurrence on or before anchor
+    month, day = int(month), int(day)
+    if year:
+        try:
+            return date(int(year), month, day)
+        except ValueError:
+            return None
+    for y in range(anchor.year, anchor.year - 8, -1):   # Feb 29 may need a few years
+        try:
+            d = date(y, month, day)
+        except ValueError:
+            continue
+        if d <= anchor:
+            return d
+    return None
+
+
+def _find_dates(s):
+    # (start, end, (year or None, month, day)) per explicit date, in text order
+    found = []
+    for kind, pattern in _DATE_RES:
+        for m in pattern.finditer(s):
+            if any(m.start() < e and b < m.end() for b, e, _ in found):
+                continue
+            if kind == "iso":
+                parts = (m.group(1), m.group(2), m.group(3))
+            elif kind == "month_day":
+                parts = (m.group(3), _DATE_MONTHS[m.group(1)], m.group(2))
+            else:
+                parts = (m.group(3), _DATE_MONTHS[m.group(2)], m.group(1))
+            if _resolve_date(*parts, anchor=date.max):
+                found.append((m.start(), m.end(), parts))
+    return sorted(found, key=lambda f: f[0])
+
+
+# Month and year phrases are never document IDs either
+_MONTH_YEAR_RES = (
+    re.compile(r"\b(?:19|20)\d{2}-(?:0[1-9]|1[0-2])\b"),
+    re.compile(r"\b(?:" + _MONTH_ALT + r")\.?,?\s+(?:19|20)\d{2}\b"),
+    re.compile(r"\b(?:in|during|year|since|before|after|until)\s+(?:19|20)\d{2}\b"),
+)
+
+
+def _strip_dates(text):
+    s = text.lower()
+    for start, end, _ in reversed(_find_dates(s)):
+        s = s[:start] + " " + s[end:]
+    for pattern in _MONTH_YEAR_RES:
+        s = pattern.sub(" ", s)
+    return s
+
+
+def _extract_date_window(text, anchor=None) -> Tuple[Optional[DateWindow], bool]:
+    """
+    Day-level time windows → ((from, to) ISO dates, relative). Either
+    bound may be None (open). A date without a year is its latest
+    occurrence on or before anchor (default today); relative phrases
+    ("next week", "last 7 days") resolve against today. Month-level
+    phrases stay with _extract_month.
+    """
+    s = text.lower()
+    today = date.today()
+    anchor = anchor or today
+
+    def _window(lo, hi):
+        return (lo.isoformat() if lo else None, hi.isoformat() if hi else None)
+
+    def _range(first, second):
+        # The second date of a range follows the first one's year
+        lo = _resolve_date(*first, anchor=anchor)
+        hi = _resolve_date(second[0] or lo.year, second[1], second[2], anchor=anchor) if lo else None
+        if lo and hi and hi < lo and not second[0]:
+            hi = _resolve_date(lo.year + 1, second[1], second[2], anchor=anchor)   # "Dec 20 to Jan 5"
+        return _window(lo, hi) if lo and hi else None
+
+    m = _DAY_SPAN_RE.search(s)
+    if m:
+        month = _DATE_MONTHS[m.group(1)]
+        window = _range((m.group(4), month, m.group(2)), (m.group(4), month, m.group(3)))
+        if window:
+            return window, False
+
+    dates = _find_dates(s)
+    if len(dates) >= 2:
+        window = _range(dates[0][2], dates[1][2])
+        if window:
+            return window, False
+    if dates:
+        start, _, parts = dates[0]
+        day = _resolve_date(*parts, anchor=anchor)
+        if day:
+            word = (s[:start].split() or [""])[-1]
+            if word == "before":
+                return _window(None, day - timedelta(days=1)), False
+            if word == "after":
+                return _window(day + timedelta(days=1), None), False
+            if word in ("since", "from"):
+                return _window(day, None), False
+            if word in ("by", "until", "till", "through"):
+                return _window(None, day), False
+            return _window(day, day), False
+
+    m = _RELATIVE_SPAN_RE.search(s)
+    if m:
+        days = int(m.group(2)) * (7 if m.group(3) == "week" else 1)
+        if m.group(1) in ("next", "coming"):
+            return _window(today, today + timedelta(days=days)), True
+        return _window(today - timedelta(days=days), today), True
+    week_start = today - timedelta(days=today.weekday())
+    for phrase, offset in (("this week", 0), ("next week", 7), ("last week", -7)):
+        if phrase in s:
+            monday = week_start + timedelta(days=offset)
+            return _window(monday, monday + timedelta(days=6)), True
+    m = _DAY_WORD_RE.search(s)
+    if m:
+        day = today + timedelta(days=_DAY_WORD_OFFSETS[m.group(1)])
+        return _window(day, day), True
+    return None, False
+
+
+def _date_anchor(indexes):
+    # Dates without a year are read as their latest occurrence in the data
+    span = indexes.dates.span("expected_date") if indexes is not None else None
+    return span[1] if span else None
+
+
+def _date_field(s):
+    # The date a window applies to: "created after Jan 3", "shipped last
+    # week", else the expected (due) date
+    for field, pattern in (("created_date", _CREATED_DATE_RE), ("actual_date", _ACTUAL_DATE_RE)):
+        if pattern.search(s):
+            return field, pattern
+    return "expected_date", None
+
+
+def _extract_window_entities(text, indexes, window):
+    s = text.lower()
+    field, pattern = _date_field(s)
+    entities = _extract_aggregate_entities(text, indexes)
+    entities.pop("month")   # the window replaces the month filter
+    if pattern and entities["status"] and pattern.search(entities["status"]):
+        entities["status"] = None   # "shipped last week" names the date, not a status filter
+    entities.update({
+        "date_from": window[0],
+        "date_to": window[1],
+        "date_field": field,
+        "aggregate": bool(_AGGREGATE_RE.search(s) or entities["group_by"]),
+    })
+    return entities
+
+
+def _current_indexes():
+    try:
+        from .main import edi_indexes
+        return edi_indexes
+    except Exception:
+        return None
+
 def _extract_partner(text):
+    # Prefer a partner from the ingested partner dictionary (normalized + typo tolerant)
+    indexes = _current_indexes()
+    if indexes is not None:
+        found = indexes.partners.find_in_text(text)
+        if found:
+            return found
     m = re.search(r"\bfrom\s+([A-Za-z][A-Za-z&\-\s]+)\b", text)
     if not m:
         return None
     # Return the verbatim extracted partner string; existence will be validated downstream
     return m.group(1).strip()
 
-def _ensure_partner_whitelist():
-    with _partner_lock:
-        if _partner_whitelist:
-            return
-    try:
-        # Import inside the function to avoid circular import at module load
-        from .main import edi_rows
-        candidates = set()
-        for r in edi_rows or []:
-            val = str(r.get("partner", "")).strip()
-            if val:
-                candidates.add(val.lower())
-        with _partner_lock:
-            _partner_whitelist.update(candidates)
-    except Exception:
-        pass
-
 def _is_csv_loaded():
     try:
         from .main import edi_rows
@@ -150,13 +548,174 @@ def _is_csv_loaded():
     except Exception:
         return False
 
+def _embedding_intent(q_vec) -> Tuple[str, float]:
+    """
+    Nearest exemplar intent for an encoded question, UNKNOWN below
+    SIMILARITY_THRESHOLD.
+    """
+    best_intent = "UNKNOWN"
+    best_score = -1.0
+    for intent, vecs in _exemplar_embeddings.items():
+        score = _cosine_max(vecs, q_vec)
+        if score > best_score:
+            best_score = score
+            best_intent = intent
+    if best_score < SIMILARITY_THRESHOLD:
+        best_intent = "UNKNOWN"
+    return best_intent, best_score
+
+
+def _minilm_intent(question: str, q_vec) -> str:
+    best_intent, best_score = _embedding_intent(q_vec)
+    INTENT_CLASSIFIER_DECISIONS.inc(backend="minilm")
+    log_decision(question, best_intent, best_score)
+    return best_intent
+
+
+def _ngram_intent(question: str) -> Optional[str]:
+    # None when the n-gram backend is off, not confident enough, or says
+    # UNKNOWN: MiniLM gets the final word on anything that looks off-topic
+    if INTENT_CLASSIFIER != "ngram":
+        return None
+    intent, confidence = ngram_model(_exemplars).predict(question)
+    if confidence < NGRAM_MIN_CONFIDENCE or intent == "UNKNOWN":
+        return None
+    INTENT_CLASSIFIER_DECISIONS.inc(backend="ngram")
+    return intent
+
+
+def _route_question(question: str, best_intent: str, normalized_key: str) -> dict:
+    """
+    Applies the deterministic overrides to the classifier's intent,
+    extracts entities and caches the result.
+    """
+    entities = {
+        # Dates are cut first so "2025-05-01", "May 1, 2025" or "March 2025"
+        # is never read as an ID
+        "document_id": _extract_document_id(_strip_dates(question)),
+        "partner": _extract_partner(question),
+        "document_type": _extract_document_type(question),
+    }
+
+    indexes = _current_indexes()
+
+    # Deterministic status-based listing: "what is pending", "what is received"
+    s_lower = question.lower()
+    if best_intent == "UNKNOWN" and entities["document_id"] is None:
+        if re.search(r"\bpending\b", s_lower):
+            best_intent = "LIST_DOCUMENTS"
+            entities["status"] = "pending"
+        elif re.search(r"\breceived\b", s_lower):
+            best_intent = "LIST_DOCUMENTS"
+            entities["status"] = "received"
+
+    # Deterministic override for purchase orders listing
+    if best_intent == "UNKNOWN" and entities["document_type"] == "PO":
+        s = question.lower()
+        if ("purchase order" in s) or ("purchase orders" in s) or (" pos" in s) or (" po" in s) or s.startswith("po ") or s.endswith(" po"):
+            best_intent = "LIST_DOCUMENTS"
+    # Deterministic overrides for ASN / ACK / FA listing
+    if best_intent == "UNKNOWN" and entities["document_type"] in {"ASN", "ACK", "FA"}:
+        best_intent = "LIST_DOCUMENTS"
+    # Deterministic override for lifecycle/history synonyms
+    if best_intent == "UNKNOWN":
+        s = question.lower()
+        has_lifecycle_phrase = any(p in s for p in ["lifecycle", "life cycle", "history", "timeline", "full activity"])
+        if has_lifecycle_phrase and entities["document_id"]:
+            best_intent = "GET_LIFECYCLE"
+    # Deterministic override for generic delay queries
+    if best_intent == "UNKNOWN":
+        s = question.lower()
+        if any(p in s for p in ["delay", "delays", "delayed"]):
+            best_intent = "CHECK_DELAY"
+    # Deterministic override for questions naming a known partner
+    if best_intent == "UNKNOWN" and entities["partner"] and entities["document_id"] is None:
+        if indexes is not None and indexes.partners.resolve(entities["partner"]):
+            best_intent = "FILTER_BY_PARTNER"
+    # Deterministic aggregate routing: counting / group-by questions
+    if entities["document_id"] is None and (
+        _AGGREGATE_RE.search(s_lower) or _GROUP_BY_RE.search(s_lower)
+        or best_intent in {"COUNT_DOCUMENTS", "GROUP_COUNT"}
+    ):
+        entities.update(_extract_aggregate_entities(question, indexes))
+        best_intent = "GROUP_COUNT" if entities["group_by"] else "COUNT_DOCUMENTS"
+    # Deterministic time-window routing: "ASNs expected between May 1 and May 15",
+    # "invoices due next week"; answered from the sorted date indexes. Delay
+    # and overdue checks keep their intent and take the window as a filter.
+    relative_window = False
+    if entities["document_id"] is None and best_intent in _WINDOW_INTENTS | _WINDOW_FILTER_INTENTS:
+        window, relative_window = _extract_date_window(question, _date_anchor(indexes))
+        if window and best_intent in _WINDOW_INTENTS:
+            entities.pop("month", None)
+            entities.update(_extract_window_entities(question, indexes, window))
+            best_intent = "DATE_WINDOW"
+        elif window:
+            entities.update({"date_from": window[0], "date_to": window[1], "date_field": _date_field(s_lower)[0]})
+    # Numeric-only ID: resolve through the suffix index (type hint narrows it),
+    # ambiguous status questions still require explicit type clarification
+    if indexes is not None and entities["document_id"] and entities["document_id"].isdigit():
+        base = entities["document_id"]
+        hinted = indexes.document_ids.resolve(base, entities["document_type"])
+        if hinted:
+            entities["document_id"] = hinted
+        elif best_intent == "GET_STATUS" and len(indexes.document_ids.candidates(base)) >= 2:
+            best_intent = "UNKNOWN"
+
+    if best_intent not in INTENTS:
+        best_intent = "UNKNOWN"
+
+    allowed_types = {"PO", "INVOICE", "ASN", "ACK", "FA"}
+    dt = entities["document_type"]
+    if isinstance(dt, str):
+        dt = dt.upper()
+        if dt not in allowed_types:
+            dt = None
+    else:
+        dt = None
+    entities["document_type"] = dt
+
+    parsed = {"intent": best_intent, "entities": entities}
+    if relative_window:
+        return parsed   # "next week" means something else tomorrow; never cached
+    with _cache_lock:
+        if len(_intent_cache) >= CACHE_SIZE:
+            _intent_cache.popitem(last=False)
+        _intent_cache[normalized_key] = parsed
+    return parsed
+
+def clear_intent_cache():
+    with _cache_lock:
+        _intent_cache.clear()
+
+def classifier_version() -> str:
+    # Everything besides the dataset that a cached routing decision depends on
+    if INTENT_CLASSIFIER == "ngram":
+        return f"ngram@{NGRAM_MIN_CONFIDENCE}+{MODEL_NAME}@{SIMILARITY_THRESHOLD}/v{ROUTER_VERSION}"
+    return f"{MODEL_NAME}@{SIMILARITY_THRESHOLD}/v{ROUTER_VERSION}"
+
+def intent_cache_entries() -> list:
+    # [normalized question, routing result], least recently used first
+    with _cache_lock:
+        return [[key, parsed] for key, parsed in _intent_cache.items()]
+
+def load_intent_cache(entries) -> int:
+    with _cache_lock:
+        for key, parsed in entries[-CACHE_SIZE:]:
+            _intent_cache[key] = parsed
+            _intent_cache.move_to_end(key)
+        while len(_intent_cache) > CACHE_SIZE:
+            _intent_cache.popitem(last=False)
+    return min(len(entries), CACHE_SIZE)
+
 def classify_intent(question: str) -> dict:
     try:
         normalized_key = question.strip().lower()
         with _cache_lock:
             if normalized_key in _intent_cache:
                 _intent_cache.move_to_end(normalized_key)
+                INTENT_CACHE_LOOKUPS.inc(result="hit")
                 return _intent_cache[normalized_key]
+        INTENT_CACHE_LOOKUPS.inc(result="miss")
 
         if not _is_csv_loaded():
             return {
@@ -168,104 +727,21 @@ def classify_intent(question: str) -> dict:
                 },
             }
 
-        _ensure_exemplar_embeddings()
-        if not _exemplars_ready:
-            return {
-                "intent": "UNKNOWN",
-                "entities": {
-                    "document_id": None,
-                    "partner": None,
-                    "document_type": None,
-                },
-            }
-
-        q_vec = _embed_model.encode([question], convert_to_numpy=True, normalize_embeddings=True)[0]
-        best_intent = "UNKNOWN"
-        best_score = -1.0
-        for intent, vecs in _exemplar_embeddings.items():
-            score = _cosine_max(vecs, q_vec)
-            if score > best_score:
-                best_score = score
-                best_intent = intent
-        if best_score < SIMILARITY_THRESHOLD:
-            best_intent = "UNKNOWN"
-
-        entities = {
-            "document_id": _extract_document_id(question),
-            "partner": _extract_partner(question),
-            "document_type": _extract_document_type(question),
-        }
-
-        # Deterministic status-based listing: "what is pending", "what is received"
-        s_lower = question.lower()
-        if best_intent == "UNKNOWN" and entities["document_id"] is None:
-            if re.search(r"\bpending\b", s_lower):
-                best_intent = "LIST_DOCUMENTS"
-                entities["status"] = "pending"
-            elif re.search(r"\breceived\b", s_lower):
-                best_intent = "LIST_DOCUMENTS"
-                entities["status"] = "received"
-
-        # Deterministic override for purchase orders listing
-        if best_intent == "UNKNOWN" and entities["document_type"] == "PO":
-            s = question.lower()
-            if ("purchase order" in s) or ("purchase orders" in s) or (" pos" in s) or (" po" in s) or s.startswith("po ") or s.endswith(" po"):
-                best_intent = "LIST_DOCUMENTS"
-        # Deterministic overrides for ASN / ACK / FA listing
-        if best_intent == "UNKNOWN" and entities["document_type"] in {"ASN", "ACK", "FA"}:
-            best_intent = "LIST_DOCUMENTS"
-        # Deterministic override for lifecycle/history synonyms
-        if best_intent == "UNKNOWN":
-            s = question.lower()
-            has_lifecycle_phrase = any(p in s for p in ["lifecycle", "life cycle", "history", "timeline", "full activity"])
-            if has_lifecycle_phrase and entities["document_id"]:
-                best_intent = "GET_LIFECYCLE"
-        # Deterministic override for generic delay queries
-        if best_intent == "UNKNOWN":
-            s = question.lower()
-            if any(p in s for p in ["delay", "delays", "delayed"]):
-                best_intent = "CHECK_DELAY"
-        # Ambiguous numeric-only ID: require explicit type clarification
-        try:
-            if best_intent == "GET_STATUS" and entities["document_id"] and entities["document_id"].isdigit():
-                from .main import edi_rows
-                base = entities["document_id"]
-                candidates = [f"{p}{base}" for p in ["PO", "INV", "ASN", "ACK", "FA"]]
-                exist = {c for c in candidates if any(r.get("document_id") == c for r in (edi_rows or []))}
-                if len(exist) >= 2:
-                    best_intent = "UNKNOWN"
-        except Exception:
-            pass
-
-        allowed_intents = {
-            "GET_STATUS",
-            "CHECK_DELAY",
-            "CHECK_OVERDUE",
-            "GET_LIFECYCLE",
-            "FILTER_BY_PARTNER",
-            "CHECK_COMPLETION",
-            "LIST_DOCUMENTS",
-            "UNKNOWN",
-        }
-        if best_intent not in allowed_intents:
-            best_intent = "UNKNOWN"
-
-        allowed_types = {"PO", "INVOICE", "ASN", "ACK", "FA"}
-        dt = entities["document_type"]
-        if isinstance(dt, str):
-            dt = dt.upper()
-            if dt not in allowed_types:
-                dt = None
-        else:
-            dt = None
-        entities["document_type"] = dt
-
-        parsed = {"intent": best_intent, "entities": entities}
-        with _cache_lock:
-            if len(_intent_cache) >= CACHE_SIZE:
-                _intent_cache.popitem(last=False)
-            _intent_cache[normalized_key] = parsed
-        return parsed
+        best_intent = _ngram_intent(question)
+        if best_intent is None:
+            _ensure_exemplar_embeddings()
+            if not _exemplars_ready:
+                return {
+                    "intent": "UNKNOWN",
+                    "entities": {
+                        "document_id": None,
+                        "partner": None,
+                        "document_type": None,
+                    },
+                }
+            q_vec = encode_question_async(question).result()
+            best_intent = _minilm_intent(question, q_vec)
+        return _route_question(question, best_intent, normalized_key)
     except Exception:
         return {
             "intent": "UNKNOWN",
@@ -276,6 +752,69 @@ def classify_intent(question: str) -> dict:
             },
         }
 
+def classify_intents(questions: list) -> list:
+    """
+    Batch form of classify_intent: cache hits are served directly and all
+    remaining distinct questions the n-gram model does not settle are
+    encoded in a single model call.
+    """
+    unknown = {
+        "intent": "UNKNOWN",
+        "entities": {
+            "document_id": None,
+            "partner": None,
+            "document_type": None,
+        },
+    }
+    results = [None] * len(questions)
+    pending = OrderedDict()  # normalized key → (question, [positions])
+
+    with _cache_lock:
+        for i, question in enumerate(questions):
+            normalized_key = question.strip().lower()
+            if normalized_key in _intent_cache:
+                _intent_cache.move_to_end(normalized_key)
+                results[i] = _intent_cache[normalized_key]
+            elif normalized_key in pending:
+                pending[normalized_key][1].append(i)
+            else:
+                pending[normalized_key] = (question, [i])
+    hits = len(questions) - sum(len(pos) for _, pos in pending.values())
+    if hits:
+        INTENT_CACHE_LOOKUPS.inc(hits, result="hit")
+    if not pending:
+        return results
+    INTENT_CACHE_LOOKUPS.inc(sum(len(pos) for _, pos in pending.values()), result="miss")
+
+    try:
+        if not _is_csv_loaded():
+            raise RuntimeError("no CSV loaded")
+        intents = {key: _ngram_intent(question) for key, (question, _) in pending.items()}
+        fallback = [(key, question) for key, (question, _) in pending.items() if intents[key] is None]
+        if fallback:
+            _ensure_exemplar_embeddings()
+            if not _exemplars_ready:
+                raise RuntimeError("exemplar embeddings unavailable")
+            q_vecs = _embed_model.encode(
+                [question for _, question in fallback], convert_to_numpy=True, normalize_embeddings=True
+            )
+            for (key, question), q_vec in zip(fallback, q_vecs):
+                intents[key] = _minilm_intent(question, q_vec)
+    except Exception:
+        for _, positions in pending.values():
+            for i in positions:
+                results[i] = unknown
+        return results
+
+    for normalized_key, (question, positions) in pending.items():
+        try:
+            parsed = _route_question(question, intents[normalized_key], normalized_key)
+        except Exception:
+            parsed = unknown
+        for i in positions:
+            results[i] = parsed
+    return results
+
 if __name__ == "__main__":
     import time
     qs = [
@@ -1,15 +1,15 @@
 from dataclasses import dataclass
-from typing import Any, Dict, Mapping, Optional, Tuple, List
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple, List
 from types import MappingProxyType
 
+import numpy as np
 
-def _as_readonly_row(row: Dict[str, Any]) -> Mapping[str, Any]:
-    return MappingProxyType(row)
+from .row_store import RowStore
 
 
-def _safe_str(row: Dict[str, Any], key: str) -> Optional[str]:
-    val = row.get(key)
-    return val if isinstance(val, str) else None
+def _as_readonly_row(row: Mapping[str, Any]) -> Mapping[str, Any]:
+    # RowStore rows are already read-only views; only plain dicts need wrapping
+    return MappingProxyType(row) if isinstance(row, dict) else row
 
 
 @dataclass(frozen=True)
@@ -21,6 +21,117 @@ class LifecycleIndexes:
     fa_by_related: Mapping[str, Tuple[Mapping[str, Any], ...]]
 
 
+_RELATED_GROUP_BY_TYPE = {
+    855: "ack_by_related",
+    856: "asn_by_related",
+    810: "inv_by_related",
+    997: "fa_by_related",
+}
+
+
+@dataclass(frozen=True)
+class PositionGroups:
+    """
+    key → row positions as plain arrays (sorted distinct keys plus CSR
+    offsets), so a shared snapshot can memory-map them instead of every
+    worker unpickling its own dict of lists.
+    """
+    keys: np.ndarray        # sorted distinct keys (fixed-width str)
+    offsets: np.ndarray     # int64; key i owns positions[offsets[i]:offsets[i + 1]]
+    positions: np.ndarray   # int32, row order within a key
+
+    def find(self, key: Any) -> Optional[np.ndarray]:
+        if not isinstance(key, str) or not len(self.keys):
+            return None
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.positions[self.offsets[i]:self.offsets[i + 1]]
+        return None
+
+
+def _position_groups(keys: List[str], positions: List[int]) -> PositionGroups:
+    if not keys:
+        return PositionGroups(np.array([], dtype="<U1"), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32))
+    key_array = np.array(keys, dtype=str)
+    order = np.argsort(key_array, kind="stable")
+    distinct, starts = np.unique(key_array[order], return_index=True)
+    return PositionGroups(
+        keys=distinct,
+        offsets=np.append(starts, len(keys)).astype(np.int64),
+        positions=np.asarray(positions, dtype=np.int32)[order],
+    )
+
+
+def build_lifecycle_positions(
+    transaction_types: List[Any],
+    document_ids: List[Any],
+    related_ids: List[Any],
+) -> Dict[str, PositionGroups]:
+    """
+    Groups row positions (not rows) by lifecycle key.
+
+    Works on plain columns so it can run inside an ingest worker process;
+    materialize_lifecycle_indexes wraps the result in row mappings.
+    """
+    groups: Dict[str, Tuple[List[str], List[int]]] = {
+        "po_by_id": ([], []),
+        "ack_by_related": ([], []),
+        "asn_by_related": ([], []),
+        "inv_by_related": ([], []),
+        "fa_by_related": ([], []),
+    }
+
+    for pos, (t, doc_id, rel_id) in enumerate(zip(transaction_types, document_ids, related_ids)):
+        if t == 850:
+            key, group = doc_id, "po_by_id"
+        else:
+            key, group = rel_id, _RELATED_GROUP_BY_TYPE.get(t)
+        if group and key:
+            keys, positions = groups[group]
+            keys.append(str(key))
+            positions.append(pos)
+
+    return {name: _position_groups(keys, positions) for name, (keys, positions) in groups.items()}
+
+
+class _RowGroups(Mapping):
+    # Rows are looked up per access, so nothing per row is built up front
+    def __init__(self, rows: List[Dict[str, Any]], groups: PositionGroups, single: bool = False):
+        self._rows = rows
+        self._groups = groups
+        self._single = single
+
+    def __getitem__(self, key: Any):
+        found = self._groups.find(key)
+        if found is None:
+            raise KeyError(key)
+        if self._single:
+            return _as_readonly_row(self._rows[int(found[-1])])   # the last PO with an ID wins
+        return tuple(_as_readonly_row(self._rows[int(p)]) for p in found)
+
+    def __contains__(self, key: Any) -> bool:
+        return self._groups.find(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(k) for k in self._groups.keys)
+
+    def __len__(self) -> int:
+        return len(self._groups.keys)
+
+
+def materialize_lifecycle_indexes(
+    rows: List[Dict[str, Any]],
+    positions: Dict[str, PositionGroups],
+) -> LifecycleIndexes:
+    return LifecycleIndexes(
+        po_by_id=_RowGroups(rows, positions["po_by_id"], single=True),
+        ack_by_related=_RowGroups(rows, positions["ack_by_related"]),
+        asn_by_related=_RowGroups(rows, positions["asn_by_related"]),
+        inv_by_related=_RowGroups(rows, positions["inv_by_related"]),
+        fa_by_related=_RowGroups(rows, positions["fa_by_related"]),
+    )
+
+
 def build_lifecycle_indexes(rows: List[Dict[str, Any]]) -> LifecycleIndexes:
     if not rows:
         return LifecycleIndexes(
@@ -31,49 +142,16 @@ def build_lifecycle_indexes(rows: List[Dict[str, Any]]) -> LifecycleIndexes:
             fa_by_related=MappingProxyType({}),
         )
 
-    po_by_id_mut: Dict[str, Mapping[str, Any]] = {}
-    ack_by_related_mut: Dict[str, List[Mapping[str, Any]]] = {}
-    asn_by_related_mut: Dict[str, List[Mapping[str, Any]]] = {}
-    inv_by_related_mut: Dict[str, List[Mapping[str, Any]]] = {}
-    fa_by_related_mut: Dict[str, List[Mapping[str, Any]]] = {}
-
-    for row in rows:
-        t = row.get("transaction_type")
-        doc_id = _safe_str(row, "document_id")
-        rel_id = _safe_str(row, "related_document_id")
-
-        if t is None:
-            continue
-
-        if t == 850:
-            if doc_id:
-                po_by_id_mut[doc_id] = _as_readonly_row(row)
-
-        elif t == 855:
-            if rel_id:
-                ack_by_related_mut.setdefault(rel_id, []).append(_as_readonly_row(row))
-
-        elif t == 856:
-            if rel_id:
-                asn_by_related_mut.setdefault(rel_id, []).append(_as_readonly_row(row))
-
-        elif t == 810:
-            if rel_id:
-                inv_by_related_mut.setdefault(rel_id, []).append(_as_readonly_row(row))
-
-        elif t == 997:
-            if rel_id:
-                fa_by_related_mut.setdefault(rel_id, []).append(_as_readonly_row(row))
-
-    ack_by_related_ro = {k: tuple(v) for k, v in ack_by_related_mut.items()}
-    asn_by_related_ro = {k: tuple(v) for k, v in asn_by_related_mut.items()}
-    inv_by_related_ro = {k: tuple(v) for k, v in inv_by_related_mut.items()}
-    fa_by_related_ro = {k: tuple(v) for k, v in fa_by_related_mut.items()}
-
-    return LifecycleIndexes(
-        po_by_id=MappingProxyType(po_by_id_mut),
-        ack_by_related=MappingProxyType(ack_by_related_ro),
-        asn_by_related=MappingProxyType(asn_by_related_ro),
-        inv_by_related=MappingProxyType(inv_by_related_ro),
-        fa_by_related=MappingProxyType(fa_by_related_ro),
-    )
+    if isinstance(rows, RowStore):
+        positions = build_lifecycle_positions(
+            rows.column("transaction_type"),
+            rows.column("document_id"),
+            rows.column("related_document_id"),
+        )
+    else:
+        positions = build_lifecycle_positions(
+            [row.get("transaction_type") for row in rows],
+            [row.get("document_id") for row in rows],
+            [row.get("related_document_id") for row in rows],
+        )
+    return materialize_lifecycle_indexes(rows, positions)
@@ -1,14 +1,16 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, HTTPException
 from .lifecycle_models import POListItem, LifecycleResponse
 from .lifecycle_index import LifecycleIndexes, build_lifecycle_indexes
 from .lifecycle_service import build_lifecycle_response
+from .profiling import profiled
 from . import main
 
 router = APIRouter()
 
 _indexes: Optional[LifecycleIndexes] = None
 _rows_ref: Optional[List[Dict[str, Any]]] = None
+_other: Optional[Tuple[Any, LifecycleIndexes]] = None   # last non-installed rows (scripts, benchmarks)
 
 
 def _ensure_indexes() -> Optional[LifecycleIndexes]:
@@ -24,30 +26,45 @@ def _ensure_indexes() -> Optional[LifecycleIndexes]:
     return _indexes
 
 
+def indexes_for(rows) -> Optional[LifecycleIndexes]:
+    """Lifecycle indexes for rows: the installed dataset's, else built once per rows object."""
+    global _other
+    if not rows:
+        return None
+    if rows is main.edi_rows:
+        return _ensure_indexes()
+    other = _other
+    if other is None or other[0] is not rows:
+        other = _other = (rows, build_lifecycle_indexes(rows))
+    return other[1]
+
+
+def install_indexes(rows: List[Dict[str, Any]], indexes: LifecycleIndexes) -> None:
+    # Adopt indexes prebuilt by an ingest job instead of rebuilding on first request
+    global _indexes, _rows_ref
+    _indexes = indexes
+    _rows_ref = rows
+
+
 @router.get("/lifecycle/po-list")
+@profiled
 def get_po_list():
     if not main.edi_rows:
         return {"csv_loaded": False, "pos": []}
     pos: List[POListItem] = []
     for row in main.edi_rows:
-        t = row.get("transaction_type")
-        if t == "850" or t == 850:
-            doc_id = row.get("document_id")
-            if not isinstance(doc_id, str):
-                continue
-            partner = row.get("partner")
-            status = row.get("status")
-            po_date = row.get("expected_date")
+        if row["transaction_type"] == 850:
             pos.append({
-                "document_id": doc_id,
-                "partner": partner if isinstance(partner, str) else None,
-                "status": status if isinstance(status, str) else None,
-                "po_date": po_date if isinstance(po_date, str) else None,
+                "document_id": row["document_id"],
+                "partner": row["partner"],
+                "status": row["status"],
+                "po_date": row["expected_date"],
             })
     return {"csv_loaded": True, "pos": pos}
 
 
 @router.get("/lifecycle/po/{po_id}")
+@profiled
 def get_lifecycle(po_id: str) -> LifecycleResponse:
     if not main.edi_rows:
         raise HTTPException(status_code=400, detail="No CSV uploaded")
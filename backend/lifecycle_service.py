@@ -12,12 +12,9 @@ from .lifecycle_index import LifecycleIndexes
 
 # Deterministic date parser (YYYY-MM-DD only)
 def _parse_date(value: Optional[str]) -> Optional[datetime.date]:
-    if not value or not isinstance(value, str):
-        return None
-    try:
-        return datetime.strptime(value.strip(), "%Y-%m-%d").date()
-    except Exception:
+    if not value:
         return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
 
 # Extract optional csv_row_index if present
 def _get_csv_index(row: Mapping[str, Any]) -> Optional[int]:
@@ -73,13 +70,7 @@ def _choose_row(rows: Tuple[Mapping[str, Any], ...]) -> Optional[Mapping[str, An
 
 # Choose event_date string respecting deterministic rule
 def _pick_event_date(row: Mapping[str, Any]) -> Optional[str]:
-    a = row.get("actual_date")
-    if isinstance(a, str) and _parse_date(a):
-        return a
-    e = row.get("expected_date")
-    if isinstance(e, str) and _parse_date(e):
-        return e
-    return None
+    return row.get("actual_date") or row.get("expected_date")
 
 # Build LifecycleEvent from a row, or missing-step placeholder
 def _event_from_row(event_type: EventType, row: Optional[Mapping[str, Any]]) -> LifecycleEvent:
@@ -87,11 +78,11 @@ def _event_from_row(event_type: EventType, row: Optional[Mapping[str, Any]]) ->
         return LifecycleEvent(event_type=event_type)
     return LifecycleEvent(
         event_type=event_type,
-        document_id=row.get("document_id") if isinstance(row.get("document_id"), str) else None,
-        related_document_id=row.get("related_document_id") if isinstance(row.get("related_document_id"), str) else None,
-        status=row.get("status") if isinstance(row.get("status"), str) else None,
+        document_id=row.get("document_id"),
+        related_document_id=row.get("related_document_id"),
+        status=row.get("status"),
         event_date=_pick_event_date(row),
-        partner=row.get("partner") if isinstance(row.get("partner"), str) else None,
+        partner=row.get("partner"),
         evidence=Evidence(
             csv_row_index=_get_csv_index(row),
             source_fields=dict(row),
@@ -118,11 +109,7 @@ def build_lifecycle_response(indexes: LifecycleIndexes, po_id: str) -> Lifecycle
     fa_rows_all: List[Mapping[str, Any]] = []
     if inv_rows:
         for inv in inv_rows:
-            inv_id = inv.get("document_id")
-            if isinstance(inv_id, str):
-                fa_candidates = indexes.fa_by_related.get(inv_id, tuple())
-                if fa_candidates:
-                    fa_rows_all.extend(list(fa_candidates))
+            fa_rows_all.extend(indexes.fa_by_related.get(inv["document_id"], tuple()))
     selected_fa = _choose_row(tuple(fa_rows_all))
 
     events = [
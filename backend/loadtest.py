@@ -0,0 +1,416 @@
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .synthetic_data import SyntheticConfig, generate_csv, partner_names
+
+# ------------------------------------------------------------
+# Offline load-test harness
+# Starts a fake Ollama /api/generate server and the FastAPI app under
+# uvicorn, uploads a synthetic dataset, then drives a mixed workload at a
+# fixed concurrency and reports throughput and latency percentiles.
+# "upload" sends a body that differs on every request (one extra PO row),
+# so it measures a full ingest; "upload_dup" re-sends the initial file and
+# measures the content-hash dedup path.
+#
+#   python -m backend.loadtest --concurrency 16 --duration 30 --llm-latency 0.8
+#
+# The MiniLM model must already be in the local Hugging Face cache;
+# HF_HUB_OFFLINE is set for the server so nothing is downloaded.
+# ------------------------------------------------------------
+
+DEFAULT_MIX = {"ask": 0.8, "lifecycle": 0.18, "upload": 0.02, "upload_dup": 0.0}
+
+
+# =====================================================
+# FAKE OLLAMA
+# =====================================================
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    jitter = 0.1
+    failure_rate = 0.0
+    rng = random.Random(0)
+    rng_lock = Lock()
+
+    def do_POST(self):  # noqa: N802 (http.server naming)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        with self.rng_lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            fail = self.rng.random() < self.failure_rate
+        time.sleep(delay)
+
+        if self.path != "/api/generate" or fail:
+            self.send_response(500 if fail else 404)
+            self.end_headers()
+            return
+
+        try:
+            prompt = json.loads(body or b"{}").get("prompt", "")
+        except ValueError:
+            prompt = ""
+        facts = prompt.split("Facts:", 1)[-1].split("Task:", 1)[0].strip()
+        payload = json.dumps({"response": facts or "ok", "done": True}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_ollama(port: int, latency: float, jitter: float, failure_rate: float, seed: int = 0) -> ThreadingHTTPServer:
+    handler = type("FakeOllama", (_FakeOllamaHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "failure_rate": failure_rate,
+        "rng": random.Random(seed),
+        "rng_lock": Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =====================================================
+# APP SERVER
+# =====================================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port: int, ollama_url: str, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OLLAMA_URL": ollama_url,
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+    })
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=repo_root,
+        env=env,
+    )
+
+
+def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App at {base_url} did not become ready in {timeout}s")
+
+
+# =====================================================
+# WORKLOAD
+# =====================================================
+
+def _ask_questions(config: SyntheticConfig) -> List[str]:
+    partners = partner_names(max(1, config.partners))
+    po_count = max(1, config.rows // 5)
+    qs = []
+    for i in range(50):
+        n = 1001 + (i * 7919) % po_count
+        partner = partners[i % len(partners)]
+        qs.extend([
+            f"what's the status of PO{n}",
+            f"is PO{n} delayed",
+            f"lifecycle of PO{n}",
+            f"is PO{n} complete",
+            f"is invoice INV{n} overdue",
+            f"show documents from {partner}",
+        ])
+    qs.extend(["show delayed items", "which invoices are past due", "list all invoices", "what is pending"])
+    return qs
+
+
+class _Recorder:
+    def __init__(self):
+        self._lock = Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    # Nearest rank: the smallest sample with at least pct% of samples at or below it
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(pct / 100.0 * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def _pick(mix: Dict[str, float], rng: random.Random) -> str:
+    r = rng.random() * sum(mix.values())
+    for name, weight in mix.items():
+        r -= weight
+        if r <= 0:
+            return name
+    return next(iter(mix))
+
+
+def _answered(r: requests.Response) -> bool:
+    # A worker that never saw the upload (--workers>1 without a shared
+    # EDI_DATASET_DIR) answers "No CSV uploaded" with a 2xx/4xx; that is a failure
+    if r.status_code >= 500:
+        return False
+    if r.status_code in (400, 404):
+        return "No CSV uploaded" not in r.text
+    try:
+        body = r.json()
+    except ValueError:
+        return True
+    if not isinstance(body, dict):
+        return True
+    if body.get("csv_loaded") is False:
+        return False
+    answers = body.get("answers") or [body.get("answer")]
+    return not any(isinstance(a, str) and a.startswith("No CSV uploaded") for a in answers)
+
+
+def _upload_variant(base: bytes, tag: str) -> bytes:
+    # One extra PO makes the body unique, so the server cannot dedup it
+    header = base.split(b"\n", 1)[0].decode("utf-8-sig").strip().split(",")
+    row = {
+        "transaction_type": "850", "document_id": f"LT{tag}", "partner": "Load Test",
+        "status": "created", "remarks": "load-test upload",
+    }
+    return base.rstrip(b"\n") + b"\n" + ",".join(row.get(c, "") for c in header).encode() + b"\n"
+
+
+def _worker(
+    base_url: str,
+    csv_path: str,
+    mix: Dict[str, float],
+    questions: List[str],
+    po_ids: List[str],
+    recorder: _Recorder,
+    stop: Event,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    session = requests.Session()
+    with open(csv_path, "rb") as fh:
+        base = fh.read()
+    uploads = 0
+    while not stop.is_set():
+        kind = _pick(mix, rng)
+        endpoint = kind
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            if kind == "ask":
+                endpoint = "POST /ask"
+                r = session.post(f"{base_url}/ask", json={"question": rng.choice(questions)}, timeout=120)
+            elif kind == "lifecycle":
+                if rng.random() < 0.2:
+                    endpoint = "GET /lifecycle/po-list"
+                    r = session.get(f"{base_url}/lifecycle/po-list", timeout=120)
+                else:
+                    endpoint = "GET /lifecycle/po/{po_id}"
+                    r = session.get(f"{base_url}/lifecycle/po/{rng.choice(po_ids)}", timeout=120)
+            elif kind == "upload":
+                endpoint = "POST /upload-csv"
+                uploads += 1
+                r = session.post(
+                    f"{base_url}/upload-csv?wait=true",
+                    files={"file": ("load.csv", _upload_variant(base, f"{seed}-{uploads:06d}"), "text/csv")},
+                    timeout=600,
+                )
+            else:
+                endpoint = "POST /upload-csv (dedup)"
+                r = session.post(
+                    f"{base_url}/upload-csv?wait=true",
+                    files={"file": ("load.csv", base, "text/csv")},
+                    timeout=600,
+                )
+            ok = _answered(r)
+        except requests.RequestException:
+            pass
+        recorder.record(endpoint, time.perf_counter() - t0, ok)
+
+
+def run_load(
+    base_url: str,
+    csv_path: str,
+    config: SyntheticConfig,
+    concurrency: int,
+    duration: float,
+    mix: Dict[str, float],
+    seed: int,
+) -> Dict[str, Any]:
+    questions = _ask_questions(config)
+    po_ids = [f"PO{1001 + i}" for i in range(min(500, max(1, config.rows // 5)))]
+    recorder = _Recorder()
+    stop = Event()
+    threads = [
+        Thread(
+            target=_worker,
+            args=(base_url, csv_path, mix, questions, po_ids, recorder, stop, seed + i),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    endpoints: Dict[str, Any] = {}
+    total = 0
+    for endpoint, samples in sorted(recorder.latencies.items()):
+        samples.sort()
+        total += len(samples)
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(endpoint, 0),
+            "throughput_rps": len(samples) / elapsed,
+            "p50_s": _percentile(samples, 50),
+            "p95_s": _percentile(samples, 95),
+            "p99_s": _percentile(samples, 99),
+            "max_s": samples[-1],
+        }
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['requests']} requests in {report['elapsed_s']:.1f}s "
+          f"→ {report['throughput_rps']:.1f} req/s")
+    header = f"{'endpoint':<28}{'reqs':>7}{'err':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, s in report["endpoints"].items():
+        print(f"{endpoint:<28}{s['requests']:>7}{s['errors']:>6}{s['throughput_rps']:>8.1f}"
+              f"{s['p50_s'] * 1000:>7.0f}ms{s['p95_s'] * 1000:>7.0f}ms{s['p99_s'] * 1000:>7.0f}ms")
+
+
+def _parse_mix(text: Optional[str]) -> Dict[str, float]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown workload '{name}'; expected one of {sorted(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for the EDI assistant.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after the initial upload")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--partners", type=int, default=SyntheticConfig.partners)
+    parser.add_argument("--mix", help="workload weights, e.g. ask=0.8,lifecycle=0.18,upload=0.02,upload_dup=0")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--base-url", help="drive an already running app instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(rows=args.rows, partners=args.partners)
+    mix = _parse_mix(args.mix)
+
+    data_dir = tempfile.mkdtemp(prefix="edi-loadtest-")
+    csv_path = os.path.join(data_dir, "load.csv")
+    generate_csv(csv_path, config)
+
+    ollama: Optional[ThreadingHTTPServer] = None
+    app_proc: Optional[subprocess.Popen] = None
+    try:
+        if args.base_url:
+            base_url = args.base_url.rstrip("/")
+        else:
+            ollama_port = _free_port()
+            ollama = start_fake_ollama(ollama_port, args.llm_latency, args.llm_jitter, args.llm_failure_rate, args.seed)
+            app_port = _free_port()
+            app_proc = start_app(app_port, f"http://127.0.0.1:{ollama_port}/api/generate", args.workers)
+            base_url = f"http://127.0.0.1:{app_port}"
+        wait_ready(base_url)
+
+        with open(csv_path, "rb") as fh:
+            r = requests.post(
+                f"{base_url}/upload-csv?wait=true",
+                files={"file": ("load.csv", fh, "text/csv")},
+                timeout=600,
+            )
+        r.raise_for_status()
+        print(f"Uploaded {r.json().get('rows_loaded')} rows; running "
+              f"{args.concurrency} clients for {args.duration:.0f}s ...", flush=True)
+
+        report = run_load(base_url, csv_path, config, args.concurrency, args.duration, mix, args.seed)
+        report["config"] = {
+            "concurrency": args.concurrency,
+            "rows": args.rows,
+            "mix": mix,
+            "workers": args.workers,
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "llm_failure_rate": args.llm_failure_rate,
+        }
+        _print_report(report)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+    finally:
+        if app_proc is not None:
+            app_proc.terminate()
+            try:
+                app_proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app_proc.kill()
+        if ollama is not None:
+            ollama.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    _main()
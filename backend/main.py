@@ -1,11 +1,51 @@
-from fastapi import FastAPI, UploadFile, File
+import os
+import time
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from .csv_utils import parse_csv
-from .embeddings import generate_embeddings
-from .rag_service import answer_question
+from .dataset_index import build_dataset_indexes, columns_from_rows
+from .embeddings import quantize
+from . import dataset_store, precompute, warm_cache
+from .intent_router import classify_intent, clear_intent_cache, encode_texts, warm_up_classifier
+from .lifecycle_index import materialize_lifecycle_indexes
+from .ingest_jobs import IngestQueueFull, get_job, shutdown_pool, submit_upload, wait_for_job
+from .rag_service import (
+    answer_question,
+    answer_questions,
+    answer_structured,
+    clear_result_cache,
+    list_query,
+    run_result_query,
+)
+from .result_sets import (
+    EXPORT_FORMATS,
+    RESULTS_PAGE_SIZE,
+    export_columns,
+    iter_export,
+    page as result_page,
+)
+from .row_store import RowStore
 from .ai_explainer import explain_facts  # 🔑 keep AI warm-up
+from .metrics import Histogram, render_prometheus, stage
+from .profiling import (
+    PROFILE_ADMIN_TOKEN,
+    PROFILE_BUFFER_SIZE,
+    PROFILE_HEADER,
+    PROFILE_ID_HEADER,
+    PROFILE_SAMPLE_RATE,
+    authorized,
+    begin_profile_request,
+    get_profile,
+    list_profiles,
+    profile_trigger,
+    profiled,
+)
 
 app = FastAPI(title="RAG-Based EDI Assistant")
 
@@ -18,57 +58,441 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_REQUEST_SECONDS = Histogram(
+    "edi_http_request_seconds",
+    "HTTP request latency per endpoint.",
+    ("method", "route", "status"),
+)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = "500"
+    try:
+        with precompute.live_request():
+            response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        # Label by route template (/upload-jobs/{job_id}), not the raw path
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - t0,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+
+@app.middleware("http")
+async def mark_profiled_requests(request: Request, call_next):
+    # Off by default: only X-Profile with the admin token or PROFILE_SAMPLE_RATE turn it on
+    trigger = profile_trigger(request.headers.get(PROFILE_HEADER))
+    if trigger is None:
+        return await call_next(request)
+    profile = begin_profile_request(trigger, request.method, request.url.path)
+    response = await call_next(request)
+    if profile["profile_id"]:
+        response.headers[PROFILE_ID_HEADER] = profile["profile_id"]
+    return response
+
+
+@app.middleware("http")
+async def attach_latest_dataset(request: Request, call_next):
+    # Multi-worker mode: pick up a snapshot another worker committed
+    if dataset_store.enabled() and dataset_store.current_version() != edi_shared_version:
+        await run_in_threadpool(attach_shared_dataset)
+    return await call_next(request)
+
+
+@app.on_event("startup")
+def start_classifier_warm_up():
+    warm_cache.start()
+    Thread(target=warm_up_classifier, daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_ingest_workers():
+    shutdown_pool()
+    warm_cache.stop()
+
+
 # In-memory storage
 edi_rows = []
 edi_row_embeddings = None   # 🔑 IMPORTANT: start as None
+edi_indexes = None          # DatasetIndexes for edi_rows (partners, ...)
+edi_dataset_version = 0
+edi_dataset_hash = None     # sha256 of the file edi_rows came from, when known
+edi_shared_version = None   # snapshot version attached from EDI_DATASET_DIR
+_attach_lock = Lock()
+_embeddings_lock = Lock()   # one value encode per dataset, however many requests need it
+
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "256"))
 
 
 class QuestionRequest(BaseModel):
     question: str
 
 
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    explain: bool = True
+
+
+class ExportRequest(BaseModel):
+    question: str
+    format: str = "ndjson"
+    columns: Optional[str] = None   # comma-separated projection
+
+
+class StructuredQueryRequest(BaseModel):
+    intent: str
+    entities: Dict[str, Any] = {}
+    explain: bool = False            # run the LLM explanation over the facts
+    page_size: int = RESULTS_PAGE_SIZE
+
+
 @app.get("/")
 def root():
     return {"message": "RAG EDI Assistant backend running"}
 
 
-@app.post("/upload-csv")
-def upload_csv(file: UploadFile = File(...)):
-    global edi_rows, edi_row_embeddings
+@app.get("/results/{query}")
+@profiled
+def results(query: str, request: Request, page: int = 1, page_size: int = RESULTS_PAGE_SIZE):
+    """
+    Pages through the full list behind a summarized answer (the facts
+    point here, e.g. /results/delayed?basis=date).
+    """
+    if not edi_rows:
+        raise HTTPException(status_code=404, detail="No CSV uploaded yet")
+    params = {k: v for k, v in request.query_params.items() if k not in ("page", "page_size")}
+    try:
+        result = run_result_query(query, params, edi_rows, edi_indexes)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown result query '{query}'")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return result_page(edi_rows, result, page, page_size)
+
+
+def _export_response(query: str, params: dict, fmt: str, columns: Optional[str]) -> StreamingResponse:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    rows = edi_rows   # the stream keeps reading this dataset even if a new one is installed
+    try:
+        result = run_result_query(query, params, rows, edi_indexes)
+        selected = export_columns(rows, columns)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown result query '{query}'")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(
+        iter_export(rows, result, fmt, selected),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{query}.{fmt}"',
+            "X-Result-Total": str(result.total),
+        },
+    )
+
+
+@app.get("/export/{query}")
+def export_results(query: str, request: Request, format: str = "ndjson", columns: Optional[str] = None):
+    """
+    Streams every row of a result query (same parameters as /results) as
+    NDJSON or CSV, optionally projected to ?columns=a,b.
+    """
+    if not edi_rows:
+        raise HTTPException(status_code=404, detail="No CSV uploaded yet")
+    params = {k: v for k, v in request.query_params.items() if k not in ("format", "columns")}
+    return _export_response(query, params, format, columns)
+
+
+@app.post("/export")
+def export_question(req: ExportRequest):
+    """
+    Routes the question like /ask and streams the full list behind its
+    answer.
+    """
+    if not edi_rows:
+        raise HTTPException(status_code=404, detail="No CSV uploaded yet")
+    routed = classify_intent(req.question)
+    target = list_query(routed["intent"], routed["entities"])
+    if target is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Questions routed to {routed['intent']} do not produce a document list",
+        )
+    query, params = target
+    return _export_response(query, params, req.format, req.columns)
+
+
+@app.get("/dataset/memory")
+def dataset_memory():
+    if not isinstance(edi_rows, RowStore):
+        return {"csv_loaded": bool(edi_rows), "rows": len(edi_rows)}
+    return {
+        "csv_loaded": True,
+        "dataset_version": edi_dataset_version,
+        "shared_snapshot": edi_shared_version,
+        **edi_rows.memory_report(),
+        "embeddings": None if edi_row_embeddings is None else {
+            "vectors": len(edi_row_embeddings),
+            "precision": edi_row_embeddings.precision,
+            "bytes": edi_row_embeddings.nbytes,
+        },
+    }
+
+
+@app.get("/precompute/status")
+def precompute_status():
+    return precompute.status()
+
 
-    edi_rows = parse_csv(file)
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if PROFILE_ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Profile admin is disabled; set PROFILE_ADMIN_TOKEN")
+    if not authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/profiles")
+def admin_profiles(x_admin_token: Optional[str] = Header(None)):
+    """
+    Request profiles captured by this worker, newest first.
+    """
+    _require_admin(x_admin_token)
+    return {
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "buffer_size": PROFILE_BUFFER_SIZE,
+        "profiles": list_profiles(),
+    }
+
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_profile(profile_id: str, format: str = "json", x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return PlainTextResponse(profile["text"])
+    return {k: v for k, v in profile.items() if k != "text"}
+
+
+def install_dataset(rows, indexes=None, version=None, row_embeddings=None, content_hash=None):
+    """
+    Swaps in a freshly ingested dataset (called by ingest jobs). A reused
+    dataset brings the embeddings computed for it earlier.
+    """
+    global edi_rows, edi_row_embeddings, edi_indexes, edi_dataset_version, edi_dataset_hash
+
+    if indexes is None:
+        indexes = build_dataset_indexes(columns_from_rows(rows))
+    edi_indexes = indexes
+    edi_rows = rows
+    # Cached entities (partners, ambiguous ids) were resolved against the old data
+    clear_intent_cache()
+    clear_result_cache()
+    edi_dataset_hash = content_hash
+    warm_cache.restore_intents(content_hash)
 
     # 🔑 defer embeddings (major speed win)
-    edi_row_embeddings = None
+    edi_row_embeddings = row_embeddings
+    edi_dataset_version = version if version is not None else edi_dataset_version + 1
+    precompute.schedule(rows, indexes, edi_dataset_version)
+
 
-    # 🔥 AI warm-up (kept, safe)
+def attach_shared_dataset(version=None) -> bool:
+    """
+    Installs a committed snapshot (default: the newest) when it is newer
+    than the one this worker holds. Row arrays are mmap'd, not copied.
+    """
+    global edi_shared_version
+    version = version or dataset_store.current_version()
+    with _attach_lock:
+        if version is None or (edi_shared_version is not None and version <= edi_shared_version):
+            return False
+        # May come back newer than asked for, if that version was pruned
+        snapshot = dataset_store.load(version)
+        lifecycle_routes.install_indexes(
+            snapshot.rows,
+            materialize_lifecycle_indexes(snapshot.rows, snapshot.lifecycle_positions),
+        )
+        install_dataset(
+            snapshot.rows, snapshot.dataset_indexes, version=snapshot.version,
+            content_hash=snapshot.content_hash,
+        )
+        edi_shared_version = snapshot.version
+    return True
+
+
+def _ensure_row_embeddings():
+    global edi_row_embeddings
+    # 🔥 lazy embeddings for hybrid retrieval: one vector per distinct field
+    # value (see retrieval_index), computed once per dataset and shared
+    # between workers
+    if edi_indexes is None:
+        return None
+    if edi_row_embeddings is not None:
+        return edi_row_embeddings
+    with _embeddings_lock:
+        # Re-read: the encode we waited on may have finished, or a newer dataset arrived
+        indexes = edi_indexes
+        if indexes is None or edi_row_embeddings is not None:
+            return edi_row_embeddings
+        texts = indexes.retrieval.value_texts()
+        if edi_shared_version is not None:
+            shared = dataset_store.load_embeddings(edi_shared_version)
+            if shared is not None and len(shared) == len(texts):
+                edi_row_embeddings = shared
+                return shared
+        vectors = quantize(encode_texts(texts))   # EMBEDDING_PRECISION
+        if indexes is not edi_indexes:
+            return vectors   # a newer dataset was installed meanwhile
+        edi_row_embeddings = vectors
+        if edi_shared_version is not None:
+            dataset_store.save_embeddings(edi_shared_version, edi_row_embeddings)
+    return edi_row_embeddings
+
+
+def warm_up_retrieval():
+    # Encodes the new dataset's values on the ingest callback thread
     try:
-        explain_facts("warmup")
+        _ensure_row_embeddings()
     except Exception:
         pass
 
+
+def warm_up_explainer():
+    # 🔥 AI warm-up (kept, safe) — runs on the ingest callback thread, not the request
+    try:
+        explain_facts("warmup", use_cache=False)
+    except Exception:
+        pass
+
+
+@app.post("/upload-csv")
+def upload_csv(file: UploadFile = File(...), wait: bool = False):
+    try:
+        job = submit_upload(file)
+    except IngestQueueFull as exc:
+        raise HTTPException(status_code=429, detail=f"Too many ingest jobs in progress: {exc}")
+
+    if job.dedup is not None:
+        # Same content as an already built dataset: nothing was re-parsed
+        return {
+            "message": "CSV already indexed; reused the existing dataset",
+            "rows_loaded": job.rows_loaded,
+            "rejected_rows": job.rejected,
+            "job_id": job.job_id,
+            "dedup_hit": True,
+            "dedup": job.dedup,
+        }
+
+    if not wait:
+        return {
+            "message": "CSV upload queued for indexing",
+            "job_id": job.job_id,
+            "status_url": f"/upload-jobs/{job.job_id}",
+            "dedup_hit": False,
+        }
+
+    job = wait_for_job(job.job_id)
+    if job is None or job.status != "done":
+        raise HTTPException(status_code=400, detail=f"CSV ingest failed: {job.error if job else 'job lost'}")
+
     return {
         "message": "CSV uploaded and indexed successfully",
-        "rows_loaded": len(edi_rows),
+        "rows_loaded": job.rows_loaded,
+        "rejected_rows": job.rejected,
+        "job_id": job.job_id,
+        "dedup_hit": False,
     }
 
 
+@app.get("/upload-jobs/{job_id}")
+def upload_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
+
+
 @app.post("/ask")
+@profiled
 def ask(req: QuestionRequest):
-    global edi_row_embeddings
-
     if not edi_rows:
         return {"answer": "No CSV uploaded yet"}
 
-    # 🔥 lazy embeddings (generated once, only if needed)
-    if edi_row_embeddings is None:
-        row_texts = [str(row) for row in edi_rows]
-        edi_row_embeddings = generate_embeddings(row_texts)
-
     answer = answer_question(
         question=req.question,
         rows=edi_rows,
-        row_embeddings=edi_row_embeddings,
+        row_embeddings=_ensure_row_embeddings,   # encoded only if an UNKNOWN question needs it
+        indexes=edi_indexes,
+    )
+
+    with stage("serialize"):
+        response = JSONResponse({"answer": answer})
+    return response
+
+
+@app.post("/query")
+@profiled
+def structured_query(req: StructuredQueryRequest):
+    """
+    Answers an intent + entities pair without classifying a question
+    (entities as /ask would extract them, e.g. {"intent": "LIST_DOCUMENTS",
+    "entities": {"document_type": "ASN", "status": "pending"}}). Returns
+    the facts and the rows or counts behind them; "answer" only with
+    explain=true.
+    """
+    if not edi_rows:
+        raise HTTPException(status_code=404, detail="No CSV uploaded yet")
+    try:
+        response = answer_structured(
+            req.intent, req.entities, edi_rows, edi_indexes,
+            explain=req.explain, page_size=req.page_size,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    with stage("serialize"):
+        return JSONResponse(response)
+
+
+@app.post("/ask/batch")
+@profiled
+def ask_batch(req: BatchQuestionRequest):
+    if len(req.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch",
+        )
+    if not edi_rows:
+        return {"answers": ["No CSV uploaded yet"] * len(req.questions), "count": len(req.questions)}
+
+    t0 = time.perf_counter()
+    answers = answer_questions(
+        req.questions,
+        rows=edi_rows,
+        indexes=edi_indexes,
+        explain=req.explain,
+        row_embeddings=_ensure_row_embeddings,   # encoded only if an UNKNOWN question needs it
     )
+    elapsed = time.perf_counter() - t0
 
-    return {"answer": answer}
+    with stage("serialize"):
+        response = JSONResponse({
+            "answers": answers,
+            "count": len(answers),
+            "elapsed_s": round(elapsed, 4),
+            "questions_per_s": round(len(answers) / elapsed, 1) if elapsed > 0 else None,
+        })
+    return response
@@ -0,0 +1,182 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ------------------------------------------------------------
+# Minimal in-process metrics with Prometheus text exposition.
+# Counters and histograms only; no external client library needed.
+# ------------------------------------------------------------
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+_registry: List["_Metric"] = []
+_registry_lock = Lock()
+
+# Per-request stage durations, filled by stage() and read by the caller
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, val in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(val)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key → [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            series[idx] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+def render_prometheus() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =====================================================
+# REQUEST STAGE TIMING
+# =====================================================
+
+STAGE_SECONDS = Histogram(
+    "edi_stage_seconds",
+    "Time spent per processing stage.",
+    ("stage", "intent"),
+)
+
+
+def begin_request_stages() -> Dict[str, float]:
+    stages: Dict[str, float] = {}
+    _request_stages.set(stages)
+    return stages
+
+
+def current_request_stages() -> Optional[Dict[str, float]]:
+    return _request_stages.get()
+
+
+@contextmanager
+def stage(name: str, intent: str = "") -> Iterator[None]:
+    """
+    Times one stage into edi_stage_seconds and, when a request is being
+    tracked, into that request's stage breakdown.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=name, intent=intent)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
@@ -0,0 +1,139 @@
+import re
+from collections import Counter as _Counter
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ------------------------------------------------------------
+# Partner dictionary built at ingest
+# Canonical partner names, normalized aliases, a trigram index for
+# typo-tolerant lookups and partner → row positions (per transaction
+# type), so partner listings cost O(matches) instead of a column scan.
+# ------------------------------------------------------------
+
+FUZZY_MIN_RATIO = 0.85    # SequenceMatcher ratio needed for a typo match
+FUZZY_MIN_LENGTH = 5      # normalized keys shorter than this only match exactly
+FUZZY_MIN_OVERLAP = 0.45  # trigram Dice overlap needed before the ratio check
+MAX_NAME_WORDS = 6        # longest word window tried when scanning question text
+
+_WORD_RE = re.compile(r"[A-Za-z0-9&'\-]+")
+
+
+def normalize_partner(name: Any) -> str:
+    """
+    "Home Depot", "HomeDepot" and "home-depot" all normalize to "homedepot".
+    """
+    if not name:
+        return ""
+    return re.sub(r"[^0-9a-z]", "", name.casefold())
+
+
+def _trigrams(key: str) -> set:
+    padded = f"${key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class PartnerIndex:
+    canonical_by_key: Dict[str, str]                      # normalized alias → canonical name
+    trigrams: Dict[str, Tuple[str, ...]]                  # trigram → normalized keys
+    rows: Dict[str, np.ndarray]                           # canonical → row positions (ascending)
+    rows_by_type: Dict[str, Dict[Any, np.ndarray]]        # canonical → transaction_type → row positions
+
+    def _fuzzy(self, key: str) -> Optional[Tuple[float, str]]:
+        if len(key) < FUZZY_MIN_LENGTH:
+            return None
+        shared = _Counter()
+        for gram in _trigrams(key):
+            for candidate in self.trigrams.get(gram, ()):
+                shared[candidate] += 1
+        best: Optional[Tuple[float, str]] = None
+        # Verify only the few keys that share the most trigrams
+        for candidate, count in shared.most_common(8):
+            if 2 * count / (len(key) + len(candidate)) < FUZZY_MIN_OVERLAP:
+                continue
+            ratio = SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= FUZZY_MIN_RATIO and (best is None or ratio > best[0]):
+                best = (ratio, candidate)
+        return best
+
+    def resolve(self, name: Any) -> Optional[str]:
+        """
+        Maps a user-supplied partner string to its canonical name,
+        exact (normalized) first, then typo-tolerant.
+        """
+        key = normalize_partner(name)
+        if not key:
+            return None
+        canonical = self.canonical_by_key.get(key)
+        if canonical is not None:
+            return canonical
+        fuzzy = self._fuzzy(key)
+        return self.canonical_by_key[fuzzy[1]] if fuzzy else None
+
+    def find_in_text(self, text: str) -> Optional[str]:
+        """
+        Finds a partner mentioned anywhere in free text. Longer word
+        windows win, exact matches win over fuzzy ones.
+        """
+        words = _WORD_RE.findall(text or "")
+        if not words or not self.canonical_by_key:
+            return None
+        spans = range(min(MAX_NAME_WORDS, len(words)), 0, -1)
+
+        for n in spans:
+            for i in range(len(words) - n + 1):
+                canonical = self.canonical_by_key.get(normalize_partner("".join(words[i:i + n])))
+                if canonical is not None:
+                    return canonical
+
+        best: Optional[Tuple[float, str]] = None
+        for n in spans:
+            for i in range(len(words) - n + 1):
+                fuzzy = self._fuzzy(normalize_partner("".join(words[i:i + n])))
+                if fuzzy and (best is None or fuzzy[0] > best[0]):
+                    best = fuzzy
+        return self.canonical_by_key[best[1]] if best else None
+
+    def positions(self, canonical: str, transaction_type: Any = None) -> np.ndarray:
+        """Row positions of a canonical partner's documents, optionally of one type."""
+        if transaction_type is None:
+            found = self.rows.get(canonical)
+        else:
+            found = self.rows_by_type.get(canonical, {}).get(transaction_type)
+        return found if found is not None else np.empty(0, dtype=np.int32)
+
+
+def build_partner_index(partners: List[Any], transaction_types: List[Any]) -> PartnerIndex:
+    canonical_by_key: Dict[str, str] = {}
+    rows: Dict[str, List[int]] = {}
+    rows_by_type: Dict[str, Dict[Any, List[int]]] = {}
+
+    for pos, (partner, t) in enumerate(zip(partners, transaction_types)):
+        key = normalize_partner(partner)
+        if not key:
+            continue
+        canonical = canonical_by_key.get(key)
+        if canonical is None:
+            # First spelling seen in the CSV becomes the canonical name
+            canonical = partner
+            canonical_by_key[key] = canonical
+        rows.setdefault(canonical, []).append(pos)
+        rows_by_type.setdefault(canonical, {}).setdefault(t, []).append(pos)
+
+    trigrams: Dict[str, List[str]] = {}
+    for key in canonical_by_key:
+        for gram in _trigrams(key):
+            trigrams.setdefault(gram, []).append(key)
+
+    return PartnerIndex(
+        canonical_by_key=canonical_by_key,
+        trigrams={g: tuple(keys) for g, keys in trigrams.items()},
+        rows={p: np.asarray(found, dtype=np.int32) for p, found in rows.items()},
+        rows_by_type={
+            p: {t: np.asarray(found, dtype=np.int32) for t, found in by_t.items()}
+            for p, by_t in rows_by_type.items()
+        },
+    )
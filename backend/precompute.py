@@ -0,0 +1,222 @@
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from threading import Lock, Thread
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .ai_explainer import EXPLAIN_CACHE_LOOKUPS, cached_explanation, explain_facts
+from .metrics import Counter
+
+# ------------------------------------------------------------
+# Idle-time precomputation for hot documents
+# After a dataset is installed, a background thread builds the facts
+# /ask would produce for the documents most questions are about:
+#   - overdue invoices: status, overdue (served only on the day built)
+#   - open POs (no paid invoice plus received FA yet), latest expected
+#     date first: status, lifecycle, completion
+# answer_question serves those facts instead of running the query, and
+# a second pass warms the explanation cache with them.
+#
+# Work only runs once no live request has been in flight for
+# PRECOMPUTE_IDLE_SECONDS and re-checks before every fact and every
+# explanation. Facts come from the ingest-time indexes (well under a
+# millisecond each), so a live request waits at most that long; an LLM
+# call already sent is not interrupted. PRECOMPUTE_MAX_DOCUMENTS / PRECOMPUTE_MAX_EXPLANATIONS
+# bound the work per dataset; 0 turns that stage off.
+# ------------------------------------------------------------
+
+PRECOMPUTE_MAX_DOCUMENTS = int(os.getenv("PRECOMPUTE_MAX_DOCUMENTS", "200"))
+PRECOMPUTE_MAX_EXPLANATIONS = int(os.getenv("PRECOMPUTE_MAX_EXPLANATIONS", "50"))
+PRECOMPUTE_IDLE_SECONDS = float(os.getenv("PRECOMPUTE_IDLE_SECONDS", "0.5"))
+_POLL_SECONDS = 0.05
+
+INVOICE_INTENTS = ("GET_STATUS", "CHECK_OVERDUE")
+PO_INTENTS = ("GET_STATUS", "GET_LIFECYCLE", "CHECK_COMPLETION")
+PRECOMPUTED_INTENTS = frozenset(INVOICE_INTENTS + PO_INTENTS)
+# Facts that read today's date are only served on the day they were built
+DATED_INTENTS = frozenset({"CHECK_OVERDUE"})
+
+PRECOMPUTE_ITEMS = Counter(
+    "edi_precompute_items_total",
+    "Facts and explanations built by idle-time precomputation.",
+    ("kind",),
+)
+PRECOMPUTED_FACTS_SERVED = Counter(
+    "edi_precomputed_facts_served_total",
+    "Live answers whose facts came from idle-time precomputation, by intent.",
+    ("intent",),
+)
+
+
+@dataclass
+class PrecomputeRun:
+    rows: Any
+    indexes: Any
+    dataset_version: int
+    status: str = "waiting"        # waiting | facts | explanations | done | superseded | failed
+    documents: int = 0
+    explanations: int = 0
+    # (intent, document ID) → (facts, ordinal of the day built for DATED_INTENTS, else None)
+    facts: Dict[Tuple[str, str], Tuple[str, Optional[int]]] = field(default_factory=dict, repr=False)
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+_current: Optional[PrecomputeRun] = None
+_live_requests = 0
+_last_live = 0.0
+_live_lock = Lock()
+
+
+@contextmanager
+def live_request() -> Iterator[None]:
+    """Marks a live request in flight; precomputation waits for none."""
+    global _live_requests, _last_live
+    with _live_lock:
+        _live_requests += 1
+    try:
+        yield
+    finally:
+        with _live_lock:
+            _live_requests -= 1
+            _last_live = time.monotonic()
+
+
+def _idle() -> bool:
+    with _live_lock:
+        return _live_requests == 0 and time.monotonic() - _last_live >= PRECOMPUTE_IDLE_SECONDS
+
+
+def _wait_for_idle(run: PrecomputeRun) -> bool:
+    # False once a newer dataset has replaced this run
+    while run is _current:
+        if _idle():
+            return True
+        time.sleep(_POLL_SECONDS)
+    return False
+
+
+def _open_pos(lifecycle, rows, indexes) -> Iterator[str]:
+    # Same rule as CHECK_COMPLETION: complete once a related invoice is
+    # paid and an FA for one of the related invoices was received
+    positions = indexes.dates.range("expected_date", transaction_type=850)
+    for pos in positions[::-1]:
+        po_id = rows[int(pos)]["document_id"]
+        invoices = lifecycle.inv_by_related.get(po_id, ()) if lifecycle else ()
+        paid = any(inv.get("status") == "paid" for inv in invoices)
+        fa_received = any(
+            fa.get("status") == "received"
+            for inv in invoices
+            for fa in lifecycle.fa_by_related.get(inv["document_id"], ())
+        )
+        if not (paid and fa_received):
+            yield po_id
+
+
+def _hot_documents(run: PrecomputeRun) -> Iterator[Tuple[str, Tuple[str, ...]]]:
+    from . import lifecycle_routes
+    from .rag_service import run_result_query
+
+    overdue = run_result_query("overdue", {}, run.rows, run.indexes)
+    for pos in overdue.positions:
+        yield run.rows[int(pos)]["document_id"], INVOICE_INTENTS
+    lifecycle = lifecycle_routes.indexes_for(run.rows)
+    for po_id in _open_pos(lifecycle, run.rows, run.indexes):
+        yield po_id, PO_INTENTS
+
+
+def _build_facts(run: PrecomputeRun, doc_id: str, intents: Tuple[str, ...]) -> bool:
+    # False once the run was superseded part-way through the document
+    from .rag_service import _answer_routed, clean_id
+
+    for intent in intents:
+        if not _wait_for_idle(run):
+            return False
+        day = date.today().toordinal() if intent in DATED_INTENTS else None
+        facts = _answer_routed("", run.rows, intent, {"document_id": doc_id}, run.indexes, explain=lambda f: f)
+        run.facts[(intent, clean_id(doc_id))] = (facts, day)
+        PRECOMPUTE_ITEMS.inc(kind="facts")
+    return True
+
+
+def _run(run: PrecomputeRun) -> None:
+    try:
+        if PRECOMPUTE_MAX_DOCUMENTS > 0 and _wait_for_idle(run):
+            run.status = "facts"
+            for doc_id, intents in _hot_documents(run):
+                if run.documents >= PRECOMPUTE_MAX_DOCUMENTS or not _build_facts(run, doc_id, intents):
+                    break
+                run.documents += 1
+
+        if PRECOMPUTE_MAX_EXPLANATIONS > 0 and run is _current:
+            run.status = "explanations"
+            for facts in dict.fromkeys(facts for facts, _ in run.facts.values()):
+                if run.explanations >= PRECOMPUTE_MAX_EXPLANATIONS or not _wait_for_idle(run):
+                    break
+                if cached_explanation(facts) is not None:
+                    continue
+                explain_facts(facts, precompute=True)
+                if cached_explanation(facts) is None:
+                    break   # the LLM is unavailable; live traffic will fall back too
+                run.explanations += 1
+                PRECOMPUTE_ITEMS.inc(kind="explanation")
+        run.status = "done" if run is _current else "superseded"
+    except Exception as exc:
+        run.status = "failed"
+        run.error = str(exc) or exc.__class__.__name__
+    finally:
+        run.finished_at = time.time()
+
+
+def schedule(rows, indexes, dataset_version: int) -> None:
+    """Starts precomputing for a newly installed dataset, abandoning the previous run."""
+    global _current
+    run = PrecomputeRun(rows=rows, indexes=indexes, dataset_version=dataset_version)
+    _current = run
+    if rows and indexes is not None and (PRECOMPUTE_MAX_DOCUMENTS > 0 or PRECOMPUTE_MAX_EXPLANATIONS > 0):
+        Thread(target=_run, args=(run,), name="precompute", daemon=True).start()
+    else:
+        run.status = "done"
+        run.finished_at = run.started_at
+
+
+def precomputed_facts(rows, intent: str, doc_id: Optional[str]) -> Optional[str]:
+    """Facts built ahead of time for (intent, cleaned document ID), if any."""
+    run = _current
+    if run is None or run.rows is not rows or intent not in PRECOMPUTED_INTENTS or not doc_id:
+        return None
+    entry = run.facts.get((intent, doc_id))
+    if entry is None:
+        return None
+    facts, day = entry
+    if day is not None and day != date.today().toordinal():
+        return None
+    PRECOMPUTED_FACTS_SERVED.inc(intent=intent)
+    return facts
+
+
+def status() -> Dict[str, Any]:
+    run = _current
+    served: List[float] = [PRECOMPUTED_FACTS_SERVED.value(intent=i) for i in sorted(PRECOMPUTED_INTENTS)]
+    return {
+        "status": run.status if run else "idle",
+        "dataset_version": run.dataset_version if run else None,
+        "documents": run.documents if run else 0,
+        "facts": len(run.facts) if run else 0,
+        "explanations": run.explanations if run else 0,
+        "started_at": run.started_at if run else None,
+        "finished_at": run.finished_at if run else None,
+        "error": run.error if run else None,
+        "budget": {
+            "max_documents": PRECOMPUTE_MAX_DOCUMENTS,
+            "max_explanations": PRECOMPUTE_MAX_EXPLANATIONS,
+            "idle_seconds": PRECOMPUTE_IDLE_SECONDS,
+        },
+        "served": {
+            "facts": int(sum(served)),
+            "explanations": int(EXPLAIN_CACHE_LOOKUPS.value(result="precomputed")),
+        },
+    }
@@ -0,0 +1,166 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import Counter
+
+# ------------------------------------------------------------
+# Opt-in per-request profiling
+# A request is profiled when its X-Profile header carries the admin
+# token or it is picked by PROFILE_SAMPLE_RATE. Both are off by default,
+# and an unprofiled request only pays one header lookup and one
+# ContextVar read. Without PROFILE_ADMIN_TOKEN the header is ignored and
+# /admin/profiles refuses every request: profiles expose file paths,
+# request paths and stack text.
+#
+# Sync endpoints run in the threadpool and cProfile is per-thread, so
+# the middleware only marks the request; the @profiled endpoint wrapper
+# profiles the handler in its own thread. Work handed to other threads
+# (the encode micro-batcher, batch explain workers) shows up as time
+# spent waiting on their futures.
+#
+# The last PROFILE_BUFFER_SIZE profiles are kept in memory per process
+# and served by /admin/profiles.
+# ------------------------------------------------------------
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "40"))
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN") or None   # unset: admin access closed
+
+PROFILES_CAPTURED = Counter(
+    "edi_profiles_captured_total",
+    "Request profiles captured, by trigger.",
+    ("trigger",),
+)
+
+_profiles: deque = deque(maxlen=max(1, PROFILE_BUFFER_SIZE))
+_profiles_lock = Lock()
+
+# Set by the middleware for a request that should be profiled; the
+# wrapper writes the captured profile id back into the same dict
+_profile_request: ContextVar[Optional[Dict[str, Any]]] = ContextVar("profile_request", default=None)
+
+
+def authorized(token: Optional[str]) -> bool:
+    # Closed unless a token is configured and matches
+    if PROFILE_ADMIN_TOKEN is None or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+
+def profile_trigger(header: Optional[str]) -> Optional[str]:
+    """
+    "header" / "sampled" when this request should be profiled, else None.
+    """
+    if header is not None and authorized(header):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def begin_profile_request(trigger: str, method: str, path: str) -> Dict[str, Any]:
+    request = {"trigger": trigger, "method": method, "path": path, "profile_id": None}
+    _profile_request.set(request)
+    return request
+
+
+def _top_functions(stats: pstats.Stats) -> List[Dict[str, Any]]:
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": name,
+            "location": f"{filename}:{line}",
+            "calls": calls,
+            "tottime_s": round(tottime, 6),
+            "cumtime_s": round(cumtime, 6),
+        })
+    rows.sort(key=lambda r: -r["cumtime_s"])
+    return rows[:PROFILE_TOP_FUNCTIONS]
+
+
+def _store(request: Dict[str, Any], endpoint: str, profiler: cProfile.Profile, started: float, elapsed: float) -> str:
+    stats = pstats.Stats(profiler)
+    text = io.StringIO()
+    stats.stream = text
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    profile_id = uuid.uuid4().hex[:16]
+    entry = {
+        "profile_id": profile_id,
+        "endpoint": endpoint,
+        "method": request["method"],
+        "path": request["path"],
+        "trigger": request["trigger"],
+        "pid": os.getpid(),
+        "started_at": started,
+        "duration_s": round(elapsed, 6),
+        "total_calls": stats.total_calls,
+        "top": _top_functions(stats),
+        "text": text.getvalue(),
+    }
+    with _profiles_lock:
+        _profiles.append(entry)
+    PROFILES_CAPTURED.inc(trigger=request["trigger"])
+    return profile_id
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Endpoint wrapper: runs fn under cProfile when the middleware marked the
+    request, otherwise calls it directly.
+    """
+    endpoint = fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        request = _profile_request.get()
+        if request is None:
+            return fn(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            return fn(*args, **kwargs)
+        started = time.time()
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            request["profile_id"] = _store(request, endpoint, profiler, started, time.perf_counter() - t0)
+
+    return wrapper
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Newest first, without the per-function detail."""
+    with _profiles_lock:
+        entries = list(_profiles)
+    return [
+        {k: v for k, v in entry.items() if k not in ("top", "text")}
+        for entry in reversed(entries)
+    ]
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    with _profiles_lock:
+        return next((e for e in _profiles if e["profile_id"] == profile_id), None)
+
+
+def clear_profiles() -> None:
+    with _profiles_lock:
+        _profiles.clear()
@@ -1,7 +1,43 @@
 from .ai_explainer import explain_facts
-from .intent_router import classify_intent
+from .dataset_index import build_dataset_indexes, columns_from_rows
+from .date_index import DATE_INDEX_COLUMNS
+from .edi_schema import TYPE_CODES, TYPE_LABELS
+from .intent_router import INTENTS, classify_intent, classify_intents, embed_question
+from .metrics import Histogram, STAGE_SECONDS, begin_request_stages, stage
+from .partner_index import normalize_partner
+from .precompute import precomputed_facts
+from .result_sets import (
+    FACT_TOKEN_BUDGET,
+    RESULTS_PAGE_SIZE,
+    ResultSet,
+    describe_typed_document,
+    page as result_page,
+    render_facts,
+    value_counts,
+)
+from .row_store import MISSING_ORDINAL, RowStore
+import logging
+import os
 import re
-from datetime import datetime
+import time
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Parallel explain calls for one /ask/batch request
+BATCH_EXPLAIN_CONCURRENCY = int(os.getenv("BATCH_EXPLAIN_CONCURRENCY", "4"))
+# Rows passed as facts for free-text questions (hybrid retrieval)
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+ASK_SECONDS = Histogram(
+    "edi_answer_seconds",
+    "End-to-end answer_question latency per routed intent.",
+    ("intent",),
+)
 
 
 # =====================================================
@@ -14,13 +50,18 @@ def clean_id(text: str) -> str:
     return re.sub(r"[^A-Za-z0-9]", "", text).upper()
 
 
+def _rows_with(rows, column: str, value) -> list:
+    # RowStore compares column codes directly instead of scanning row views
+    if isinstance(rows, RowStore):
+        return rows.select(column, value)
+    return [r for r in rows if r.get(column) == value]
+
+
 def parse_date(date_str):
-    if not date_str or not isinstance(date_str, str):
-        return None
-    try:
-        return datetime.strptime(date_str.strip(), "%Y-%m-%d").date()
-    except Exception:
+    # Dates are validated "YYYY-MM-DD" strings or None (see edi_schema)
+    if not date_str:
         return None
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
 
 
 # =====================================================
@@ -40,27 +81,617 @@ def is_date_overdue(row):
         return False
     if not expected or actual:
         return False
-    if str(row.get("status", "")).lower() == "paid":
+    if (row.get("status") or "").lower() == "paid":
         return False
     return expected < datetime.today().date()
 
 
+# =====================================================
+# RESULT QUERIES
+# List-style answers as ResultSets; /results pages through the same
+# queries, so a facts pointer and the full list always agree.
+# =====================================================
+
+RESULT_CACHE_SIZE = 32
+
+_result_cache = OrderedDict()   # (query, params) → (rows, ResultSet)
+_result_lock = Lock()
+_built_indexes = None           # (rows, DatasetIndexes) for callers that pass no indexes
+_built_lock = Lock()
+
+
+def _select(rows, **predicates):
+    # Row positions where every column predicate holds; RowStore evaluates
+    # each predicate once per distinct value instead of once per row
+    if isinstance(rows, RowStore):
+        masks = [rows.mask(column, predicate) for column, predicate in predicates.items()]
+        if all(m is not None for m in masks):
+            combined = np.logical_and.reduce(masks) if masks else np.ones(len(rows), dtype=bool)
+            return np.flatnonzero(combined)
+    return [
+        i for i, r in enumerate(rows)
+        if all(predicate(r.get(column)) for column, predicate in predicates.items())
+    ]
+
+
+def _date_ordinals(rows):
+    if not isinstance(rows, RowStore):
+        return None, None
+    return rows.ordinals("expected_date"), rows.ordinals("actual_date")
+
+
+def _document_type_code(document_type):
+    if not document_type:
+        return None
+    code = TYPE_CODES.get(str(document_type).upper())
+    if code is None:
+        raise ValueError(f"Unknown document_type '{document_type}'")
+    return code
+
+
+_DELAY_BASIS_LABELS = {"date": "dates", "status": "status", "any": "dates or status"}
+
+
+def _result_delayed(rows, indexes, basis: str = "date") -> ResultSet:
+    if basis not in _DELAY_BASIS_LABELS:
+        raise ValueError("basis must be 'date', 'status' or 'any'")
+    by_status = by_date = None
+    if basis in ("status", "any"):
+        by_status = _select(rows, status=lambda s: s == "delayed")
+    if basis in ("date", "any"):
+        expected, actual = _date_ordinals(rows)
+        if expected is not None and actual is not None:
+            by_date = np.flatnonzero(
+                (expected != MISSING_ORDINAL) & (actual != MISSING_ORDINAL) & (actual > expected)
+            )
+        else:
+            by_date = [i for i, r in enumerate(rows) if is_date_delayed(r)]
+    if by_status is None or by_date is None:
+        positions = by_date if by_status is None else by_status
+    else:
+        positions = np.union1d(np.asarray(by_date, dtype=np.int64), np.asarray(by_status, dtype=np.int64))
+    return ResultSet(
+        "delayed", (("basis", basis),), f"documents delayed based on {_DELAY_BASIS_LABELS[basis]}",
+        positions, group_by=("partner", "transaction_type"),
+    )
+
+
+def _result_overdue(rows, indexes, start: str = "", end: str = "") -> ResultSet:
+    # start / end narrow the due (expected) dates: "overdue since May 1"
+    lo, hi = _iso_param("start", start), _iso_param("end", end)
+    expected, actual = _date_ordinals(rows)
+    selected = _select(
+        rows,
+        transaction_type=lambda t: t == 810,
+        status=lambda s: (s or "").lower() != "paid",
+    )
+    if expected is not None and actual is not None:
+        today = datetime.today().date().toordinal()
+        selected = np.asarray(selected, dtype=np.int64)
+        due = expected[selected]
+        keep = (due != MISSING_ORDINAL) & (actual[selected] == MISSING_ORDINAL) & (due < today)
+        if lo:
+            keep &= due >= lo.toordinal()
+        if hi:
+            keep &= due <= hi.toordinal()
+        positions = selected[keep]
+    else:
+        positions = [
+            i for i in selected
+            if is_date_overdue(rows[i])
+            and (not lo or parse_date(rows[i]["expected_date"]) >= lo)
+            and (not hi or parse_date(rows[i]["expected_date"]) <= hi)
+        ]
+    label = "overdue invoices" + (f" {_window_label('expected_date', lo, hi)}" if lo or hi else "")
+    return ResultSet(
+        "overdue", (("start", start), ("end", end)), label, positions, group_by=("partner",),
+    )
+
+
+def _result_partner(rows, indexes, partner: str = "", document_type: str = "") -> ResultSet:
+    canonical = indexes.partners.resolve(partner)
+    if canonical is None:
+        raise ValueError(f"Partner {partner} does not exist in the uploaded CSV.")
+    # Ingest-time partner → row positions groups: O(matches), no column scan
+    positions = indexes.partners.positions(canonical, _document_type_code(document_type))
+    return ResultSet(
+        "partner", (("partner", canonical), ("document_type", document_type.upper())),
+        f"{document_type.upper() if document_type else 'document(s)'} for partner {canonical}",
+        positions, group_by=("transaction_type", "status"),
+    )
+
+
+def _result_documents(rows, indexes, document_type: str = "", status: str = "") -> ResultSet:
+    target_type = _document_type_code(document_type)
+    status = status.strip().lower()
+    predicates = {}
+    if target_type is not None:
+        predicates["transaction_type"] = lambda t: t == target_type
+    if status:
+        predicates["status"] = lambda s: str(s or "").lower() == status
+    label = " ".join(
+        [f"status '{status}'"] * bool(status) + [document_type.upper()] * bool(document_type)
+    ) or "documents"
+    return ResultSet(
+        "documents", (("document_type", document_type.upper()), ("status", status)), label,
+        _select(rows, **predicates), group_by=("transaction_type", "status", "partner"),
+        describe=None if target_type is not None else describe_typed_document,
+    )
+
+
+def _iso_param(name: str, value: str):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date") from None
+
+
+def _window_label(field: str, start, end) -> str:
+    name = field.replace("_date", "") + " date"
+    if start and end:
+        return f"with {name} on {start}" if start == end else f"with {name} from {start} to {end}"
+    if start:
+        return f"with {name} on or after {start}"
+    return f"with {name} on or before {end}" if end else f"with a {name}"
+
+
+def _result_window(
+    rows, indexes, field: str = "expected_date", start: str = "", end: str = "",
+    document_type: str = "", partner: str = "", status: str = "", delayed: str = "",
+) -> ResultSet:
+    """
+    Rows whose date falls in [start, end], in date order. The window comes
+    from two binary searches per type in the date index; the optional
+    filters only look at the rows inside it.
+    """
+    lo, hi = _iso_param("start", start), _iso_param("end", end)
+    target_type = _document_type_code(document_type)
+    positions = indexes.dates.range(field, lo, hi, target_type)
+
+    label = [document_type.upper() if document_type else "document(s)"]
+    params = [("field", field), ("start", start), ("end", end), ("document_type", document_type.upper())]
+    if partner:
+        canonical = indexes.partners.resolve(partner)
+        if canonical is None:
+            raise ValueError(f"Partner {partner} does not exist in the uploaded CSV.")
+        aliases = indexes.partners.canonical_by_key
+        positions = _keep(rows, positions, "partner", lambda p: aliases.get(normalize_partner(p)) == canonical)
+        label.append(f"for partner {canonical}")
+        params.append(("partner", canonical))
+    status = status.strip().lower()
+    if status:
+        positions = _keep(rows, positions, "status", lambda s: str(s or "").lower() == status)
+        label.insert(0, status)
+        params.append(("status", status))
+    if delayed:
+        # Same rule as CHECK_DELAY: late by dates or flagged delayed by status
+        positions = np.asarray(positions, dtype=np.int64)
+        expected, actual = _date_ordinals(rows)
+        if expected is not None and actual is not None:
+            e, a = expected[positions], actual[positions]
+            keep = (e != MISSING_ORDINAL) & (a != MISSING_ORDINAL) & (a > e)
+            flagged = rows.mask("status", lambda s: str(s or "").lower() == "delayed", positions)
+            positions = positions[keep | flagged if flagged is not None else keep]
+        else:
+            positions = positions[np.array([
+                is_date_delayed(rows[int(i)]) or str(rows[int(i)].get("status") or "").lower() == "delayed"
+                for i in positions
+            ], dtype=bool)]
+        label.insert(0, "delayed")
+        params.append(("delayed", "1"))
+    label.append(_window_label(field, lo, hi))
+
+    def describe(row):
+        kind = "" if target_type is not None else f"{TYPE_LABELS.get(row.get('transaction_type'), 'UNKNOWN')}, "
+        return f"{row['document_id']} ({kind}{row.get(field)})"
+
+    return ResultSet(
+        "window", tuple(params), " ".join(label), positions,
+        group_by=("transaction_type", "partner", "status"), describe=describe,
+    )
+
+
+def _lifecycle_indexes(rows):
+    # PO → ACK/ASN/invoice/FA groups built at ingest (imported late: lifecycle_routes imports main)
+    from .lifecycle_routes import indexes_for
+    return indexes_for(rows)
+
+
+def _indexes_for(rows):
+    # Callers without prebuilt indexes (scripts) build them once per rows
+    # object rather than once per question; rows are never mutated in place
+    global _built_indexes
+    with _built_lock:
+        built = _built_indexes
+        if built is None or built[0] is not rows:
+            built = _built_indexes = (rows, build_dataset_indexes(columns_from_rows(rows)))
+    return built[1]
+
+
+def _keep(rows, positions, column, predicate):
+    # Filters a position subset; cost follows the subset, not the dataset
+    if isinstance(rows, RowStore):
+        keep = rows.mask(column, predicate, positions)
+        if keep is not None:
+            return positions[keep]
+    return np.asarray([i for i in positions if predicate(rows[int(i)].get(column))], dtype=np.int64)
+
+
+RESULT_QUERIES = {
+    "delayed": _result_delayed,
+    "overdue": _result_overdue,
+    "partner": _result_partner,
+    "documents": _result_documents,
+    "window": _result_window,
+}
+# Their answers change at midnight, so cached results are per day
+_DATED_RESULT_QUERIES = frozenset({"overdue"})
+
+
+def run_result_query(query: str, params: dict, rows, indexes) -> ResultSet:
+    """
+    Runs a named list query. Raises KeyError for an unknown query and
+    ValueError for bad parameters. Recent results are cached per dataset,
+    so paging through /results does not re-run the query per page.
+    """
+    build = RESULT_QUERIES[query]
+    key = (query, tuple(sorted((k, v) for k, v in params.items() if v)))
+    if query in _DATED_RESULT_QUERIES:
+        key += (date.today().isoformat(),)
+    with _result_lock:
+        hit = _result_cache.get(key)
+        if hit is not None and hit[0] is rows:
+            _result_cache.move_to_end(key)
+            return hit[1]
+    try:
+        result = build(rows, indexes, **dict(key[1]))
+    except TypeError as exc:
+        raise ValueError(f"Unsupported parameters for '{query}': {', '.join(k for k, _ in key[1])}") from exc
+    with _result_lock:
+        _result_cache[key] = (rows, result)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    return result
+
+
+def clear_result_cache():
+    with _result_lock:
+        _result_cache.clear()
+
+
+def list_query(intent: str, entities: dict):
+    """
+    The (query, params) behind a list-style intent, or None when the
+    intent does not answer with a list (single-document checks, counts).
+    Answers and /export run the same query, so an export is exactly the
+    list an answer summarized.
+    """
+    doc_type = entities.get("document_type") or ""
+    if entities.get("document_id"):
+        return None
+    windowed = bool(entities.get("date_from") or entities.get("date_to"))
+    if intent == "CHECK_DELAY" and windowed:
+        return "window", _window_params(dict(entities, status="", delayed=True), doc_type)
+    if intent == "CHECK_DELAY":
+        return "delayed", {"basis": "any"}
+    if intent == "CHECK_OVERDUE" and windowed and entities.get("date_field") in (None, "expected_date"):
+        return "overdue", {"start": entities.get("date_from") or "", "end": entities.get("date_to") or ""}
+    if intent == "CHECK_OVERDUE":
+        return "overdue", {}
+    if intent == "FILTER_BY_PARTNER" and entities.get("partner"):
+        return "partner", {"partner": entities["partner"], "document_type": doc_type}
+    if intent == "LIST_DOCUMENTS":
+        return "documents", {
+            "document_type": doc_type,
+            "status": str(entities.get("status") or "").strip().lower(),
+        }
+    if intent == "DATE_WINDOW":
+        return "window", _window_params(entities, doc_type)
+    return None
+
+
+def _window_params(entities: dict, doc_type: str) -> dict:
+    return {
+        "field": entities.get("date_field") or "expected_date",
+        "start": entities.get("date_from") or "",
+        "end": entities.get("date_to") or "",
+        "document_type": doc_type,
+        "partner": entities.get("partner") or "",
+        "status": entities.get("status") or "",
+        "delayed": "1" if entities.get("delayed") else "",
+    }
+
+
 # =====================================================
 # MAIN ROUTER
 # =====================================================
 
-def answer_question(question: str, rows: list, row_embeddings=None) -> str:
+def answer_question(question: str, rows: list, row_embeddings=None, indexes=None) -> str:
     # 🔴 HARD STOP — NO CSV
     if not rows:
         return "Please upload a CSV file before asking questions."
 
+    t0 = time.perf_counter()
+    stages = begin_request_stages()
+
     # 1. CLASSIFY INTENT
-    routing_result = classify_intent(question)
-    print("DEBUG routing_result:", routing_result)
+    with stage("classify"):
+        routing_result = classify_intent(question)
+    logger.debug("routing_result: %s", routing_result)
 
     intent = routing_result.get("intent", "UNKNOWN")
     entities = routing_result.get("entities", {})
-    
+
+    # 2. QUERY + EXPLAIN (explain time is recorded by explain_facts itself)
+    t_query = time.perf_counter()
+    if indexes is None:
+        indexes = _indexes_for(rows)
+    facts = precomputed_facts(rows, intent, clean_id(entities.get("document_id")))
+    if facts is not None:
+        answer = explain_facts(facts)
+    else:
+        answer = _answer_routed(question, rows, intent, entities, indexes, row_embeddings=row_embeddings)
+    t_end = time.perf_counter()
+
+    query_s = max(t_end - t_query - stages.get("explain", 0.0), 0.0)
+    STAGE_SECONDS.observe(query_s, stage="query", intent=intent)
+    stages["query"] = query_s
+    ASK_SECONDS.observe(t_end - t0, intent=intent)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "answered intent=%s total=%.4fs stages=%s",
+            intent, t_end - t0, {k: round(v, 4) for k, v in stages.items()},
+        )
+    return answer
+
+
+def _query_signature(question: str, intent: str, entities: dict) -> tuple:
+    # UNKNOWN answers also depend on the question wording
+    text = question.strip().lower() if intent == "UNKNOWN" else None
+    return (intent, tuple(sorted((k, str(v)) for k, v in entities.items())), text)
+
+
+def answer_questions(
+    questions: list,
+    rows: list,
+    indexes=None,
+    explain: bool = True,
+    concurrency: int = BATCH_EXPLAIN_CONCURRENCY,
+    row_embeddings=None,
+) -> list:
+    """
+    Answers a batch of questions: one encoding pass for all of them, one
+    query per distinct (intent, entities) pair, and explain calls for the
+    distinct fact strings fanned out over a small thread pool. Answers are
+    returned in input order.
+    """
+    if not rows:
+        return ["Please upload a CSV file before asking questions."] * len(questions)
+
+    begin_request_stages()
+    with stage("classify"):
+        routed = classify_intents(questions)
+
+    if indexes is None:
+        indexes = _indexes_for(rows)
+
+    # Group by query signature, run each distinct query once (grouped by intent)
+    groups = {}
+    for i, (question, routing_result) in enumerate(zip(questions, routed)):
+        intent = routing_result.get("intent", "UNKNOWN")
+        entities = routing_result.get("entities", {})
+        key = _query_signature(question, intent, entities)
+        groups.setdefault(key, (question, intent, entities, []))[3].append(i)
+
+    facts_by_key = {}
+    for key, (question, intent, entities, _) in sorted(groups.items(), key=lambda kv: kv[0][0]):
+        facts = precomputed_facts(rows, intent, clean_id(entities.get("document_id")))
+        if facts is None:
+            with stage("query", intent=intent):
+                facts = _answer_routed(
+                    question, rows, intent, entities, indexes, explain=lambda f: f, row_embeddings=row_embeddings
+                )
+        facts_by_key[key] = facts
+
+    unique_facts = list(dict.fromkeys(facts_by_key.values()))
+    if explain and unique_facts:
+        workers = max(1, min(concurrency, len(unique_facts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            explained = dict(zip(unique_facts, pool.map(explain_facts, unique_facts)))
+    else:
+        explained = {facts: facts for facts in unique_facts}
+
+    answers = [None] * len(questions)
+    for key, (_, _, _, positions) in groups.items():
+        for i in positions:
+            answers[i] = explained[facts_by_key[key]]
+    return answers
+
+
+# =====================================================
+# STRUCTURED QUERIES
+# Intent and entities given as data: no classification, the same
+# _answer_routed branches as /ask, and the explain call only on request.
+# =====================================================
+
+# UNKNOWN answers depend on the question wording, so they need /ask
+STRUCTURED_INTENTS = tuple(i for i in INTENTS if i != "UNKNOWN")
+STRUCTURED_ENTITIES = (
+    "document_id", "partner", "document_type", "status", "delayed",
+    "month", "group_by", "date_from", "date_to", "date_field", "aggregate",
+)
+STRUCTURED_GROUP_BY = ("partner", "status", "transaction_type", "month")
+_STRUCTURED_REQUIRED = {
+    "GET_STATUS": ("document_id",),
+    "GET_LIFECYCLE": ("document_id",),
+    "CHECK_COMPLETION": ("document_id",),
+    "FILTER_BY_PARTNER": ("partner",),
+}
+_MONTH_RE = re.compile(r"(?:20\d{2}-)?(?:0[1-9]|1[0-2])|20\d{2}")
+
+
+def normalize_entities(intent: str, entities: dict, indexes) -> dict:
+    """
+    Checks caller-supplied entities and puts them in the shape the router
+    produces. Raises ValueError when the request cannot be answered as given.
+    """
+    if intent not in STRUCTURED_INTENTS:
+        raise ValueError(f"intent must be one of {', '.join(STRUCTURED_INTENTS)}")
+    unknown = sorted(set(entities) - set(STRUCTURED_ENTITIES))
+    if unknown:
+        raise ValueError(f"Unsupported entities: {', '.join(unknown)}")
+    out = {k: v for k, v in entities.items() if v is not None and v != ""}
+
+    if "document_type" in out:
+        out["document_type"] = str(out["document_type"]).strip().upper()
+        if out["document_type"] not in TYPE_CODES:
+            raise ValueError(f"document_type must be one of {', '.join(TYPE_CODES)}")
+    if "document_id" in out:
+        doc_id = clean_id(str(out["document_id"]))
+        if doc_id and doc_id.isdigit():
+            # Numeric-only IDs resolve like they do for /ask, but an
+            # ambiguous one is an error rather than a clarifying answer
+            candidates = indexes.document_ids.candidates(doc_id, out.get("document_type"))
+            if len(candidates) > 1:
+                raise ValueError(
+                    f"document_id {doc_id} matches {', '.join(candidates)}; "
+                    "pass the full ID or a document_type"
+                )
+            doc_id = candidates[0] if candidates else doc_id
+        if doc_id:
+            out["document_id"] = doc_id
+        else:
+            del out["document_id"]
+    if "status" in out:
+        out["status"] = str(out["status"]).strip().lower()
+    for flag in ("delayed", "aggregate"):
+        # The router only ever sets these to True or leaves them out
+        if out.pop(flag, False):
+            out[flag] = True
+    if "month" in out and not _MONTH_RE.fullmatch(str(out["month"])):
+        raise ValueError("month must be YYYY-MM, YYYY or MM")
+    if "group_by" in out and out["group_by"] not in STRUCTURED_GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(STRUCTURED_GROUP_BY)}")
+    if "date_field" in out and out["date_field"] not in DATE_INDEX_COLUMNS:
+        raise ValueError(f"date_field must be one of {', '.join(DATE_INDEX_COLUMNS)}")
+    for name in ("date_from", "date_to"):
+        if name in out:
+            out[name] = str(out[name])
+            _iso_param(name, out[name])
+
+    missing = [name for name in _STRUCTURED_REQUIRED.get(intent, ()) if name not in out]
+    if intent == "DATE_WINDOW" and not ("date_from" in out or "date_to" in out):
+        missing.append("date_from or date_to")
+    if missing:
+        raise ValueError(f"{intent} requires {', '.join(missing)}")
+    if intent == "DATE_WINDOW" and "partner" in out and not indexes.partners.resolve(out["partner"]):
+        # /ask drops a window partner that is not in the data (it is usually a
+        # loose word); an explicit filter on a missing partner is an error
+        raise ValueError(f"Partner {out['partner']} does not exist in the uploaded CSV.")
+    return out
+
+
+def _group_rows(group_by: str, groups) -> list:
+    # Document types as the labels callers pass in ("PO", "INVOICE", ...)
+    if group_by == "transaction_type":
+        groups = [(TYPE_LABELS.get(value, value), n) for value, n in groups]
+    return [{"value": value, "count": int(n)} for value, n in groups]
+
+
+def answer_structured(
+    intent: str,
+    entities: dict,
+    rows,
+    indexes,
+    explain: bool = False,
+    page_size: int = RESULTS_PAGE_SIZE,
+) -> dict:
+    """
+    Answers an already-routed query. Returns the facts /ask would explain
+    plus the data behind them: the first page of the list for list
+    intents, the matching rows for single-document intents, and counts
+    for aggregate ones. Raises ValueError for invalid entities.
+    """
+    entities = normalize_entities(intent, entities, indexes)
+    with stage("query", intent=intent):
+        facts = _answer_routed("", rows, intent, entities, indexes, explain=lambda f: f)
+        response = {"intent": intent, "entities": entities, "facts": facts}
+
+        doc_id = entities.get("document_id")
+        partner = entities.get("partner")
+        canonical = indexes.partners.resolve(partner) if partner else None
+        target = list_query(intent, entities)
+        if doc_id:
+            response["documents"] = [dict(r) for r in _rows_with(rows, "document_id", doc_id)]
+        elif intent in ("COUNT_DOCUMENTS", "GROUP_COUNT"):
+            if not partner or canonical:
+                filters = _cube_filters(entities, canonical)
+                if intent == "COUNT_DOCUMENTS":
+                    response["count"] = indexes.cube.count(**filters)
+                else:
+                    group_by = entities.get("group_by") or "partner"
+                    response["group_by"] = group_by
+                    response["groups"] = _group_rows(group_by, indexes.cube.group(group_by, **filters))
+        elif target is not None and (not partner or canonical):
+            result = run_result_query(*target, rows, indexes)
+            group_by = entities.get("group_by")
+            if entities.get("aggregate"):
+                response["count"] = result.total
+                if group_by and group_by != "month":
+                    response["group_by"] = group_by
+                    response["groups"] = _group_rows(group_by, value_counts(rows, group_by, result.positions))
+            response["result"] = dict(result_page(rows, result, 1, page_size), url=result.url())
+
+    if explain:
+        response["answer"] = explain_facts(facts)
+    return response
+
+
+def _retrieve(question: str, rows: list, indexes, row_embeddings) -> list:
+    # row_embeddings may be a provider (main._ensure_row_embeddings): only
+    # UNKNOWN questions get here, so other intents never wait on the encode.
+    # Keyword-only when value embeddings are not available
+    if callable(row_embeddings):
+        row_embeddings = row_embeddings()
+    q_vec = embed_question(question) if row_embeddings is not None else None
+    with stage("retrieve"):
+        positions = indexes.retrieval.search(question, q_vec, row_embeddings, top_k=RETRIEVAL_TOP_K)
+    return [rows[p] for p in positions]
+
+
+def _describe_row(row) -> str:
+    parts = [f"partner {row.get('partner')}", f"status {row.get('status')}"]
+    if row.get("related_document_id"):
+        parts.append(f"related to {row['related_document_id']}")
+    if row.get("expected_date"):
+        parts.append(f"expected {row['expected_date']}")
+    if row.get("actual_date"):
+        parts.append(f"actual {row['actual_date']}")
+    if row.get("remarks"):
+        parts.append(f"remarks '{row['remarks']}'")
+    return f"{row['document_id']} ({', '.join(parts)})"
+
+
+def _cube_filters(entities: dict, canonical_partner) -> dict:
+    doc_type = entities.get("document_type")
+    return {
+        "partner": canonical_partner,
+        "transaction_type": TYPE_CODES.get(doc_type) if doc_type else None,
+        "status": entities.get("status"),
+        "delayed": entities.get("delayed"),
+        "month": entities.get("month"),
+    }
+
+
+def _answer_routed(
+    question: str, rows: list, intent: str, entities: dict, indexes, explain=None, row_embeddings=None
+) -> str:
+    # Looked up at call time so a patched explain_facts is honoured
+    explain = explain or explain_facts
+
     # Extract entities safely
     doc_id = clean_id(entities.get("document_id"))
     partner = entities.get("partner")
@@ -69,14 +700,14 @@ def answer_question(question: str, rows: list, row_embeddings=None) -> str:
     # ----------------- GET_STATUS -----------------
     if intent == "GET_STATUS":
         if not doc_id:
-             return explain_facts("Document ID was not provided.")
+             return explain("Document ID was not provided.")
              
-        match = next((r for r in rows if r["document_id"] == doc_id), None)
+        match = next(iter(_rows_with(rows, "document_id", doc_id)), None)
 
         if not match:
-            return explain_facts(f"Document {doc_id} does not exist in the uploaded CSV.")
+            return explain(f"Document {doc_id} does not exist in the uploaded CSV.")
 
-        return explain_facts(
+        return explain(
             f"Document {doc_id} has status '{match['status']}' "
             f"and is associated with partner {match['partner']}."
         )
@@ -85,88 +716,82 @@ def answer_question(question: str, rows: list, row_embeddings=None) -> str:
     elif intent == "CHECK_DELAY":
         # If specific document requested
         if doc_id:
-             match = next((r for r in rows if r["document_id"] == doc_id), None)
+             match = next(iter(_rows_with(rows, "document_id", doc_id)), None)
              if not match:
-                 return explain_facts(f"Document {doc_id} does not exist in the uploaded CSV.")
+                 return explain(f"Document {doc_id} does not exist in the uploaded CSV.")
                  
              is_delayed_date = is_date_delayed(match)
              is_delayed_status = match["status"] == "delayed"
              
              if is_delayed_date or is_delayed_status:
-                 return explain_facts(f"Document {doc_id} is delayed.")
+                 return explain(f"Document {doc_id} is delayed.")
              else:
-                 return explain_facts(f"Document {doc_id} is not delayed.")
+                 return explain(f"Document {doc_id} is not delayed.")
         
-        # General check
-        date_delayed = [r["document_id"] for r in rows if is_date_delayed(r)]
-        status_delayed = [r["document_id"] for r in rows if r["status"] == "delayed"]
-
+        query, params = list_query(intent, entities)
+        if query == "window":
+            # "delayed shipments last week": the window, late by dates or status
+            if partner and not indexes.partners.resolve(partner):
+                params["partner"] = ""
+            try:
+                return explain(render_facts(rows, run_result_query(query, params, rows, indexes)))
+            except ValueError as exc:
+                return explain(str(exc))
+
+        # General check: counts, samples and a /results pointer per method
+        by_date = run_result_query("delayed", {"basis": "date"}, rows, indexes)
+        by_status = run_result_query("delayed", {"basis": "status"}, rows, indexes)
         facts = (
             "Delay check completed using two methods. "
-            f"Based on dates, delayed documents: "
-            f"{', '.join(date_delayed) or 'None'}. "
-            f"Based on status, delayed documents: "
-            f"{', '.join(status_delayed) or 'None'}."
+            f"{render_facts(rows, by_date, FACT_TOKEN_BUDGET // 2)} "
+            f"{render_facts(rows, by_status, FACT_TOKEN_BUDGET // 2)}"
         )
-        return explain_facts(facts)
+        return explain(facts)
 
     # ----------------- CHECK_OVERDUE -----------------
     elif intent == "CHECK_OVERDUE":
         # If specific document requested
         if doc_id:
-            match = next((r for r in rows if r["document_id"] == doc_id), None)
+            match = next(iter(_rows_with(rows, "document_id", doc_id)), None)
             if not match:
-                return explain_facts(f"Document {doc_id} does not exist in the uploaded CSV.")
+                return explain(f"Document {doc_id} does not exist in the uploaded CSV.")
             
             if match.get("transaction_type") != 810:
-                return explain_facts("Overdue applies only to invoices.")
+                return explain("Overdue applies only to invoices.")
             is_overdue = is_date_overdue(match)
             if is_overdue:
-                return explain_facts(f"Document {doc_id} is overdue.")
+                return explain(f"Document {doc_id} is overdue.")
             else:
-                return explain_facts(f"Document {doc_id} is not overdue.")
+                return explain(f"Document {doc_id} is not overdue.")
 
-        # General check
-        invoices_overdue = [r["document_id"] for r in rows if is_date_overdue(r)]
-        return explain_facts(
-            f"Overdue applies only to invoices. The following invoices are overdue: "
-            f"{', '.join(invoices_overdue) or 'None'}."
-        )
+        # General check, due dates optionally narrowed to a window
+        overdue = run_result_query(*list_query(intent, entities), rows, indexes)
+        return explain(f"Overdue applies only to invoices. {render_facts(rows, overdue)}")
 
     # ----------------- GET_LIFECYCLE -----------------
     elif intent == "GET_LIFECYCLE":
         if not doc_id:
-            return explain_facts("Document ID was not provided.")
+            return explain("Document ID was not provided.")
 
-        exists_any = any(r["document_id"] == doc_id for r in rows)
-        if not exists_any:
-            return explain_facts(f"Document {doc_id} does not exist in the uploaded CSV.")
+        own_rows = _rows_with(rows, "document_id", doc_id)
+        if not own_rows:
+            return explain(f"Document {doc_id} does not exist in the uploaded CSV.")
         # PO-only lifecycle
-        po_exists = any(r["transaction_type"] == 850 and r["document_id"] == doc_id for r in rows)
-
-        if not po_exists:
-            return explain_facts("Lifecycle applies only to Purchase Orders.")
+        lifecycle = _lifecycle_indexes(rows)
+        if doc_id not in lifecycle.po_by_id:
+            return explain("Lifecycle applies only to Purchase Orders.")
 
         # 2️⃣ First-hop: PO + directly related docs
-        related = [
-            r for r in rows
-            if r["document_id"] == doc_id
-            or r.get("related_document_id") == doc_id
+        groups = (lifecycle.ack_by_related, lifecycle.asn_by_related, lifecycle.inv_by_related, lifecycle.fa_by_related)
+        related = list(own_rows) + [
+            r for group in groups for r in group.get(doc_id, ()) if r["document_id"] != doc_id
         ]
 
         # 3️⃣ Collect invoices linked to PO
-        invoice_ids = [
-            r["document_id"]
-            for r in related
-            if r["transaction_type"] == 810
-        ]
+        invoice_ids = dict.fromkeys(r["document_id"] for r in related if r["transaction_type"] == 810)
 
         # 4️⃣ Second-hop: FA linked to invoices
-        fa_docs = [
-            r for r in rows
-            if r["transaction_type"] == 997
-            and r.get("related_document_id") in invoice_ids
-        ]
+        fa_docs = [fa for inv_id in invoice_ids for fa in lifecycle.fa_by_related.get(inv_id, ())]
 
         full_lifecycle = related + fa_docs
         full_lifecycle.sort(key=lambda r: r.get("created_date") or "")
@@ -180,75 +805,46 @@ def answer_question(question: str, rows: list, row_embeddings=None) -> str:
             f"The lifecycle of {doc_id} includes the following steps: "
             + "; ".join(steps) + "."
         )
-        return explain_facts(facts)
+        return explain(facts)
 
     # ----------------- FILTER_BY_PARTNER -----------------
     elif intent == "FILTER_BY_PARTNER":
         if not partner:
-            return explain_facts("Partner was not provided.")
+            return explain("Partner was not provided.")
             
-        # Case insensitive match
-        target_partner = partner.strip().upper()
-        partner_exists = any(str(r.get("partner", "")).upper() == target_partner for r in rows)
-        if not partner_exists:
-            return explain_facts(f"Partner {partner} does not exist in the uploaded CSV.")
-        if doc_type:
-            type_map = {"PO": 850, "INVOICE": 810, "ASN": 856, "ACK": 855, "FA": 997}
-            target_type = type_map.get(doc_type)
-        else:
-            target_type = None
-        filtered = [
-            r["document_id"]
-            for r in rows
-            if str(r.get("partner", "")).upper() == target_partner
-            and (target_type is None or r.get("transaction_type") == target_type)
-        ]
-        if not filtered and target_type is not None:
-            return explain_facts(f"No {doc_type} found for partner {partner}.")
-        count = len(filtered) if target_type is not None else sum(1 for r in rows if str(r.get("partner", "")).upper() == target_partner)
-        display = filtered if target_type is not None else [r["document_id"] for r in rows if str(r.get("partner", "")).upper() == target_partner]
-        return explain_facts(
-            f"{partner} has {count} {'document(s)' if target_type is None else doc_type}: "
-            f"{', '.join(display) or 'None'}."
-        )
+        # Normalized / typo-tolerant match against the ingest-time partner dictionary
+        canonical = indexes.partners.resolve(partner)
+        if canonical is None:
+            return explain(f"Partner {partner} does not exist in the uploaded CSV.")
+        result = run_result_query("partner", {"partner": canonical, "document_type": doc_type}, rows, indexes)
+        if not result.total and doc_type:
+            return explain(f"No {doc_type} found for partner {canonical}.")
+        return explain(render_facts(rows, result))
 
     # ----------------- CHECK_COMPLETION -----------------
     elif intent == "CHECK_COMPLETION":
         if not doc_id:
-             return explain_facts("Document ID was not provided.")
+             return explain("Document ID was not provided.")
 
         # PO-only completion
         if doc_id.startswith("INV"):
-            return explain_facts("Completion checks apply only to Purchase Orders.")
-        po_exists = any(
-            r["transaction_type"] == 850 and r["document_id"] == doc_id
-            for r in rows
-        )
+            return explain("Completion checks apply only to Purchase Orders.")
+        lifecycle = _lifecycle_indexes(rows)
+        if doc_id not in lifecycle.po_by_id:
+            return explain(f"Document {doc_id} does not exist in the uploaded CSV.")
 
-        if not po_exists:
-            return explain_facts(f"Document {doc_id} does not exist in the uploaded CSV.")
+        invoices = lifecycle.inv_by_related.get(doc_id, ())
+        related_invoice_ids = {r["document_id"] for r in invoices}
 
-        related_invoice_ids = [
-            r["document_id"]
-            for r in rows
-            if r["transaction_type"] == 810
-            and r.get("related_document_id") == doc_id
-        ]
-
-        paid_invoice_present = any(
-            r["document_id"] in related_invoice_ids
-            and r["status"] == "paid"
-            for r in rows
-        )
+        paid_invoice_present = any(r["status"] == "paid" for r in invoices)
 
         fa_received = any(
-            r["transaction_type"] == 997
-            and r.get("related_document_id") in related_invoice_ids
-            and r["status"] == "received"
-            for r in rows
+            fa["status"] == "received"
+            for inv_id in related_invoice_ids
+            for fa in lifecycle.fa_by_related.get(inv_id, ())
         )
 
-        return explain_facts(
+        return explain(
             f"Completion check for {doc_id}. "
             f"Paid invoice present: {'Yes' if paid_invoice_present else 'No'}. "
             f"Functional acknowledgment received: "
@@ -257,64 +853,97 @@ def answer_question(question: str, rows: list, row_embeddings=None) -> str:
 
     # ----------------- LIST_DOCUMENTS -----------------
     elif intent == "LIST_DOCUMENTS":
-        # Map document type string to transaction type code
-        type_map = {
-            "PO": 850,
-            "INVOICE": 810,
-            "ASN": 856,
-            "ACK": 855,
-            "FA": 997
-        }
-        
-        target_type = None
-        if doc_type and doc_type in type_map:
-            target_type = type_map[doc_type]
-        
         # Optional status filter (e.g., "what is pending", "what is received")
         status_filter = None
         if isinstance(entities, dict):
             status_filter = str(entities.get("status", "")).strip().lower() or None
-        
-        # Build filtered list
-        def doc_type_label(code):
-            for k, v in type_map.items():
-                if v == code:
-                    return k
-            return "UNKNOWN"
-        
-        filtered_rows = [
-            r for r in rows
-            if (target_type is None or r.get("transaction_type") == target_type)
-            and (status_filter is None or str(r.get("status", "")).lower() == status_filter)
-        ]
-        
+
+        result = run_result_query(
+            "documents", {"document_type": doc_type or "", "status": status_filter or ""}, rows, indexes
+        )
+
         # If status was requested but no matches
-        if status_filter and not filtered_rows:
-            return explain_facts(f"No documents with status '{status_filter}' exist in the uploaded CSV.")
-        
-        # Compose output: include IDs and document type
-        items = [f"{r['document_id']} ({doc_type_label(r.get('transaction_type'))})" for r in filtered_rows] if filtered_rows else []
-        
-        if target_type is not None and not filtered_rows:
-            return explain_facts(f"No {doc_type} documents found.")
-        
-        count = len(items) if items else (sum(1 for _ in rows) if target_type is None and status_filter is None else 0)
-        display = items if items else [f"{rid} ({doc_type_label(rc)})" for rid, rc in sorted({(r['document_id'], r.get('transaction_type')) for r in rows})]
-        
-        # Limit output length
-        display_docs = display[:20]
-        more_suffix = f" and {len(display) - 20} more" if len(display) > 20 else ""
-        
+        if status_filter and not result.total:
+            return explain(f"No documents with status '{status_filter}' exist in the uploaded CSV.")
+        if doc_type and not result.total:
+            return explain(f"No {doc_type} documents found.")
+
+        return explain(render_facts(rows, result))
+
+    # ----------------- COUNT_DOCUMENTS / GROUP_COUNT -----------------
+    elif intent in ("COUNT_DOCUMENTS", "GROUP_COUNT"):
+        # Answered from the ingest-time aggregate cube, never from a row scan
+        canonical = None
+        if partner:
+            canonical = indexes.partners.resolve(partner)
+            if canonical is None:
+                return explain(f"Partner {partner} does not exist in the uploaded CSV.")
+
+        filters = _cube_filters(entities, canonical)
+        status_filter, delayed, month = filters["status"], filters["delayed"], filters["month"]
+
         label_parts = []
+        if delayed:
+            label_parts.append("delayed")
         if status_filter:
-            label_parts.append(f"status '{status_filter}'")
-        if doc_type:
-            label_parts.append(doc_type)
-        label = " ".join(label_parts) if label_parts else "documents"
-        
-        return explain_facts(
-            f"Found {len(display)} {label}: "
-            f"{', '.join(display_docs)}{more_suffix}."
+            label_parts.append(status_filter)
+        label_parts.append(f"{doc_type} document(s)" if doc_type else "document(s)")
+        if canonical:
+            label_parts.append(f"for partner {canonical}")
+        if month:
+            label_parts.append(f"with expected date in {month}" if len(month) > 2 else f"with expected date in month {month}")
+        label = " ".join(label_parts)
+
+        if intent == "COUNT_DOCUMENTS":
+            return explain(f"There are {indexes.cube.count(**filters)} {label}.")
+
+        group_by = entities.get("group_by") or "partner"
+        groups = indexes.cube.group(group_by, **filters)
+        if not groups:
+            return explain(f"There are no {label}.")
+
+        def group_label(value):
+            if group_by == "transaction_type":
+                return TYPE_LABELS.get(value, str(value))
+            return str(value) if value is not None else "unknown"
+
+        shown = groups[:15]
+        more_suffix = f"; and {len(groups) - 15} more groups" if len(groups) > 15 else ""
+        dimension = {"transaction_type": "document type"}.get(group_by, group_by)
+        return explain(
+            f"Counts of {label} by {dimension}: "
+            + "; ".join(f"{group_label(v)}: {n}" for v, n in shown)
+            + f"{more_suffix}. Total: {sum(n for _, n in groups)}."
+        )
+
+    # ----------------- DATE_WINDOW -----------------
+    elif intent == "DATE_WINDOW":
+        # Binary-search range over the sorted date index, then the filters
+        query, params = list_query(intent, entities)
+        if partner and not indexes.partners.resolve(partner):
+            params["partner"] = ""   # a loose word, not a partner in the data
+        try:
+            result = run_result_query(query, params, rows, indexes)
+        except ValueError as exc:
+            return explain(str(exc))
+        if not entities.get("aggregate"):
+            return explain(render_facts(rows, result))
+
+        group_by = entities.get("group_by")
+        if not group_by or group_by == "month":
+            return explain(f"There are {result.total} {result.label}.")
+        groups = value_counts(rows, group_by, result.positions)
+        if not groups:
+            return explain(f"There are no {result.label}.")
+        shown = groups[:15]
+        more_suffix = f"; and {len(groups) - 15} more groups" if len(groups) > 15 else ""
+        return explain(
+            f"Counts of {result.label} by {'document type' if group_by == 'transaction_type' else group_by}: "
+            + "; ".join(
+                f"{TYPE_LABELS.get(v, v) if group_by == 'transaction_type' else (v if v is not None else 'unknown')}: {n}"
+                for v, n in shown
+            )
+            + f"{more_suffix}. Total: {result.total}."
         )
 
     # ----------------- FALLBACK -----------------
@@ -323,31 +952,32 @@ def answer_question(question: str, rows: list, row_embeddings=None) -> str:
     if intent == "UNKNOWN":
         # Ambiguous numeric ID
         if doc_id and doc_id.isdigit():
-            candidates = sorted(list(set(
-                r["document_id"] for r in rows
-                if str(r.get("document_id", "")).upper().endswith(doc_id.upper())
-            )))
+            candidates = indexes.document_ids.candidates(doc_id)
             if len(candidates) >= 2:
-                return explain_facts(
+                return explain(
                     f"The ID {doc_id} is ambiguous and matches multiple documents "
                     f"({', '.join(candidates)}). Please specify the document type."
                 )
         # Explicit non-existent document
         if doc_id:
-            exists = any(r["document_id"] == doc_id for r in rows)
+            exists = bool(_rows_with(rows, "document_id", doc_id))
             if not exists:
-                return explain_facts(f"Document {doc_id} does not exist in the uploaded CSV.")
+                return explain(f"Document {doc_id} does not exist in the uploaded CSV.")
         # Explicit non-existent partner
         if partner:
-            target_partner = partner.strip().upper()
-            partner_exists = any(str(r.get("partner", "")).upper() == target_partner for r in rows)
-            if not partner_exists:
-                return explain_facts(f"Partner {partner} does not exist in the uploaded CSV.")
+            if indexes.partners.resolve(partner) is None:
+                return explain(f"Partner {partner} does not exist in the uploaded CSV.")
         # Out-of-scope knowledge questions
         if (("what is" in q_lower or "explain" in q_lower or "define" in q_lower)
             and ("edi" in q_lower or "rag" in q_lower or "asn" in q_lower or "ack" in q_lower or "invoice" in q_lower or "purchase order" in q_lower)):
-            return explain_facts("I can answer questions only about the uploaded EDI CSV data. This question is outside my scope.")
+            return explain("I can answer questions only about the uploaded EDI CSV data. This question is outside my scope.")
+        # Free text: hybrid keyword + vector retrieval over the rows
+        matches = _retrieve(question, rows, indexes, row_embeddings)
+        if matches:
+            return explain(
+                f"Rows most relevant to the question: {'; '.join(_describe_row(r) for r in matches)}."
+            )
         # Meaningless input
-        return explain_facts("I couldn’t understand the question. Please ask about the uploaded EDI data.")
+        return explain("I couldn’t understand the question. Please ask about the uploaded EDI data.")
     # Missing required entities for known intents
-    return explain_facts("I couldn’t understand the question. Please ask about the uploaded EDI data.")
+    return explain("I couldn’t understand the question. Please ask about the uploaded EDI data.")
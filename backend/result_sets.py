@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from .edi_schema import TYPE_LABELS
+from .row_store import RowStore
+
+# ------------------------------------------------------------
+# Structured list results and token-budgeted facts
+# List-style answers (general delay/overdue checks, partner documents,
+# document listings) produce a ResultSet of matching row positions. The
+# facts string sent to the LLM is rendered from it within
+# FACT_TOKEN_BUDGET: the total, as many IDs as fit, the biggest groups
+# and a pointer to /results, which pages through the full list. Prompt
+# size therefore stays flat no matter how many rows match.
+# ------------------------------------------------------------
+
+FACT_TOKEN_BUDGET = int(os.getenv("FACT_TOKEN_BUDGET", "200"))
+FACT_GROUPS_SHOWN = 5
+CHARS_PER_TOKEN = 4           # rough estimate for English text and document IDs
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 1000
+EXPORT_BLOCK_ROWS = 2000      # rows serialized per streamed chunk
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+GROUP_LABELS = {"transaction_type": "document type"}
+
+
+@dataclass(frozen=True)
+class ResultSet:
+    query: str                        # /results/{query}
+    params: Tuple[Tuple[str, str], ...]
+    label: str                        # e.g. "documents delayed by date"
+    positions: Sequence[int]          # matching rows, in query order
+    group_by: Tuple[str, ...] = ()    # breakdowns shown when the list is cut
+    describe: Optional[Callable[[Any], str]] = field(default=None, compare=False)
+
+    @property
+    def total(self) -> int:
+        return len(self.positions)
+
+    def url(self) -> str:
+        query = urlencode([(k, v) for k, v in self.params if v])
+        return f"/results/{self.query}" + (f"?{query}" if query else "")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def describe_document(row: Any) -> str:
+    return str(row["document_id"])
+
+
+def describe_typed_document(row: Any) -> str:
+    return f"{row['document_id']} ({TYPE_LABELS.get(row.get('transaction_type'), 'UNKNOWN')})"
+
+
+def value_counts(rows: Sequence[Any], column: str, positions: Sequence[int]) -> List[Tuple[Any, int]]:
+    if isinstance(rows, RowStore):
+        return rows.value_counts(column, positions)
+    tally: Dict[Any, int] = {}
+    for i in positions:
+        value = rows[i].get(column)
+        tally[value] = tally.get(value, 0) + 1
+    return sorted(tally.items(), key=lambda kv: -kv[1])
+
+
+def _group_summary(rows: Sequence[Any], result: ResultSet) -> str:
+    parts = []
+    for column in result.group_by:
+        counts = value_counts(rows, column, result.positions)
+        if len(counts) < 2:
+            continue
+        shown = ", ".join(
+            f"{TYPE_LABELS.get(v, v) if column == 'transaction_type' else (v if v is not None else 'unknown')} ({n})"
+            for v, n in counts[:FACT_GROUPS_SHOWN]
+        )
+        others = len(counts) - FACT_GROUPS_SHOWN
+        parts.append(
+            f"By {GROUP_LABELS.get(column, column)}: {shown}"
+            + (f", and {others} more" if others > 0 else "") + "."
+        )
+    return " ".join(parts)
+
+
+def render_facts(rows: Sequence[Any], result: ResultSet, budget: int = FACT_TOKEN_BUDGET) -> str:
+    """
+    Facts for one ResultSet in at most ~budget tokens. Short results are
+    listed in full; long ones get a sample of IDs, group counts and the
+    /results pointer instead of every ID.
+    """
+    if not result.total:
+        return f"Found no {result.label}."
+    describe = result.describe or describe_document
+    header = f"Found {result.total} {result.label}"
+    budget_chars = budget * CHARS_PER_TOKEN
+
+    # Fast path: everything fits
+    if result.total * 8 <= budget_chars:
+        items = [describe(rows[int(i)]) for i in result.positions]
+        text = f"{header}: {', '.join(items)}."
+        if estimate_tokens(text) <= budget:
+            return text
+
+    summary = _group_summary(rows, result)
+    tail = f"Full list: GET {result.url()}."
+    room = budget_chars - len(header) - len(summary) - len(tail) - 32
+    items: List[str] = []
+    used = 0
+    for i in result.positions:
+        item = describe(rows[int(i)])
+        if used + len(item) + 2 > room:
+            break
+        items.append(item)
+        used += len(item) + 2
+    more = result.total - len(items)
+    listed = f": {', '.join(items)} and {more} more." if items else "."
+    return " ".join(part for part in (header + listed, summary, tail) if part)
+
+
+def page(rows: Sequence[Any], result: ResultSet, page_no: int, page_size: int) -> Dict[str, Any]:
+    page_size = max(1, min(page_size, RESULTS_MAX_PAGE_SIZE))
+    pages = max(1, -(-result.total // page_size))
+    page_no = max(1, page_no)
+    start = (page_no - 1) * page_size
+    selected = result.positions[start:start + page_size]
+    return {
+        "query": result.query,
+        "params": dict(result.params),
+        "label": result.label,
+        "total": result.total,
+        "page": page_no,
+        "page_size": page_size,
+        "pages": pages,
+        "rows": [dict(rows[int(i)]) for i in selected],
+    }
+
+
+# =====================================================
+# STREAMING EXPORT
+# The full result, serialized EXPORT_BLOCK_ROWS rows at a time, so the
+# server holds one block of text no matter how many rows match.
+# =====================================================
+
+def export_columns(rows: Sequence[Any], requested: Optional[str] = None) -> List[str]:
+    """
+    Column projection from a comma-separated list (default: every column).
+    Raises ValueError for columns the dataset does not have.
+    """
+    if isinstance(rows, RowStore):
+        available = list(rows.columns)
+    else:
+        available = list(rows[0].keys()) if len(rows) else []
+    if not requested:
+        return available
+    columns = [c.strip() for c in requested.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    return columns
+
+
+def _column_block(rows: Sequence[Any], name: str, block: Sequence[int]) -> List[Any]:
+    if isinstance(rows, RowStore):
+        return rows.take(name, block)
+    return [rows[int(i)].get(name) for i in block]
+
+
+_json_encode = json.JSONEncoder(check_circular=False).encode
+
+
+def _json_values(values: List[Any]) -> List[str]:
+    # Most columns repeat a few values (types, partners, dates); encode each once
+    encoded = {v: _json_encode(v) for v in set(values)}
+    return list(map(encoded.__getitem__, values))
+
+
+def iter_export(rows: Sequence[Any], result: ResultSet, fmt: str, columns: List[str]) -> Iterator[str]:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        yield buffer.getvalue()
+    elif not columns:
+        return
+    # One NDJSON line per row: the keys are fixed, only the values vary
+    line = "{{" + ", ".join(
+        json.dumps(name).replace("{", "{{").replace("}", "}}") + ": {}" for name in columns
+    ) + "}}\n"
+    for start in range(0, result.total, EXPORT_BLOCK_ROWS):
+        block = result.positions[start:start + EXPORT_BLOCK_ROWS]
+        values = [_column_block(rows, name, block) for name in columns]
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerows(zip(*values))
+            yield buffer.getvalue()
+        else:
+            yield "".join(map(line.format, *map(_json_values, values)))
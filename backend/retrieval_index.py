@@ -0,0 +1,288 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .edi_schema import TYPE_DESCRIPTIONS, TYPE_LABELS
+from .embeddings import EmbeddingStore, find_similar_rows, quantize
+
+# ------------------------------------------------------------
+# Hybrid retrieval for free-text (UNKNOWN) questions
+#   - BM25 over each row's text (document type names, partner, status,
+#     remarks) as CSR postings: term → row positions + term frequencies
+#   - vector similarity over row embeddings, where a row's embedding is
+#     the mean of its field values' embeddings; only distinct values are
+#     ever encoded and per-row vectors are only built for candidates
+# Both rankings pick candidates; reciprocal rank fusion orders them.
+# Built at ingest from plain columns (picklable, lives in DatasetIndexes).
+# Value embeddings need the sentence encoder, so the API process computes
+# them (main._ensure_row_embeddings) and passes them in.
+# ------------------------------------------------------------
+
+TEXT_COLUMNS = ("transaction_type", "partner", "status", "remarks")
+TYPE_TEXT = {code: f"{label} {TYPE_DESCRIPTIONS[code]}" for code, label in TYPE_LABELS.items()}
+VECTOR_MAX_VALUES = 5000        # columns with more distinct values are left to BM25
+VECTOR_MIN_SIMILARITY = 0.35    # weaker vector matches are not candidates
+RETRIEVAL_CANDIDATES = 100      # per ranking, before fusion
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and any are for from have how i in is it me my of on or show tell the "
+    "there to was what which who with".split()
+)
+
+
+def tokenize(text: Any) -> List[str]:
+    # Light suffix stripping so "shipments"/"shipment" and "delayed"/"delay" meet
+    tokens = []
+    for tok in _TOKEN_RE.findall(str(text).lower()):
+        if tok in _STOPWORDS:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if len(tok) > len(suffix) + 2 and tok.endswith(suffix):
+                tok = tok[:-len(suffix)]
+                break
+        tokens.append(tok)
+    return tokens
+
+
+def _as_store(value_vectors: Any) -> EmbeddingStore:
+    # Plain float32 matrices are wrapped as-is (no copy)
+    if isinstance(value_vectors, EmbeddingStore):
+        return value_vectors
+    return quantize(value_vectors, "float32")
+
+
+@dataclass(frozen=True)
+class TextField:
+    name: str
+    values: List[str]      # text of each distinct value
+
+
+@dataclass(frozen=True)
+class RetrievalIndex:
+    """
+    Rows with identical text fields share a pattern and score the same,
+    so postings, lengths and scores are per pattern; only the winning
+    patterns are expanded back to rows.
+    """
+    row_count: int
+    fields: Tuple[TextField, ...]
+    pattern_codes: np.ndarray     # (patterns, fields) value codes; -1 = missing
+    row_patterns: np.ndarray      # pattern of each row
+    rows_by_pattern: np.ndarray   # row positions grouped by pattern
+    pattern_offsets: np.ndarray   # pattern → slice of rows_by_pattern
+    vocabulary: Dict[str, int]
+    offsets: np.ndarray           # term id → slice of postings
+    postings: np.ndarray          # pattern ids, grouped by term
+    term_freqs: np.ndarray        # occurrences of the term in that pattern
+    doc_freqs: np.ndarray         # rows containing each term
+    doc_lengths: np.ndarray       # tokens per pattern
+    avg_doc_length: float
+
+    # ---------------- keyword side ----------------
+
+    def bm25_scores(self, tokens: List[str]) -> Optional[np.ndarray]:
+        term_ids = sorted({self.vocabulary[t] for t in tokens if t in self.vocabulary})
+        if not term_ids:
+            return None
+        scores = np.zeros(len(self.pattern_codes), dtype=np.float32)
+        for t in term_ids:
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            patterns = self.postings[lo:hi]
+            tf = self.term_freqs[lo:hi].astype(np.float32)
+            df = self.doc_freqs[t]
+            idf = math.log(1.0 + (self.row_count - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[patterns] / self.avg_doc_length)
+            scores[patterns] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return scores
+
+    # ---------------- vector side ----------------
+
+    def vector_fields(self) -> List[Tuple[int, TextField]]:
+        return [(j, f) for j, f in enumerate(self.fields) if len(f.values) <= VECTOR_MAX_VALUES]
+
+    def value_texts(self) -> List[str]:
+        """
+        Texts to encode, field by field; the encoded matrix (or its
+        EmbeddingStore) is what vector_scores() and row_embeddings()
+        expect as value_vectors.
+        """
+        return [text for _, field in self.vector_fields() for text in field.values]
+
+    def _field_offsets(self) -> List[Tuple[int, int, int]]:
+        # (field position, start, end) of each vector field's values in value_vectors
+        offsets, start = [], 0
+        for j, field in self.vector_fields():
+            offsets.append((j, start, start + len(field.values)))
+            start += len(field.values)
+        return offsets
+
+    def vector_scores(self, q_vec: np.ndarray, value_vectors: Any) -> np.ndarray:
+        # Mean of per-field cosines == q · (mean of field vectors), so this
+        # ranks patterns like their embeddings would without building them;
+        # every distinct value is scored once, straight from the store
+        value_scores = _as_store(value_vectors).dot(q_vec)
+        scores = np.zeros(len(self.pattern_codes), dtype=np.float32)
+        fields = self._field_offsets()
+        for j, start, end in fields:
+            field_scores = np.append(value_scores[start:end], np.float32(0.0))   # code -1 → 0
+            scores += field_scores[self.pattern_codes[:, j]]
+        return scores / max(len(fields), 1)
+
+    def row_embeddings(self, positions: List[int], value_vectors: Any) -> np.ndarray:
+        # Only the values these rows use are widened to float32
+        store = _as_store(value_vectors)
+        patterns = self.row_patterns[positions]
+        out = np.zeros((len(positions), store.shape[1]), dtype=np.float32)
+        fields = self._field_offsets()
+        for j, start, _ in fields:
+            codes = self.pattern_codes[patterns, j].astype(np.int64)
+            present = codes >= 0
+            out[present] += store.take(start + codes[present])
+        return out / max(len(fields), 1)
+
+    # ---------------- hybrid ----------------
+
+    def _top_rows(self, scores: np.ndarray, k: int, minimum: float) -> List[int]:
+        # Rows of the best patterns scoring above minimum, best first
+        picked = np.flatnonzero(scores > minimum)
+        if len(picked) > k:
+            picked = picked[np.argpartition(-scores[picked], k)[:k]]
+        picked = picked[np.lexsort((picked, -scores[picked]))]
+        rows: List[int] = []
+        for p in picked:
+            lo, hi = self.pattern_offsets[p], self.pattern_offsets[p + 1]
+            rows.extend(self.rows_by_pattern[lo:min(hi, lo + k - len(rows))].tolist())
+            if len(rows) >= k:
+                break
+        return rows
+
+    def search(
+        self,
+        question: str,
+        q_vec: Optional[np.ndarray] = None,
+        value_vectors: Any = None,
+        top_k: int = 5,
+    ) -> List[int]:
+        """
+        Row positions most relevant to question, best first. Keyword-only
+        when no question/value vectors are given; [] when nothing matches.
+        """
+        fused: Dict[int, float] = {}
+
+        bm25 = self.bm25_scores(tokenize(question))
+        if bm25 is not None:
+            for rank, pos in enumerate(self._top_rows(bm25, RETRIEVAL_CANDIDATES, minimum=0.0)):
+                fused[pos] = 1.0 / (RRF_K + rank)
+
+        if q_vec is not None and value_vectors is not None and len(value_vectors):
+            vec = self.vector_scores(q_vec, value_vectors)
+            pool = sorted(set(fused) | set(self._top_rows(vec, RETRIEVAL_CANDIDATES, minimum=VECTOR_MIN_SIMILARITY)))
+            if pool:
+                ranked = find_similar_rows(q_vec, self.row_embeddings(pool, value_vectors), pool, top_k=len(pool))
+                for rank, pos in enumerate(ranked):
+                    fused[pos] = fused.get(pos, 0.0) + 1.0 / (RRF_K + rank)
+
+        return sorted(fused, key=lambda p: (-fused[p], p))[:top_k]
+
+
+# =====================================================
+# BUILD
+# =====================================================
+
+def _factorize(name: str, column: List[Any]) -> Tuple[np.ndarray, TextField]:
+    codes, uniques = pd.factorize(pd.Series(column, dtype=object), use_na_sentinel=True)
+    if name == "transaction_type":
+        values = [TYPE_TEXT.get(v, str(v)) for v in uniques]
+    else:
+        values = [str(v) for v in uniques]
+    return codes.astype(np.int64), TextField(name, values)
+
+
+def _smallest_int(values: np.ndarray, limit: int) -> np.ndarray:
+    dtype = np.int8 if limit < 127 else np.int16 if limit < 32767 else np.int32
+    return values.astype(dtype)
+
+
+def build_retrieval_index(columns: Dict[str, List[Any]]) -> RetrievalIndex:
+    size = len(next(iter(columns.values()), []))
+    factorized = [_factorize(name, columns[name]) for name in TEXT_COLUMNS if name in columns]
+    fields = tuple(field for _, field in factorized)
+
+    # Pattern id per row: combine the field codes one field at a time,
+    # re-factorizing so the combined key never overflows
+    row_patterns = np.zeros(size, dtype=np.int64)
+    for codes, field in factorized:
+        row_patterns, _ = pd.factorize(row_patterns * (len(field.values) + 1) + (codes + 1))
+    _, first_rows = np.unique(row_patterns, return_index=True)
+    n_patterns = len(first_rows)
+    pattern_codes = np.stack(
+        [_smallest_int(codes[first_rows], len(field.values)) for codes, field in factorized], axis=1
+    ) if factorized else np.zeros((n_patterns, 0), dtype=np.int8)
+    pattern_sizes = np.bincount(row_patterns, minlength=n_patterns)
+
+    vocabulary: Dict[str, int] = {}
+    term_parts, pattern_parts, tf_parts = [], [], []
+    doc_lengths = np.zeros(n_patterns, dtype=np.int64)
+    for j, (_, field) in enumerate(factorized):
+        # Tokenize each distinct value once, then expand to patterns by code
+        flat_terms, flat_tfs, per_value, lengths = [], [], [], []
+        for text in field.values:
+            tokens = tokenize(text)
+            counts = Counter(tokens)
+            for tok, n in counts.items():
+                flat_terms.append(vocabulary.setdefault(tok, len(vocabulary)))
+                flat_tfs.append(n)
+            per_value.append(len(counts))
+            lengths.append(len(tokens))
+        per_value = np.array(per_value + [0], dtype=np.int64)   # code -1 → no terms
+        codes = pattern_codes[:, j].astype(np.int64)
+        doc_lengths += np.array(lengths + [0], dtype=np.int64)[codes]
+
+        per_pattern = per_value[codes]
+        starts = np.concatenate(([0], np.cumsum(per_value)[:-1]))
+        owners = np.repeat(np.arange(n_patterns, dtype=np.int64), per_pattern)
+        within = np.arange(len(owners)) - np.repeat(np.cumsum(per_pattern) - per_pattern, per_pattern)
+        entry = np.repeat(starts[codes], per_pattern) + within
+        term_parts.append(np.array(flat_terms, dtype=np.int64)[entry])
+        tf_parts.append(np.array(flat_tfs, dtype=np.int64)[entry])
+        pattern_parts.append(owners)
+
+    terms = np.concatenate(term_parts) if term_parts else np.zeros(0, dtype=np.int64)
+    owners = np.concatenate(pattern_parts) if pattern_parts else np.zeros(0, dtype=np.int64)
+    tfs = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int64)
+
+    # Sort by (term, pattern) and merge the same term coming from several fields
+    span = max(n_patterns, 1)
+    key = terms * span + owners
+    order = np.argsort(key, kind="stable")
+    key, tfs = key[order], tfs[order]
+    if len(key):
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1))
+        tfs = np.add.reduceat(tfs, starts)
+        key = key[starts]
+    term_of, postings = key // span, key % span
+
+    return RetrievalIndex(
+        row_count=size,
+        fields=fields,
+        pattern_codes=pattern_codes,
+        row_patterns=row_patterns.astype(np.int32),
+        rows_by_pattern=np.argsort(row_patterns, kind="stable").astype(np.int32),
+        pattern_offsets=np.concatenate(([0], np.cumsum(pattern_sizes))).astype(np.int64),
+        vocabulary=vocabulary,
+        offsets=np.searchsorted(term_of, np.arange(len(vocabulary) + 1)).astype(np.int64),
+        postings=postings.astype(np.int32),
+        term_freqs=np.minimum(tfs, 255).astype(np.uint8),
+        doc_freqs=np.bincount(term_of, weights=pattern_sizes[postings], minlength=len(vocabulary)).astype(np.int64),
+        doc_lengths=np.minimum(doc_lengths, 65535).astype(np.uint16),
+        avg_doc_length=max(float((doc_lengths * pattern_sizes).sum()) / size, 1.0) if size else 1.0,
+    )
@@ -0,0 +1,462 @@
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------
+# Compact in-memory row storage
+# Columns are stored once per dataset instead of once per row:
+#   - text and low-cardinality columns as small integer codes into a
+#     table of distinct values (document IDs share one interned table)
+#   - ISO date columns as int32 day ordinals
+#   - remaining numeric columns as plain numpy arrays
+# Rows are exposed as read-only RowView mappings, so existing
+# row["document_id"] / row.get(...) code keeps working unchanged.
+# ------------------------------------------------------------
+
+ID_COLUMNS = ("document_id", "related_document_id")
+NUMERIC_CATEGORICAL_MAX = 256   # numeric columns with fewer distinct values become codes
+MISSING_CODE = -1
+MISSING_ORDINAL = 0
+
+
+def _code_typecode(size: int) -> str:
+    # Smallest signed array typecode that fits the codes plus MISSING_CODE
+    if size < 2 ** 7 - 1:
+        return "b"
+    if size < 2 ** 15 - 1:
+        return "h"
+    return "i"
+
+
+def _typecode(buf) -> str:
+    # array.array and memoryview.cast() spell the same item format differently
+    return buf.typecode if isinstance(buf, array) else buf.format
+
+
+@lru_cache(maxsize=65536)
+def _iso_from_ordinal(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+class CodedColumn:
+    """Codes into a table of distinct values; MISSING_CODE maps to None."""
+
+    __slots__ = ("codes", "values")
+    kind = "coded"
+
+    # array.array rather than numpy: per-row indexing returns a plain int
+    # and is several times faster, which is what RowView access does
+    def __init__(self, codes: array, values: List[Any]):
+        self.codes = codes
+        self.values = values
+
+    def get(self, i: int) -> Any:
+        code = self.codes[i]
+        return None if code == MISSING_CODE else self.values[code]
+
+    def to_list(self) -> List[Any]:
+        table = list(self.values) + [None]   # index -1 → None
+        return [table[c] for c in self.codes]
+
+
+class DateColumn:
+    """ISO dates as int32 day ordinals; MISSING_ORDINAL maps to None."""
+
+    __slots__ = ("ordinals",)
+    kind = "date"
+
+    def __init__(self, ordinals: array):
+        self.ordinals = ordinals
+
+    def get(self, i: int) -> Any:
+        ordinal = self.ordinals[i]
+        return None if ordinal == MISSING_ORDINAL else _iso_from_ordinal(ordinal)
+
+    def to_list(self) -> List[Any]:
+        return [None if o == MISSING_ORDINAL else _iso_from_ordinal(o) for o in self.ordinals]
+
+
+class NumericColumn:
+    __slots__ = ("array",)
+    kind = "numeric"
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    def get(self, i: int) -> Any:
+        return self.array[i].item()
+
+    def to_list(self) -> List[Any]:
+        return self.array.tolist()
+
+
+class StringTable(Sequence):
+    """
+    Read-only table of distinct strings over a UTF-8 blob and offsets,
+    used for large value tables loaded from an mmap'd snapshot. order
+    lists positions in sorted string order so index() can bisect.
+    """
+
+    def __init__(self, blob: memoryview, offsets: memoryview, order: memoryview):
+        self.blob = blob
+        self.offsets = offsets
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def index(self, value: Any, *args: Any) -> int:
+        if isinstance(value, str):
+            lo, hi = 0, len(self.order)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self[self.order[mid]] < value:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < len(self.order) and self[self.order[lo]] == value:
+                return self.order[lo]
+        raise ValueError(f"{value!r} is not in table")
+
+    @property
+    def nbytes(self) -> int:
+        return self.blob.nbytes + self.offsets.nbytes + self.order.nbytes
+
+
+class RowView(Mapping):
+    """Read-only mapping over one row of a RowStore."""
+
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store: "RowStore", i: int):
+        self._store = store
+        self._i = i
+
+    def __getitem__(self, key: str) -> Any:
+        return self._store.columns[key].get(self._i)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        column = self._store.columns.get(key)
+        return default if column is None else column.get(self._i)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._store.columns
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.columns)
+
+    def __len__(self) -> int:
+        return len(self._store.columns)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class RowStore(Sequence):
+    """Sequence of RowView rows backed by per-column storage."""
+
+    def __init__(self, columns: Dict[str, Any], row_count: int, mapped: bool = False):
+        self.columns = columns
+        self.row_count = row_count
+        self.mapped = mapped   # columns live in a shared mmap'd snapshot
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [RowView(self, j) for j in range(*i.indices(self.row_count))]
+        if i < 0:
+            i += self.row_count
+        if not 0 <= i < self.row_count:
+            raise IndexError("row index out of range")
+        return RowView(self, i)
+
+    def __iter__(self) -> Iterator[RowView]:
+        for i in range(self.row_count):
+            yield RowView(self, i)
+
+    def column(self, name: str) -> List[Any]:
+        """
+        Materializes one column as a list (None for missing values,
+        or all None when the column does not exist).
+        """
+        column = self.columns.get(name)
+        return column.to_list() if column is not None else [None] * self.row_count
+
+    def positions(self, name: str, value: Any) -> List[int]:
+        """
+        Row positions whose column equals value. Coded columns compare
+        integer codes in one numpy pass, without building any row views.
+        """
+        column = self.columns.get(name)
+        if column is None:
+            return []
+        if not isinstance(column, CodedColumn):
+            return [i for i, v in enumerate(column.to_list()) if v == value]
+        try:
+            code = column.values.index(value)
+        except ValueError:
+            return []
+        return np.flatnonzero(self.codes(name) == code).tolist()
+
+    def codes(self, name: str) -> Optional[np.ndarray]:
+        """Numpy view of a coded column's codes (None for other columns)."""
+        column = self.columns.get(name)
+        if not isinstance(column, CodedColumn):
+            return None
+        return np.frombuffer(column.codes, dtype=np.dtype(_typecode(column.codes)))
+
+    def ordinals(self, name: str) -> Optional[np.ndarray]:
+        """Numpy view of a date column's day ordinals (None for other columns)."""
+        column = self.columns.get(name)
+        if not isinstance(column, DateColumn):
+            return None
+        return np.frombuffer(column.ordinals, dtype=np.dtype(_typecode(column.ordinals)))
+
+    def mask(self, name: str, predicate: Any, positions: Any = None) -> Optional[np.ndarray]:
+        """
+        Boolean per row (or per given position), predicate(value) evaluated
+        once per distinct value of a coded column (None for other columns).
+        """
+        codes = self.codes(name)
+        if codes is None:
+            return None
+        values = self.columns[name].values
+        table = np.array([bool(predicate(v)) for v in values] + [bool(predicate(None))])   # -1 → None
+        return table[codes if positions is None else codes[positions]]
+
+    def value_counts(self, name: str, positions: Any) -> List[Any]:
+        """(value, count) pairs over the given rows, most frequent first."""
+        column = self.columns.get(name)
+        if column is None:
+            return [(None, len(positions))] if len(positions) else []
+        if isinstance(column, CodedColumn):
+            counts = np.bincount(self.codes(name)[positions] + 1, minlength=1)
+            pairs = [
+                (None if k == 0 else column.values[k - 1], int(counts[k]))
+                for k in np.flatnonzero(counts)
+            ]
+        else:
+            tally: Dict[Any, int] = {}
+            for i in positions:
+                value = column.get(int(i))
+                tally[value] = tally.get(value, 0) + 1
+            pairs = list(tally.items())
+        return sorted(pairs, key=lambda kv: -kv[1])
+
+    def take(self, name: str, positions: Any) -> List[Any]:
+        """
+        One column's values at the given positions, read straight from the
+        column arrays (no RowView per row). Used to stream result blocks.
+        """
+        column = self.columns.get(name)
+        if column is None:
+            return [None] * len(positions)
+        if isinstance(column, CodedColumn):
+            values = column.values
+            return [None if c == MISSING_CODE else values[c] for c in self.codes(name)[positions].tolist()]
+        if isinstance(column, DateColumn):
+            return [
+                None if o == MISSING_ORDINAL else _iso_from_ordinal(o)
+                for o in self.ordinals(name)[positions].tolist()
+            ]
+        return column.array[positions].tolist()
+
+    def select(self, name: str, value: Any) -> List[RowView]:
+        return [RowView(self, i) for i in self.positions(name, value)]
+
+    def memory_report(self) -> Dict[str, Any]:
+        seen_tables = set()
+        per_column: Dict[str, Dict[str, Any]] = {}
+        for name, column in self.columns.items():
+            if isinstance(column, CodedColumn):
+                nbytes = column.codes.itemsize * len(column.codes)
+                # Shared value tables (document IDs) are counted once
+                if id(column.values) not in seen_tables:
+                    seen_tables.add(id(column.values))
+                    if isinstance(column.values, StringTable):
+                        nbytes += column.values.nbytes
+                    else:
+                        nbytes += sys.getsizeof(column.values) + sum(sys.getsizeof(v) for v in column.values)
+                detail = {"distinct_values": len(column.values)}
+            elif isinstance(column, DateColumn):
+                nbytes = column.ordinals.itemsize * len(column.ordinals)
+                detail = {}
+            else:
+                nbytes = column.array.nbytes
+                detail = {}
+            per_column[name] = {"kind": column.kind, "bytes": nbytes, **detail}
+
+        total = sum(c["bytes"] for c in per_column.values())
+        return {
+            "rows": self.row_count,
+            "total_bytes": total,
+            "bytes_per_row": total / self.row_count if self.row_count else 0.0,
+            "mapped": self.mapped,
+            "columns": per_column,
+        }
+
+
+# =====================================================
+# BUILD
+# =====================================================
+
+def _coded(series: pd.Series, interned: bool = False) -> CodedColumn:
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    values = uniques.tolist()
+    if interned:
+        values = [sys.intern(v) if isinstance(v, str) else v for v in values]
+    typecode = _code_typecode(len(values))
+    return CodedColumn(array(typecode, codes.astype(np.dtype(typecode)).tobytes()), values)
+
+
+def _as_date_column(series: pd.Series, trusted: bool = False) -> Optional[DateColumn]:
+    # Only when every present value is a canonical YYYY-MM-DD string,
+    # so reading it back returns exactly what the CSV contained. Columns
+    # already validated by the EDI schema skip the round-trip check.
+    if series.dtype.kind in "biuf" or not len(series):
+        return None
+    present = series.notna()
+    parsed = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+    if not trusted:
+        if not (parsed.notna() == present).all():
+            return None
+        if not (parsed[present].dt.strftime("%Y-%m-%d") == series[present].astype(str)).all():
+            return None
+    epoch = date(1970, 1, 1).toordinal()
+    days = parsed.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    ordinals = np.where(present.to_numpy(), days + epoch, MISSING_ORDINAL).astype(np.int32)
+    return DateColumn(array("i", ordinals.tobytes()))
+
+
+def _shared_id_columns(df: pd.DataFrame) -> Dict[str, CodedColumn]:
+    # document_id and related_document_id draw from one interned ID table
+    names = [n for n in ID_COLUMNS if n in df.columns and df[n].dtype.kind not in "biuf"]
+    if not names:
+        return {}
+    combined = pd.concat([df[n] for n in names], ignore_index=True)
+    coded = _coded(combined, interned=True)
+    out: Dict[str, CodedColumn] = {}
+    for k, name in enumerate(names):
+        out[name] = CodedColumn(coded.codes[k * len(df):(k + 1) * len(df)], coded.values)
+    return out
+
+
+def build_row_store(df: pd.DataFrame, date_columns: Sequence[str] = ()) -> RowStore:
+    id_columns = _shared_id_columns(df)
+    columns: Dict[str, Any] = {}
+    for raw_name in df.columns:
+        name = str(raw_name)
+        series = df[raw_name]
+        if name in id_columns:
+            columns[name] = id_columns[name]
+        elif series.dtype.kind in "biuf":
+            if series.nunique(dropna=True) <= NUMERIC_CATEGORICAL_MAX and not series.isna().any():
+                columns[name] = _coded(series)
+            else:
+                columns[name] = NumericColumn(series.to_numpy())
+        else:
+            columns[name] = (
+                _as_date_column(series, trusted=name in date_columns)
+                or _coded(series, interned=True)
+            )
+    return RowStore(columns, len(df))
+
+
+# =====================================================
+# SNAPSHOT FILES (shared across processes via mmap)
+# =====================================================
+
+STRING_TABLE_MIN = 1024   # larger all-string value tables are stored as blobs
+
+
+def _write(path: str, data) -> None:
+    with open(path, "wb") as fh:
+        fh.write(memoryview(data).cast("B"))
+
+
+def _map(path: str, typecode: str) -> memoryview:
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return memoryview(array(typecode))
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast(typecode)
+
+
+def _save_table(directory: str, prefix: str, values: List[Any]) -> Dict[str, Any]:
+    if len(values) < STRING_TABLE_MIN or not all(isinstance(v, str) for v in values):
+        return {"inline": list(values)}
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    order = sorted(range(len(values)), key=values.__getitem__)
+    _write(os.path.join(directory, f"{prefix}.blob"), b"".join(encoded))
+    _write(os.path.join(directory, f"{prefix}.offsets"), offsets)
+    _write(os.path.join(directory, f"{prefix}.order"), np.asarray(order, dtype=np.int64))
+    return {"blob": prefix}
+
+
+def _load_table(directory: str, meta: Dict[str, Any]):
+    if "inline" in meta:
+        return meta["inline"]
+    prefix = os.path.join(directory, meta["blob"])
+    return StringTable(_map(f"{prefix}.blob", "B"), _map(f"{prefix}.offsets", "q"), _map(f"{prefix}.order", "q"))
+
+
+def save_row_store(directory: str, store: RowStore) -> Dict[str, Any]:
+    """
+    Writes every column as raw array files under directory and returns
+    the (small, picklable) layout needed by load_row_store.
+    """
+    tables: Dict[int, str] = {}
+    table_meta: Dict[str, Dict[str, Any]] = {}
+    columns = []
+    for i, (name, column) in enumerate(store.columns.items()):
+        if isinstance(column, CodedColumn):
+            key = tables.get(id(column.values))
+            if key is None:
+                key = tables[id(column.values)] = f"t{len(tables)}"
+                table_meta[key] = _save_table(directory, key, column.values)
+            _write(os.path.join(directory, f"c{i}.codes"), column.codes)
+            columns.append((name, "coded", {"typecode": _typecode(column.codes), "table": key}))
+        elif isinstance(column, DateColumn):
+            _write(os.path.join(directory, f"c{i}.dates"), column.ordinals)
+            columns.append((name, "date", {}))
+        else:
+            np.save(os.path.join(directory, f"c{i}.npy"), column.array)
+            columns.append((name, "numeric", {}))
+    return {"row_count": store.row_count, "columns": columns, "tables": table_meta}
+
+
+def load_row_store(directory: str, layout: Dict[str, Any]) -> RowStore:
+    """
+    Attaches to a saved store without copying: arrays are memory-mapped
+    read-only, so every process mapping the same files shares the pages.
+    """
+    tables = {key: _load_table(directory, meta) for key, meta in layout["tables"].items()}
+    columns: Dict[str, Any] = {}
+    for i, (name, kind, info) in enumerate(layout["columns"]):
+        if kind == "coded":
+            codes = _map(os.path.join(directory, f"c{i}.codes"), info["typecode"])
+            columns[name] = CodedColumn(codes, tables[info["table"]])
+        elif kind == "date":
+            columns[name] = DateColumn(_map(os.path.join(directory, f"c{i}.dates"), "i"))
+        else:
+            columns[name] = NumericColumn(np.load(os.path.join(directory, f"c{i}.npy"), mmap_mode="r"))
+    return RowStore(columns, layout["row_count"], mapped=True)
@@ -0,0 +1,249 @@
+import argparse
+import csv
+import random
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, TextIO
+
+# ------------------------------------------------------------
+# Deterministic synthetic EDI dataset generator
+# Produces the same columns as data/edi_sample.csv. Each PO starts a
+# lifecycle PO(850) → ACK(855) → ASN(856) → INV(810) → FA(997);
+# later steps are dropped or delayed according to the configured ratios.
+# ------------------------------------------------------------
+
+CSV_COLUMNS = [
+    "transaction_type",
+    "document_id",
+    "related_document_id",
+    "partner",
+    "status",
+    "created_date",
+    "expected_date",
+    "actual_date",
+    "remarks",
+]
+
+_PARTNER_BASES = [
+    "Amazon", "Walmart", "Target", "Costco", "Home Depot", "Lowes",
+    "Best Buy", "Kroger", "Acme", "Globex", "Initech", "Umbrella",
+    "Stark Industries", "Wayne Enterprises", "Hooli", "Soylent",
+]
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    rows: int = 10_000
+    partners: int = 20
+    completeness_ratio: float = 0.8   # chance each later lifecycle step exists
+    delay_ratio: float = 0.15         # chance an ASN ships late / is flagged delayed
+    paid_ratio: float = 0.6           # chance an invoice is already paid
+    seed: int = 42
+    start_date: date = date(2025, 1, 1)
+    days_span: int = 365
+
+
+def partner_names(count: int) -> List[str]:
+    names = []
+    for i in range(count):
+        base = _PARTNER_BASES[i % len(_PARTNER_BASES)]
+        round_no = i // len(_PARTNER_BASES)
+        names.append(base if round_no == 0 else f"{base} {round_no + 1}")
+    return names
+
+
+def _iso(d: Optional[date]) -> str:
+    return d.isoformat() if d else ""
+
+
+def iter_rows(config: SyntheticConfig) -> Iterator[List[str]]:
+    """
+    Yields CSV rows (as lists) until config.rows rows have been produced.
+    Same config → same output, byte for byte.
+    """
+    rng = random.Random(config.seed)
+    partners = partner_names(max(1, config.partners))
+    emitted = 0
+    n = 1000
+
+    while emitted < config.rows:
+        n += 1
+        buyer = rng.choice(partners)
+        supplier = rng.choice(partners)
+        created = config.start_date + timedelta(days=rng.randrange(config.days_span))
+        lifecycle: List[List[str]] = []
+
+        po_id = f"PO{n}"
+        po_expected = created + timedelta(days=rng.randint(3, 10))
+        lifecycle.append(["850", po_id, "", buyer, "created", _iso(created), _iso(po_expected), "", "Purchase order created"])
+
+        if rng.random() < config.completeness_ratio:
+            ack_date = created + timedelta(days=1)
+            accepted = rng.random() > 0.05
+            lifecycle.append([
+                "855", f"ACK{n}", po_id, supplier,
+                "accepted" if accepted else "rejected",
+                _iso(ack_date), _iso(ack_date), _iso(ack_date) if accepted else "",
+                "PO acknowledged" if accepted else "PO rejected",
+            ])
+
+            if accepted and rng.random() < config.completeness_ratio:
+                asn_created = ack_date + timedelta(days=1)
+                asn_expected = asn_created + timedelta(days=rng.randint(1, 5))
+                delayed = rng.random() < config.delay_ratio
+                if delayed and rng.random() < 0.5:
+                    # Still in transit and flagged by status only
+                    asn_actual = None
+                    status = "delayed"
+                elif delayed:
+                    asn_actual = asn_expected + timedelta(days=rng.randint(1, 7))
+                    status = "shipped"
+                else:
+                    asn_actual = asn_expected - timedelta(days=rng.randint(0, 1))
+                    status = "shipped"
+                lifecycle.append([
+                    "856", f"ASN{n}", po_id, supplier, status,
+                    _iso(asn_created), _iso(asn_expected), _iso(asn_actual),
+                    "Shipment delayed" if delayed else "Shipment sent",
+                ])
+
+                if rng.random() < config.completeness_ratio:
+                    inv_created = (asn_actual or asn_expected) + timedelta(days=1)
+                    inv_due = inv_created + timedelta(days=30)
+                    paid = rng.random() < config.paid_ratio
+                    lifecycle.append([
+                        "810", f"INV{n}", po_id, supplier,
+                        "paid" if paid else "pending",
+                        _iso(inv_created), _iso(inv_due),
+                        _iso(inv_created + timedelta(days=rng.randint(1, 30))) if paid else "",
+                        "Invoice paid" if paid else "Invoice pending",
+                    ])
+
+                    if rng.random() < config.completeness_ratio:
+                        fa_date = inv_created + timedelta(days=1)
+                        lifecycle.append([
+                            "997", f"FA{n}", f"INV{n}", buyer, "received",
+                            _iso(fa_date), _iso(fa_date), _iso(fa_date),
+                            "Functional acknowledgment received",
+                        ])
+
+        for row in lifecycle:
+            if emitted >= config.rows:
+                return
+            yield row
+            emitted += 1
+
+
+def write_csv(out: TextIO, config: SyntheticConfig) -> int:
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for row in iter_rows(config):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def generate_csv(path: str, config: SyntheticConfig) -> int:
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        return write_csv(fh, config)
+
+
+# ------------------------------------------------------------
+# Same dataset as raw X12 (one interchange per document), for the
+# streaming X12 ingest path. Information X12 has no field for (paid
+# invoices, "delayed" ASNs without a ship date) does not survive.
+# ------------------------------------------------------------
+
+_X12_RECEIVER = "EDIASSISTANT"
+
+
+def _x12_id(name: str) -> str:
+    return re.sub(r"[^0-9A-Z]", "", name.upper())[:15] or "UNKNOWN"
+
+
+def _x12_date(iso: str) -> str:
+    return iso.replace("-", "")
+
+
+def _x12_body(row: List[str], controls: dict) -> List[str]:
+    tx, doc_id, related, partner, status, created, expected, actual, remarks = row
+    if tx == "850":
+        body = [f"BEG*00*SA*{doc_id}**{_x12_date(created)}", f"DTM*002*{_x12_date(expected)}", f"N1*BY*{partner}"]
+    elif tx == "855":
+        ack = "AC" if status == "accepted" else "RJ"
+        body = [f"BAK*00*{ack}*{related}*{_x12_date(created)}****{doc_id}*{_x12_date(created)}",
+                f"DTM*067*{_x12_date(expected)}", f"N1*SU*{partner}"]
+    elif tx == "856":
+        body = [f"BSN*00*{doc_id}*{_x12_date(created)}*1200", f"PRF*{related}", f"DTM*017*{_x12_date(expected)}"]
+        if actual:
+            body.append(f"DTM*011*{_x12_date(actual)}")
+        body.append(f"N1*SU*{partner}")
+    elif tx == "810":
+        body = [f"BIG*{_x12_date(created)}*{doc_id}**{related}", f"ITD*01*3****{_x12_date(expected)}", f"N1*SU*{partner}"]
+    else:
+        group, st = controls.get(related, ("0", "0"))
+        body = [f"AK1*IN*{group}", f"AK2*810*{st}", "AK5*A", "AK9*A*1*1*1"]
+    if remarks:
+        body.append(f"NTE*GEN*{remarks}")
+    return body
+
+
+_X12_GROUP = {"850": "PO", "855": "PR", "856": "SH", "810": "IN", "997": "FA"}
+
+
+def write_x12(out: TextIO, config: SyntheticConfig) -> int:
+    controls = {}   # document_id → (GS06, ST02), so a 997 can acknowledge it
+    count = 0
+    for row in iter_rows(config):
+        count += 1
+        tx, doc_id, partner, created = row[0], row[1], row[3], row[5]
+        ctrl = str(count)
+        controls[doc_id] = (ctrl, "0001")
+        body = _x12_body(row, controls)
+        segments = [
+            f"ISA*00*          *00*          *ZZ*{_x12_id(partner):<15}*ZZ*{_X12_RECEIVER:<15}"
+            f"*{_x12_date(created)[2:]}*1200*U*00401*{count:09d}*0*P*>",
+            f"GS*{_X12_GROUP[tx]}*{_x12_id(partner)}*{_X12_RECEIVER}*{_x12_date(created)}*1200*{ctrl}*X*004010",
+            f"ST*{tx}*0001",
+            *body,
+            f"SE*{len(body) + 2}*0001",
+            f"GE*1*{ctrl}",
+            f"IEA*1*{count:09d}",
+        ]
+        out.write("~\n".join(segments) + "~\n")
+    return count
+
+
+def generate_x12(path: str, config: SyntheticConfig) -> int:
+    with open(path, "w", newline="", encoding="latin-1") as fh:
+        return write_x12(fh, config)
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic EDI CSV.")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=SyntheticConfig.rows)
+    parser.add_argument("--partners", type=int, default=SyntheticConfig.partners)
+    parser.add_argument("--completeness", type=float, default=SyntheticConfig.completeness_ratio)
+    parser.add_argument("--delay", type=float, default=SyntheticConfig.delay_ratio)
+    parser.add_argument("--paid", type=float, default=SyntheticConfig.paid_ratio)
+    parser.add_argument("--seed", type=int, default=SyntheticConfig.seed)
+    parser.add_argument("--x12", action="store_true", help="write raw X12 interchanges instead of CSV")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(
+        rows=args.rows,
+        partners=args.partners,
+        completeness_ratio=args.completeness,
+        delay_ratio=args.delay,
+        paid_ratio=args.paid,
+        seed=args.seed,
+    )
+    count = (generate_x12 if args.x12 else generate_csv)(args.path, config)
+    print(f"Wrote {count} rows to {args.path}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import dataset_store
+from backend.dataset_index import build_dataset_indexes, columns_from_rows
+from backend.lifecycle_index import build_lifecycle_positions, materialize_lifecycle_indexes
+from backend.row_store import build_row_store
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, "DATASET_DIR", str(tmp_path))
+    monkeypatch.setattr(dataset_store, "_current_key", None)
+    return tmp_path
+
+
+def _rows():
+    return build_row_store(pd.DataFrame({
+        "transaction_type": [850, 810],
+        "document_id": ["PO1", "INV1"],
+        "related_document_id": [None, "PO1"],
+    }))
+
+
+REJECTED = {"count": 1, "sample": [{"line": 4, "reasons": ["invalid created_date"]}]}
+
+
+def test_snapshot_round_trip(store_dir):
+    staging = dataset_store.write_staging("job1", _rows(), {"k": 1}, {"PO1": {}})
+    version = dataset_store.commit(staging)
+
+    assert version == 1
+    assert dataset_store.current_version() == 1
+    snapshot = dataset_store.load(version)
+    assert [r["document_id"] for r in snapshot.rows] == ["PO1", "INV1"]
+    assert snapshot.rows[1]["related_document_id"] == "PO1"
+    assert snapshot.dataset_indexes == {"k": 1}
+
+
+def test_dedup_hit_keeps_source_hash_and_rejects(store_dir):
+    dataset_store.commit(dataset_store.write_staging("job1", _rows(), None, {}, content_hash="abc", rejected=REJECTED))
+    dataset_store.commit(dataset_store.write_staging("job2", _rows(), None, {}, content_hash="def"))
+
+    assert dataset_store.find_version("abc") == 1
+    assert dataset_store.find_version("zzz") is None
+    assert dataset_store.rejected_report(2) is None
+
+    # Re-upload of the first file: its snapshot is staged again and committed
+    version = dataset_store.commit(dataset_store.clone_staging(1, "job3"))
+    assert version == 3
+    assert dataset_store.find_version("abc") == 3
+    assert dataset_store.rejected_report(3) == REJECTED
+    assert dataset_store.current_version() == 3
+
+
+def test_old_versions_are_pruned(store_dir, monkeypatch):
+    monkeypatch.setattr(dataset_store, "KEEP_VERSIONS", 2)
+    for i in range(3):
+        dataset_store.commit(dataset_store.write_staging(f"job{i}", _rows(), None, {}))
+
+    assert sorted(p.name for p in store_dir.iterdir() if p.name.startswith("v")) == ["v2", "v3"]
+    assert not any(p.name.startswith(".staging-") for p in store_dir.iterdir())
+
+
+def test_index_arrays_are_memory_mapped(store_dir, monkeypatch):
+    monkeypatch.setattr(dataset_store, "SHARED_ARRAY_MIN_BYTES", 0)
+    rows = _rows()
+    columns = dict(columns_from_rows(rows))
+    positions = build_lifecycle_positions(columns["transaction_type"], columns["document_id"], columns["related_document_id"])
+    version = dataset_store.commit(dataset_store.write_staging("job1", rows, build_dataset_indexes(columns), positions))
+
+    snapshot = dataset_store.load(version)
+    assert isinstance(snapshot.lifecycle_positions["inv_by_related"].positions, np.memmap)
+    assert isinstance(snapshot.dataset_indexes.document_ids.ids, np.memmap)
+    lifecycle = materialize_lifecycle_indexes(snapshot.rows, snapshot.lifecycle_positions)
+    assert [r["document_id"] for r in lifecycle.inv_by_related["PO1"]] == ["INV1"]
+    assert snapshot.dataset_indexes.document_ids.candidates("1") == ["INV1", "PO1"]
+
+
+def test_load_moves_past_a_pruned_version(store_dir, monkeypatch):
+    monkeypatch.setattr(dataset_store, "KEEP_VERSIONS", 2)
+    first = dataset_store.commit(dataset_store.write_staging("job0", _rows(), None, {}))
+    # Two more commits from another worker prune the version it was about to load
+    for i in range(2):
+        dataset_store.commit(dataset_store.write_staging(f"job{i + 1}", _rows(), None, {}))
+
+    assert not (store_dir / f"v{first}").exists()
+    assert dataset_store.load(first).version == 3
+
+
+def test_load_of_a_missing_latest_version_fails(store_dir):
+    with pytest.raises(FileNotFoundError):
+        dataset_store.load(1)
@@ -0,0 +1,34 @@
+from backend.document_index import build_document_id_index, numeric_key
+
+IDS = ["PO1001", "INV1001", "ASN0001001", "PO1001", "PO12", "ACK", "INV10010"]
+TYPES = [850, 810, 856, 850, 850, 855, 810]
+
+
+def test_numeric_key_strips_prefix_and_leading_zeros():
+    assert numeric_key("ASN0001001") == "1001"
+    assert numeric_key(" 42 ") == "42"
+    assert numeric_key("ACK") is None
+    assert numeric_key(None) is None
+
+
+def test_candidates_share_the_numeric_part():
+    index = build_document_id_index(IDS, TYPES)
+
+    assert index.candidates("1001") == ["ASN0001001", "INV1001", "PO1001"]
+    assert index.candidates("001001") == ["ASN0001001", "INV1001", "PO1001"]
+    assert index.candidates("1001", "INVOICE") == ["INV1001"]
+    assert index.candidates("1001", "FA") == []
+    assert index.candidates("100") == []
+
+
+def test_resolve_only_unambiguous_numbers():
+    index = build_document_id_index(IDS, TYPES)
+
+    assert index.resolve("1001") is None
+    assert index.resolve("1001", "PO") == "PO1001"
+    assert index.resolve("12") == "PO12"
+    assert index.resolve("7") is None
+
+
+def test_empty_index():
+    assert build_document_id_index([], []).candidates("1") == []
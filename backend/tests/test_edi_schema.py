@@ -0,0 +1,107 @@
+import io
+
+import pandas as pd
+import pytest
+
+from backend.csv_utils import iter_edi_chunks
+from backend.edi_schema import MAX_REJECTED_SAMPLE, RejectReport, SchemaError, validate_chunk
+from backend.lifecycle_service import _parse_date
+
+HEADER = "transaction_type,document_id,related_document_id,partner,status,created_date,expected_date,actual_date,remarks\n"
+
+
+def _chunk(rows):
+    return pd.DataFrame(rows, columns=HEADER.strip().split(","), dtype=object)
+
+
+def test_valid_rows_are_typed():
+    report = RejectReport()
+    clean = validate_chunk(_chunk([
+        ["850", " PO1001 ", None, "Costco", "created", "2025-05-21", "2025-05-27", None, ""],
+    ]), 2, report)
+
+    assert report.count == 0
+    row = clean.iloc[0]
+    assert clean["transaction_type"].dtype == "int64"
+    assert row["transaction_type"] == 850
+    assert row["document_id"] == "PO1001"
+    assert row["created_date"] == "2025-05-21"
+    assert row["actual_date"] is None
+    assert row["related_document_id"] is None
+    assert row["remarks"] is None   # blank text is missing, never ""
+
+
+def test_rejected_rows_are_dropped_and_reported_with_line_numbers():
+    report = RejectReport()
+    clean = validate_chunk(_chunk([
+        ["850", "PO1", None, "A", "created", "2025-05-21", None, None, None],
+        ["999", "PO2", None, "A", "created", "2025-05-21", None, None, None],
+        ["850", None, None, "A", "created", "2025-05-21", None, None, None],
+        ["810", "INV4", "PO1", "A", "pending", "21/05/2025", None, None, None],
+        ["850.5", "PO5", None, "A", "created", "2025-02-30", None, None, None],
+    ]), 10, report)
+
+    assert list(clean["document_id"]) == ["PO1"]
+    assert report.count == 4
+    assert report.sample == [
+        {"line": 11, "reasons": ["invalid transaction_type"]},
+        {"line": 12, "reasons": ["missing document_id"]},
+        {"line": 13, "reasons": ["invalid created_date"]},
+        {"line": 14, "reasons": ["invalid transaction_type", "invalid created_date"]},
+    ]
+
+
+def test_whitespace_only_required_fields_are_missing():
+    report = RejectReport()
+    clean = validate_chunk(_chunk([
+        ["850", "   ", None, "B", "open", None, None, None, None],
+        [" ", "PO2", None, "B", "open", None, None, None, None],
+        ["850", "PO3", None, "B", "open", None, None, None, None],
+    ]), 2, report)
+
+    assert list(clean["document_id"]) == ["PO3"]
+    assert report.sample == [
+        {"line": 2, "reasons": ["missing document_id"]},
+        {"line": 3, "reasons": ["missing transaction_type"]},
+    ]
+
+
+def test_reject_sample_is_capped_but_count_is_not():
+    report = RejectReport()
+    rows = [["123", f"X{i}", None, None, None, None, None, None, None] for i in range(MAX_REJECTED_SAMPLE + 5)]
+    clean = validate_chunk(_chunk(rows), 2, report)
+
+    assert clean.empty
+    assert report.count == MAX_REJECTED_SAMPLE + 5
+    assert len(report.sample) == MAX_REJECTED_SAMPLE
+
+
+def test_missing_required_column_fails_the_upload():
+    with pytest.raises(SchemaError, match="document_id"):
+        validate_chunk(pd.DataFrame({"transaction_type": ["850"]}, dtype=object), 2, RejectReport())
+
+
+def test_csv_line_numbers_count_the_header():
+    data = HEADER + (
+        "850,PO1,,A,created,2025-05-21,,,\n"
+        "850,PO2,,A,created,not-a-date,,,\n"
+        "850,   ,,B,open,,,,\n"
+        "855,ACK1,PO1,A,accepted,2025-05-22,2025-05-22,2025-05-22,\n"
+    )
+    report = RejectReport()
+    chunks = list(iter_edi_chunks(io.BytesIO(data.encode()), report))
+
+    assert sum(raw for _, raw in chunks) == 4
+    assert [d for chunk, _ in chunks for d in chunk["document_id"]] == ["PO1", "ACK1"]
+    assert report.to_dict() == {"count": 2, "sample": [
+        {"line": 3, "reasons": ["invalid created_date"]},
+        {"line": 4, "reasons": ["missing document_id"]},
+    ]}
+
+
+def test_lifecycle_dates_are_iso_only():
+    # Safe only because validate_chunk canonicalizes every date column
+    assert _parse_date("2025-05-21").isoformat() == "2025-05-21"
+    assert _parse_date(None) is None
+    with pytest.raises(ValueError):
+        _parse_date("05/21/2025")
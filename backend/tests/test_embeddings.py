@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from backend.embeddings import SCORE_BLOCK_ROWS, quantize
+
+
+def _unit_vectors(n, dim=384, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("precision, bytes_per_value", [("float32", 4), ("float16", 2), ("int8", 1)])
+def test_storage_size(precision, bytes_per_value):
+    store = quantize(_unit_vectors(10), precision)
+
+    assert store.precision == precision
+    assert store.vectors.nbytes == 10 * 384 * bytes_per_value
+    assert store.nbytes == store.vectors.nbytes + (10 * 4 if precision == "int8" else 0)
+
+
+def test_int8_round_trip_stays_within_half_a_step():
+    vectors = _unit_vectors(SCORE_BLOCK_ROWS + 50)
+    store = quantize(vectors, "int8")
+
+    error = np.abs(store.take(np.arange(len(vectors))) - vectors)
+    assert (error <= store.scales[:, None] / 2 + 1e-7).all()
+
+    q = vectors[7]
+    exact = vectors @ q
+    bound = np.abs(q).sum() * store.scales / 2    # every component off by at most half a step
+    assert (np.abs(store.dot(q) - exact) <= bound + 1e-5).all()
+    assert int(np.argmax(store.dot(q))) == 7
+
+
+def test_float16_round_trip_error():
+    vectors = _unit_vectors(SCORE_BLOCK_ROWS + 50)
+    store = quantize(vectors, "float16")
+
+    assert np.abs(store.take(np.arange(len(vectors))) - vectors).max() <= 2.0 ** -11
+    q = vectors[3]
+    assert np.abs(store.dot(q) - vectors @ q).max() < 1e-3
+    assert int(np.argmax(store.dot(q))) == 3
+
+
+def test_zero_vectors_and_requantizing():
+    vectors = np.vstack([np.zeros(4, dtype=np.float32), [0.5, -1.0, 0.25, 0.0]])
+    store = quantize(vectors, "int8")
+
+    assert store.scales[0] == 1.0
+    assert store.take([0]).tolist() == [[0.0] * 4]
+    assert quantize(store, "int8") is store
+    assert np.allclose(quantize(store, "float32").vectors, store.take([0, 1]))
+    with pytest.raises(ValueError, match="precision must be one of"):
+        quantize(vectors, "int4")
@@ -0,0 +1,103 @@
+import io
+import os
+import time
+from concurrent.futures import Future
+from threading import Event, Thread
+
+import pytest
+from fastapi import UploadFile
+
+from backend import ingest_jobs
+
+
+class _IdlePool:
+    # Accepts jobs and never runs them, so they stay pending
+    def submit(self, *args, **kwargs):
+        return Future()
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "_jobs", {})
+    monkeypatch.setattr(ingest_jobs, "_ensure_pool", lambda: _IdlePool())
+    monkeypatch.setattr(ingest_jobs, "_reuse_dataset", lambda job: False)
+    monkeypatch.setattr(ingest_jobs, "MAX_PENDING_INGEST_JOBS", 2)
+    return ingest_jobs
+
+
+def _upload(name="edi.csv", data=b"transaction_type,document_id\n850,PO1\n"):
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def test_pending_cap_holds_for_concurrent_uploads(jobs, monkeypatch):
+    release = Event()
+    spool = jobs._spool
+
+    def slow_spool(file):
+        release.wait(5)
+        return spool(file)
+
+    monkeypatch.setattr(jobs, "_spool", slow_spool)
+    accepted, refused = [], []
+
+    def submit():
+        try:
+            accepted.append(jobs.submit_upload(_upload()))
+        except jobs.IngestQueueFull:
+            refused.append(1)
+
+    threads = [Thread(target=submit) for _ in range(6)]
+    for t in threads:
+        t.start()
+    # Every upload past the cap is refused while the first ones are still spooling
+    deadline = time.monotonic() + 5
+    while len(refused) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert (len(accepted), len(refused)) == (2, 4)
+    assert all(job.bytes_total > 0 and job.content_hash for job in accepted)
+
+
+def test_failed_spool_frees_its_slot(jobs, monkeypatch):
+    def broken_spool(file):
+        raise OSError("client went away")
+
+    monkeypatch.setattr(jobs, "_spool", broken_spool)
+    for _ in range(3):
+        with pytest.raises(OSError):
+            jobs.submit_upload(_upload())
+    assert all(job.status == "failed" and job.done.is_set() for job in jobs._jobs.values())
+
+
+def test_spool_keeps_the_upload_extension(jobs):
+    for name, suffix in (("orders.x12", ".x12"), ("data.CSV", ".csv"), ("no-extension", ".upload"), (None, ".upload")):
+        path, digest = jobs._spool(_upload(name, b"ISA*00"))
+        try:
+            assert path.endswith(suffix)
+            assert len(digest) == 64
+        finally:
+            os.unlink(path)
+
+
+def test_worker_ingest_returns_rows_indexes_and_rejects(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_jobs.dataset_store, "DATASET_DIR", None)
+    path = tmp_path / "upload.csv"
+    path.write_text(
+        "transaction_type,document_id,related_document_id,partner,status,created_date,expected_date,actual_date,remarks\n"
+        "850,PO1,,Costco,created,2025-05-01,2025-05-10,,\n"
+        "810,INV1,PO1,Costco,pending,2025-05-02,2025-06-01,,\n"
+        "999,X1,,Costco,created,2025-05-01,,,\n"
+    )
+    progress = {}
+    payload = ingest_jobs._run_ingest(str(path), "job", progress)
+
+    assert not path.exists()   # the spooled copy is always removed
+    assert payload["row_count"] == 2
+    assert [r["document_id"] for r in payload["rows"]] == ["PO1", "INV1"]
+    assert list(payload["lifecycle_positions"]["inv_by_related"].find("PO1")) == [1]
+    assert payload["dataset_indexes"].document_ids.resolve("1", "INVOICE") == "INV1"
+    assert payload["rejected"]["count"] == 1
+    assert progress["job"]["rows"] == 3
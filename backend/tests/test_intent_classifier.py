@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+
+from backend.intent_classifier import features, load_model, read_log, train
+
+EXAMPLES = [
+    ("status of PO1001", "GET_STATUS"),
+    ("what is the status of invoice 42", "GET_STATUS"),
+    ("current state of ASN7", "GET_STATUS"),
+    ("show overdue invoices", "CHECK_OVERDUE"),
+    ("which invoices are past due", "CHECK_OVERDUE"),
+    ("list unpaid overdue bills", "CHECK_OVERDUE"),
+    ("tell me a joke", "UNKNOWN"),
+    ("what's the weather", "UNKNOWN"),
+]
+
+
+def test_features_ignore_numbers_case_and_spacing():
+    ids, values = features("Invoice 245  status")
+    other_ids, other_values = features("invoice 88 status")
+
+    assert np.array_equal(ids, other_ids) and np.allclose(values, other_values)
+    assert np.isclose(values @ values, 1.0)
+
+
+def test_trained_model_predicts_and_survives_a_save(tmp_path):
+    model = train(EXAMPLES)
+
+    intent, confidence = model.predict("status of PO2002")
+    assert intent == "GET_STATUS" and confidence > 0.5
+    assert model.predict("are any invoices overdue")[0] == "CHECK_OVERDUE"
+    assert np.isclose(model.probabilities("anything").sum(), 1.0)
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = load_model(path)
+    assert loaded.intents == model.intents
+    assert np.allclose(loaded.probabilities("status of PO2002"), model.probabilities("status of PO2002"))
+
+
+def test_read_log_keeps_the_latest_label(tmp_path):
+    path = tmp_path / "intents.jsonl"
+    path.write_text(
+        json.dumps({"question": "late orders", "intent": "CHECK_DELAY"}) + "\n"
+        + '{"question": "torn\n'
+        + json.dumps({"question": "Late  orders", "intent": "LIST_DOCUMENTS"}) + "\n"
+    )
+
+    assert read_log(str(path)) == [("Late  orders", "LIST_DOCUMENTS")]
+    assert read_log(str(tmp_path / "missing.jsonl")) == []
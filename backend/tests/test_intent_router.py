@@ -0,0 +1,267 @@
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from backend import intent_router
+from backend.dataset_index import build_dataset_indexes, columns_from_rows
+from backend.intent_router import _extract_date_window
+
+ANCHOR = date(2025, 6, 30)
+
+ROWS = [
+    {"transaction_type": 850, "document_id": "PO1001", "partner": "Costco", "status": "created",
+     "created_date": "2025-01-02", "expected_date": "2025-06-30", "actual_date": None},
+    {"transaction_type": 810, "document_id": "INV1001", "related_document_id": "PO1001", "partner": "Costco",
+     "status": "pending", "created_date": "2025-05-01", "expected_date": "2025-05-31", "actual_date": None},
+    {"transaction_type": 856, "document_id": "ASN1001", "related_document_id": "PO1001", "partner": "Walmart",
+     "status": "shipped", "created_date": "2025-05-02", "expected_date": "2025-05-10", "actual_date": "2025-05-12"},
+]
+
+
+@pytest.fixture
+def route(monkeypatch):
+    indexes = build_dataset_indexes(columns_from_rows(ROWS))
+    monkeypatch.setattr(intent_router, "_current_indexes", lambda: indexes)
+    intent_router.clear_intent_cache()
+
+    def _route(question, intent="UNKNOWN"):
+        return intent_router._route_question(question, intent, question.lower())
+
+    yield _route
+    intent_router.clear_intent_cache()
+
+
+@pytest.mark.parametrize("text, window", [
+    ("ASNs expected between May 1 and May 15", ("2025-05-01", "2025-05-15")),
+    ("invoices due May 1 - 15", ("2025-05-01", "2025-05-15")),
+    ("shipped on 2025-05-12", ("2025-05-12", "2025-05-12")),
+    ("created after Jan 3", ("2025-01-04", None)),
+    ("expected before July 4th", (None, "2024-07-03")),   # latest July 4 on or before the anchor
+    ("since 1st of March 2025", ("2025-03-01", None)),
+    ("from Dec 20 to Jan 5", ("2024-12-20", "2025-01-05")),
+])
+def test_explicit_windows(text, window):
+    assert _extract_date_window(text, ANCHOR) == (window, False)
+
+
+def test_relative_windows_follow_today():
+    today = date.today()
+    assert _extract_date_window("due in the next 7 days") == ((today.isoformat(), (today + timedelta(days=7)).isoformat()), True)
+    assert _extract_date_window("invoices due tomorrow")[0] == ((today + timedelta(days=1)).isoformat(),) * 2
+    assert _extract_date_window("what shipped yesterday")[0] == ((today - timedelta(days=1)).isoformat(),) * 2
+
+
+@pytest.mark.parametrize("text", ["which invoices are overdue today", "show me anything updated today", "status of PO1001"])
+def test_no_window(text):
+    assert _extract_date_window(text, ANCHOR) == (None, False)
+
+
+def test_overdue_keeps_its_intent(route):
+    parsed = route("which invoices are overdue today", "CHECK_OVERDUE")
+    assert parsed["intent"] == "CHECK_OVERDUE"
+    assert "date_from" not in parsed["entities"]
+
+
+def test_overdue_takes_a_window_as_a_filter(route):
+    parsed = route("invoices overdue since May 1", "CHECK_OVERDUE")
+    assert parsed["intent"] == "CHECK_OVERDUE"
+    assert parsed["entities"]["date_from"] == "2025-05-01"
+    assert parsed["entities"]["date_field"] == "expected_date"
+
+
+def test_delay_takes_a_window_as_a_filter(route):
+    parsed = route("which ASNs were delayed between May 1 and May 15", "CHECK_DELAY")
+    assert parsed["intent"] == "CHECK_DELAY"
+    assert (parsed["entities"]["date_from"], parsed["entities"]["date_to"]) == ("2025-05-01", "2025-05-15")
+
+
+def test_bare_today_is_not_a_window(route):
+    assert route("show me anything updated today")["intent"] == "UNKNOWN"
+
+
+def test_created_window_filters_created_date(route):
+    parsed = route("POs created after Jan 3", "LIST_DOCUMENTS")
+    assert parsed["intent"] == "DATE_WINDOW"
+    assert parsed["entities"]["date_field"] == "created_date"
+    assert parsed["entities"]["date_from"] == "2025-01-04"
+    assert parsed["entities"]["status"] is None   # "created" names the date, not a status
+
+
+def test_listings_and_counts_become_date_windows(route):
+    parsed = route("how many ASNs shipped last week", "COUNT_DOCUMENTS")
+    assert parsed["intent"] == "DATE_WINDOW"
+    assert parsed["entities"]["aggregate"] is True
+    assert parsed["entities"]["date_field"] == "actual_date"
+
+
+def test_single_document_questions_ignore_dates(route):
+    parsed = route("status of PO1001 due May 1", "GET_STATUS")
+    assert parsed["intent"] == "GET_STATUS"
+    assert parsed["entities"]["document_id"] == "PO1001"
+
+
+@pytest.mark.parametrize("question, month", [
+    ("how many invoices in March 2025", "2025-03"),
+    ("how many invoices in 2025-01", "2025-01"),
+    ("how many invoices in 2025", "2025"),
+    ("count POs in march", "03"),
+    ("how many invoices", None),
+])
+def test_counts_with_months_and_years(route, question, month):
+    parsed = route(question)
+    assert parsed["intent"] == "COUNT_DOCUMENTS"
+    assert parsed["entities"]["document_id"] is None
+    assert parsed["entities"]["month"] == month
+
+
+@pytest.mark.parametrize("question, group_by", [
+    ("invoices per partner", "partner"),
+    ("count documents by status", "status"),
+    ("how many ASNs by month in 2025", "month"),
+    ("breakdown by document type", "transaction_type"),
+])
+def test_group_by_routing(route, question, group_by):
+    parsed = route(question)
+    assert parsed["intent"] == "GROUP_COUNT"
+    assert parsed["entities"]["group_by"] == group_by
+
+
+def test_counts_pick_up_status_and_delay(route):
+    entities = route("how many delayed shipped ASNs")["entities"]
+    assert (entities["status"], entities["delayed"], entities["document_type"]) == ("shipped", True, "ASN")
+
+
+def test_numbers_that_are_not_years_stay_ids(route):
+    assert route("status of 1001", "GET_STATUS")["entities"]["document_id"] == "1001"
+    assert route("status of 2025", "GET_STATUS")["entities"]["document_id"] == "2025"
+
+
+def test_numeric_ids_resolve_through_the_suffix_index(route):
+    assert route("status of invoice 1001", "GET_STATUS")["entities"]["document_id"] == "INV1001"
+    ambiguous = route("status of 1001", "GET_STATUS")
+    assert ambiguous["intent"] == "UNKNOWN"
+
+
+def test_batch_classification_routes_each_distinct_question_once(monkeypatch):
+    routed = []
+    monkeypatch.setattr(intent_router, "_is_csv_loaded", lambda: True)
+    monkeypatch.setattr(intent_router, "_ngram_intent", lambda question: "GET_STATUS")
+    monkeypatch.setattr(
+        intent_router, "_route_question",
+        lambda question, intent, key: routed.append(key) or {"intent": intent, "entities": {"document_id": key}},
+    )
+    intent_router.clear_intent_cache()
+
+    results = intent_router.classify_intents(["Status of A", "status of b", "status of a "])
+
+    assert [r["entities"]["document_id"] for r in results] == ["status of a", "status of b", "status of a"]
+    assert routed == ["status of a", "status of b"]
+    intent_router.clear_intent_cache()
+
+
+@pytest.fixture
+def encode_queue(monkeypatch):
+    import queue
+
+    q = queue.Queue()
+    monkeypatch.setattr(intent_router, "_encode_queue", q)
+    return q
+
+
+def _queued(text, enqueued=None):
+    import time
+    from concurrent.futures import Future
+
+    return (text, Future(), time.perf_counter() if enqueued is None else enqueued)
+
+
+def test_next_batch_stops_at_max_size(encode_queue, monkeypatch):
+    monkeypatch.setattr(intent_router, "EMBED_BATCH_MAX_SIZE", 2)
+    for text in "abc":
+        encode_queue.put(_queued(text))
+
+    assert [t for t, _, _ in intent_router._next_batch()] == ["a", "b"]
+    assert [t for t, _, _ in intent_router._next_batch()] == ["c"]
+
+
+def test_next_batch_takes_only_what_is_queued_once_the_wait_is_over(encode_queue, monkeypatch):
+    monkeypatch.setattr(intent_router, "EMBED_BATCH_MAX_WAIT_MS", 50)
+    encode_queue.put(_queued("old", enqueued=0.0))
+    encode_queue.put(_queued("queued"))
+
+    assert [t for t, _, _ in intent_router._next_batch()] == ["old", "queued"]
+    assert encode_queue.empty()
+
+
+def test_concurrent_encodes_share_one_model_call(monkeypatch):
+    import numpy as np
+
+    calls = []
+
+    class Model:
+        def encode(self, texts, **kwargs):
+            calls.append(list(texts))
+            return np.array([[float(len(t))] for t in texts])
+
+    monkeypatch.setattr(intent_router, "_embed_model", Model())
+    monkeypatch.setattr(intent_router, "_encoder_thread", None)
+    monkeypatch.setattr(intent_router, "EMBED_BATCH_MAX_WAIT_MS", 200)
+
+    futures = [intent_router.encode_question_async(t) for t in ("a", "bb", "ccc")]
+
+    assert [f.result(timeout=5)[0] for f in futures] == [1.0, 2.0, 3.0]
+    assert calls == [["a", "bb", "ccc"]]
+
+
+class _FixedModel:
+    def __init__(self, predictions):
+        self.predictions = predictions
+
+    def predict(self, question):
+        return self.predictions[question]
+
+
+def test_ngram_defers_to_minilm_below_confidence_or_on_unknown(monkeypatch):
+    monkeypatch.setattr(intent_router, "INTENT_CLASSIFIER", "ngram")
+    monkeypatch.setattr(intent_router, "NGRAM_MIN_CONFIDENCE", 0.6)
+    monkeypatch.setattr(intent_router, "ngram_model", lambda exemplars: _FixedModel({
+        "sure": ("GET_STATUS", 0.9),
+        "unsure": ("GET_STATUS", 0.59),
+        "off topic": ("UNKNOWN", 0.99),
+    }))
+
+    assert intent_router._ngram_intent("sure") == "GET_STATUS"
+    assert intent_router._ngram_intent("unsure") is None
+    assert intent_router._ngram_intent("off topic") is None
+
+    monkeypatch.setattr(intent_router, "INTENT_CLASSIFIER", "minilm")
+    assert intent_router._ngram_intent("sure") is None
+
+
+def test_batch_encodes_only_what_the_ngram_model_leaves_open(monkeypatch):
+    import numpy as np
+
+    encoded = []
+
+    class Model:
+        def encode(self, texts, **kwargs):
+            encoded.extend(texts)
+            return np.zeros((len(texts), 2))
+
+    monkeypatch.setattr(intent_router, "INTENT_CLASSIFIER", "ngram")
+    monkeypatch.setattr(intent_router, "ngram_model", lambda exemplars: _FixedModel({
+        "sure": ("GET_STATUS", 0.9), "unsure": ("GET_STATUS", 0.1),
+    }))
+    monkeypatch.setattr(intent_router, "_is_csv_loaded", lambda: True)
+    monkeypatch.setattr(intent_router, "_ensure_exemplar_embeddings", lambda: None)
+    monkeypatch.setattr(intent_router, "_exemplars_ready", True)
+    monkeypatch.setattr(intent_router, "_embed_model", Model())
+    monkeypatch.setattr(intent_router, "_minilm_intent", lambda question, q_vec: "LIST_DOCUMENTS")
+    monkeypatch.setattr(intent_router, "_route_question", lambda question, intent, key: {"intent": intent})
+    intent_router.clear_intent_cache()
+
+    assert intent_router.classify_intents(["sure", "unsure"]) == [{"intent": "GET_STATUS"}, {"intent": "LIST_DOCUMENTS"}]
+    assert encoded == ["unsure"]
+    intent_router.clear_intent_cache()
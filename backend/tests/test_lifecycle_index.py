@@ -0,0 +1,39 @@
+from backend.lifecycle_index import build_lifecycle_indexes, build_lifecycle_positions
+
+ROWS = [
+    {"transaction_type": 850, "document_id": "PO1", "related_document_id": None, "status": "created"},
+    {"transaction_type": 855, "document_id": "ACK1", "related_document_id": "PO1", "status": "accepted"},
+    {"transaction_type": 810, "document_id": "INV2", "related_document_id": "PO1", "status": "pending"},
+    {"transaction_type": 810, "document_id": "INV1", "related_document_id": "PO1", "status": "paid"},
+    {"transaction_type": 997, "document_id": "FA1", "related_document_id": "INV1", "status": "received"},
+    {"transaction_type": 850, "document_id": "PO1", "related_document_id": None, "status": "changed"},
+    {"transaction_type": 810, "document_id": "INV9", "related_document_id": None, "status": "pending"},
+]
+
+
+def test_groups_keep_row_order():
+    indexes = build_lifecycle_indexes(ROWS)
+    assert [r["document_id"] for r in indexes.inv_by_related["PO1"]] == ["INV2", "INV1"]
+    assert [r["document_id"] for r in indexes.fa_by_related.get("INV1", ())] == ["FA1"]
+    assert indexes.asn_by_related.get("PO1", ()) == ()
+
+
+def test_last_po_row_wins():
+    indexes = build_lifecycle_indexes(ROWS)
+    assert indexes.po_by_id["PO1"]["status"] == "changed"
+    assert "PO2" not in indexes.po_by_id
+    assert indexes.po_by_id.get(None) is None
+    assert list(indexes.po_by_id) == ["PO1"]
+
+
+def test_positions_are_plain_arrays():
+    groups = build_lifecycle_positions(
+        [r["transaction_type"] for r in ROWS],
+        [r["document_id"] for r in ROWS],
+        [r["related_document_id"] for r in ROWS],
+    )
+    inv = groups["inv_by_related"]
+    assert list(inv.keys) == ["PO1"]
+    assert list(inv.find("PO1")) == [2, 3]
+    assert inv.find("PO9") is None
+    assert len(groups["ack_by_related"].positions) == 1
@@ -0,0 +1,68 @@
+import io
+import json
+import random
+
+import pytest
+import requests
+
+from backend.csv_utils import iter_edi_chunks
+from backend.edi_schema import RejectReport
+from backend.loadtest import _answered, _parse_mix, _percentile, _pick, _upload_variant
+
+BASE = (
+    b"transaction_type,document_id,related_document_id,partner,status,created_date,expected_date,actual_date,remarks\n"
+    b"850,PO1001,,Costco,created,2025-05-21,2025-05-27,,Purchase order created\n"
+)
+
+
+def test_upload_variants_differ_and_pass_the_schema():
+    first, second = _upload_variant(BASE, "0-000001"), _upload_variant(BASE, "0-000002")
+
+    assert first != second and first.startswith(BASE)
+    report = RejectReport()
+    ids = [d for chunk, _ in iter_edi_chunks(io.BytesIO(first), report) for d in chunk["document_id"]]
+    assert report.count == 0
+    assert ids == ["PO1001", "LT0-000001"]
+
+
+def test_upload_variant_adds_a_line_when_base_has_no_trailing_newline():
+    data = _upload_variant(BASE.rstrip(b"\n"), "x")
+
+    assert data.count(b"\n") == 3
+
+
+def _response(status, body):
+    r = requests.Response()
+    r.status_code = status
+    r._content = (body if isinstance(body, str) else json.dumps(body)).encode()
+    return r
+
+
+@pytest.mark.parametrize("status, body, ok", [
+    (200, {"answer": "PO1001 is open"}, True),
+    (200, {"answer": "No CSV uploaded yet"}, False),
+    (200, {"answers": ["fine", "No CSV uploaded yet"]}, False),
+    (200, {"csv_loaded": False, "rows": 0}, False),
+    (404, {"detail": "No CSV uploaded yet"}, False),
+    (404, {"detail": "Document not found"}, True),
+    (200, "plain text", True),
+    (503, {"detail": "busy"}, False),
+])
+def test_answered_counts_missing_datasets_as_errors(status, body, ok):
+    assert _answered(_response(status, body)) is ok
+
+
+def test_mix_parsing_and_picking():
+    assert _parse_mix("ask=1, upload_dup=0") == {"ask": 1.0, "upload_dup": 0.0}
+    with pytest.raises(SystemExit):
+        _parse_mix("ask=1,crawl=1")
+
+    rng = random.Random(0)
+    picks = [_pick({"ask": 0.75, "upload": 0.25, "upload_dup": 0.0}, rng) for _ in range(2000)]
+    assert "upload_dup" not in picks
+    assert 0.7 < picks.count("ask") / len(picks) < 0.8
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    assert (_percentile(samples, 50), _percentile(samples, 99), _percentile([], 50)) == (50.0, 99.0, 0.0)
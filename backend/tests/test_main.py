@@ -0,0 +1,88 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from fastapi.testclient import TestClient
+
+from backend import main
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_admin_profiles_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_ADMIN_TOKEN", None)
+
+    response = client.get("/admin/profiles", headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 403
+    assert "disabled" in response.json()["detail"]
+
+
+def test_admin_profiles_require_the_token(client, monkeypatch):
+    from backend import profiling
+
+    monkeypatch.setattr(main, "PROFILE_ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "s3cret")
+
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/profiles").status_code == 403
+    response = client.get("/admin/profiles", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert "profiles" in response.json()
+    assert client.get("/admin/profiles/missing", headers={"X-Admin-Token": "s3cret"}).status_code == 404
+
+
+@pytest.fixture
+def dataset(monkeypatch):
+    from backend.dataset_index import build_dataset_indexes, columns_from_rows
+    from backend.rag_service import clear_result_cache
+    from backend.tests.test_rag_service import ROWS
+
+    monkeypatch.setattr(main, "edi_rows", ROWS)
+    monkeypatch.setattr(main, "edi_indexes", build_dataset_indexes(columns_from_rows(ROWS)))
+    clear_result_cache()
+    yield ROWS
+    clear_result_cache()
+
+
+def test_export_streams_the_full_result(client, dataset):
+    response = client.get("/export/overdue", params={"format": "csv", "columns": "document_id,expected_date"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["x-result-total"] == "2"
+    assert response.text == "document_id,expected_date\nINV1001,2025-04-30\nINV1002,2025-05-15\n"
+
+    response = client.get("/export/overdue", params={"columns": "document_id"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text == '{"document_id": "INV1001"}\n{"document_id": "INV1002"}\n'
+
+
+@pytest.mark.parametrize("path, params, status", [
+    ("/export/overdue", {"format": "xml"}, 400),
+    ("/export/overdue", {"columns": "price"}, 400),
+    ("/export/nonsense", {}, 404),
+])
+def test_export_rejects_bad_requests(client, dataset, path, params, status):
+    assert client.get(path, params=params).status_code == status
+
+
+def test_query_answers_without_classifying(client, dataset):
+    response = client.post("/query", json={"intent": "COUNT_DOCUMENTS", "entities": {"document_type": "invoice"}})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["entities"], body["count"]) == ({"document_type": "INVOICE"}, 3)
+    assert "answer" not in body
+
+
+def test_query_validation_errors_are_400(client, dataset):
+    response = client.post("/query", json={"intent": "GET_STATUS", "entities": {}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "GET_STATUS requires document_id"
+    assert client.post("/query", json={"entities": {}}).status_code == 422
+
+
+def test_query_needs_a_dataset(client, monkeypatch):
+    monkeypatch.setattr(main, "edi_rows", [])
+    assert client.post("/query", json={"intent": "LIST_DOCUMENTS"}).status_code == 404
@@ -0,0 +1,52 @@
+from backend.metrics import (
+    Counter,
+    Histogram,
+    STAGE_SECONDS,
+    begin_request_stages,
+    current_request_stages,
+    render_prometheus,
+    stage,
+)
+
+
+def test_counter_renders_labelled_values():
+    counter = Counter("test_events_total", 'Events "seen".', ("kind",))
+    counter.inc(kind="a")
+    counter.inc(2, kind='b"c')
+
+    assert counter.value(kind="a") == 1
+    assert counter.render() == [
+        '# HELP test_events_total Events "seen".',
+        "# TYPE test_events_total counter",
+        'test_events_total{kind="a"} 1',
+        'test_events_total{kind="b\\"c"} 2',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.render()[2:] == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1"} 3',
+        'test_latency_seconds_bucket{le="+Inf"} 4',
+        "test_latency_seconds_sum 4.05",
+        "test_latency_seconds_count 4",
+    ]
+    assert "test_latency_seconds_count 4" in render_prometheus()
+
+
+def test_stage_times_into_histogram_and_request_breakdown():
+    stages = begin_request_stages()
+
+    with stage("test_stage", intent="X"):
+        pass
+    with stage("test_stage", intent="X"):
+        pass
+
+    assert current_request_stages() is stages
+    assert list(stages) == ["test_stage"] and stages["test_stage"] >= 0
+    rendered = [line for line in STAGE_SECONDS.render() if 'stage="test_stage"' in line]
+    assert rendered[-1] == 'edi_stage_seconds_count{stage="test_stage",intent="X"} 2'
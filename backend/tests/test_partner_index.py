@@ -0,0 +1,38 @@
+from backend.partner_index import build_partner_index, normalize_partner
+
+PARTNERS = ["Home Depot", "Costco", "home-depot", None, "Walmart", "HomeDepot"]
+TYPES = [850, 850, 810, 850, 856, 850]
+
+
+def test_normalize_partner():
+    assert normalize_partner("Home Depot") == normalize_partner("home-depot") == "homedepot"
+    assert normalize_partner(None) == ""
+
+
+def test_spellings_share_the_first_canonical_name():
+    index = build_partner_index(PARTNERS, TYPES)
+
+    assert index.resolve("HOME DEPOT") == "Home Depot"
+    assert index.positions("Home Depot").tolist() == [0, 2, 5]
+    assert index.positions("Home Depot", 850).tolist() == [0, 5]
+    assert index.positions("Home Depot", 997).tolist() == []
+    assert index.positions("Target").tolist() == []
+
+
+def test_typos_resolve_fuzzily_but_short_names_only_exactly():
+    index = build_partner_index(PARTNERS, TYPES)
+
+    assert index.resolve("Walmrt") == "Walmart"
+    assert index.resolve("Home Deopt") == "Home Depot"
+    assert index.resolve("Costo") == "Costco"
+    assert index.resolve("Cost") is None           # shorter than FUZZY_MIN_LENGTH
+    assert index.resolve("Walnuts") is None        # below FUZZY_MIN_RATIO
+    assert index.resolve("Target") is None
+
+
+def test_find_in_text_prefers_exact_then_longest_fuzzy():
+    index = build_partner_index(PARTNERS, TYPES)
+
+    assert index.find_in_text("show invoices for home depot please") == "Home Depot"
+    assert index.find_in_text("anything from walmrt?") == "Walmart"
+    assert index.find_in_text("what is delayed") is None
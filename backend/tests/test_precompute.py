@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+
+from backend import precompute
+from backend.precompute import PrecomputeRun, precomputed_facts
+
+ROWS = [{"document_id": "INV1"}]
+
+
+@pytest.fixture
+def run(monkeypatch):
+    run = PrecomputeRun(rows=ROWS, indexes=None, dataset_version=1)
+    monkeypatch.setattr(precompute, "_current", run)
+    return run
+
+
+def test_precomputed_facts_are_served_for_the_current_dataset(run):
+    run.facts[("GET_STATUS", "INV1")] = ("status facts", None)
+
+    assert precomputed_facts(ROWS, "GET_STATUS", "INV1") == "status facts"
+    assert precomputed_facts(list(ROWS), "GET_STATUS", "INV1") is None   # another dataset
+    assert precomputed_facts(ROWS, "LIST_DOCUMENTS", "INV1") is None
+    assert precomputed_facts(ROWS, "GET_STATUS", None) is None
+
+
+def test_overdue_facts_expire_with_the_day_they_were_built(run):
+    today = date.today().toordinal()
+    run.facts[("CHECK_OVERDUE", "INV1")] = ("overdue yesterday", today - 1)
+
+    assert precomputed_facts(ROWS, "CHECK_OVERDUE", "INV1") is None
+    run.facts[("CHECK_OVERDUE", "INV1")] = ("overdue today", today)
+    assert precomputed_facts(ROWS, "CHECK_OVERDUE", "INV1") == "overdue today"
+
+
+def test_live_requests_hold_off_precomputation(run, monkeypatch):
+    monkeypatch.setattr(precompute, "PRECOMPUTE_IDLE_SECONDS", 0.0)
+
+    assert precompute._idle()
+    with precompute.live_request():
+        assert not precompute._idle()
+    assert precompute._idle()
+
+
+def test_superseded_runs_stop_waiting(run, monkeypatch):
+    monkeypatch.setattr(precompute, "_current", PrecomputeRun(rows=[], indexes=None, dataset_version=2))
+
+    assert precompute._wait_for_idle(run) is False
+
+
+def test_run_builds_facts_for_overdue_invoices_and_open_pos(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    from backend.dataset_index import build_dataset_indexes, columns_from_rows
+    from backend.rag_service import _answer_routed, clear_result_cache
+    from backend.tests.test_rag_service import ROWS as DATASET
+
+    indexes = build_dataset_indexes(columns_from_rows(DATASET))
+    run = PrecomputeRun(rows=DATASET, indexes=indexes, dataset_version=3)
+    monkeypatch.setattr(precompute, "_current", run)
+    monkeypatch.setattr(precompute, "PRECOMPUTE_IDLE_SECONDS", 0.0)
+    monkeypatch.setattr(precompute, "PRECOMPUTE_MAX_EXPLANATIONS", 0)
+    clear_result_cache()
+
+    precompute._run(run)
+
+    assert run.status == "done" and run.documents == 3
+    assert sorted(run.facts) == sorted(
+        [(intent, "INV1001") for intent in precompute.INVOICE_INTENTS]
+        + [(intent, "INV1002") for intent in precompute.INVOICE_INTENTS]
+        + [(intent, "PO1001") for intent in precompute.PO_INTENTS]
+    )
+    facts, day = run.facts[("CHECK_OVERDUE", "INV1001")]
+    assert day == date.today().toordinal()
+    assert facts == _answer_routed("", DATASET, "CHECK_OVERDUE", {"document_id": "INV1001"}, indexes, explain=lambda f: f)
+    assert run.facts[("GET_STATUS", "PO1001")][1] is None
+    clear_result_cache()
@@ -0,0 +1,66 @@
+import pytest
+
+from backend import profiling
+
+
+@pytest.fixture(autouse=True)
+def fresh_profiles(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    profiling.clear_profiles()
+    yield
+    profiling.clear_profiles()
+
+
+def test_no_token_configured_refuses_everything(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", None)
+
+    assert not profiling.authorized("anything")
+    assert not profiling.authorized(None)
+    assert profiling.profile_trigger("anything") is None
+
+
+def test_only_the_configured_token_triggers_profiling(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "s3cret")
+
+    assert profiling.authorized("s3cret")
+    assert not profiling.authorized("wrong")
+    assert profiling.profile_trigger("s3cret") == "header"
+    assert profiling.profile_trigger("wrong") is None
+    assert profiling.profile_trigger(None) is None
+
+
+def test_sampling_triggers_without_a_header(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+
+    assert profiling.profile_trigger(None) == "sampled"
+
+
+def test_profiled_runs_unmarked_requests_directly():
+    calls = []
+
+    @profiling.profiled
+    def endpoint(x):
+        calls.append(x)
+        return x * 2
+
+    assert endpoint(3) == 6
+    assert calls == [3]
+    assert profiling.list_profiles() == []
+
+
+def test_marked_request_stores_its_profile():
+    @profiling.profiled
+    def endpoint():
+        return sum(range(1000))
+
+    request = profiling.begin_profile_request("header", "POST", "/ask")
+    try:
+        assert endpoint() == 499500
+    finally:
+        profiling._profile_request.set(None)
+
+    listed = profiling.list_profiles()
+    assert [p["profile_id"] for p in listed] == [request["profile_id"]]
+    assert listed[0]["endpoint"] == "endpoint" and "top" not in listed[0]
+    stored = profiling.get_profile(request["profile_id"])
+    assert stored["trigger"] == "header" and stored["top"] and stored["text"]
@@ -0,0 +1,148 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from backend.dataset_index import build_dataset_indexes, columns_from_rows
+from backend.rag_service import _answer_routed, clear_result_cache, list_query
+
+
+def _row(transaction_type, document_id, related=None, partner="Costco", status="pending",
+         created=None, expected=None, actual=None):
+    return {
+        "transaction_type": transaction_type, "document_id": document_id, "related_document_id": related,
+        "partner": partner, "status": status, "created_date": created, "expected_date": expected,
+        "actual_date": actual, "remarks": None,
+    }
+
+
+ROWS = [
+    _row(850, "PO1001", status="created", created="2025-01-02", expected="2025-02-01"),
+    _row(810, "INV1001", "PO1001", expected="2025-04-30"),
+    _row(810, "INV1002", "PO1001", expected="2025-05-15"),
+    _row(810, "INV1003", "PO1001", status="paid", expected="2025-05-20"),
+    _row(856, "ASN1001", "PO1001", status="shipped", expected="2025-05-10", actual="2025-05-12"),
+    _row(856, "ASN1002", "PO1001", status="shipped", expected="2025-04-10", actual="2025-04-12"),
+]
+
+
+@pytest.fixture
+def ask():
+    indexes = build_dataset_indexes(columns_from_rows(ROWS))
+    clear_result_cache()
+
+    def _ask(intent, **entities):
+        return _answer_routed("", ROWS, intent, entities, indexes, explain=lambda facts: facts)
+
+    yield _ask
+    clear_result_cache()
+
+
+def test_overdue_window_narrows_due_dates(ask):
+    assert "Found 2 overdue invoices: INV1001, INV1002." in ask("CHECK_OVERDUE")
+    assert "Found 1 overdue invoices with expected date on or after 2025-05-01: INV1002." in ask(
+        "CHECK_OVERDUE", date_from="2025-05-01", date_field="expected_date",
+    )
+
+
+def test_delay_window_lists_late_documents_in_it(ask):
+    facts = ask("CHECK_DELAY", date_from="2025-05-01", date_to="2025-05-31", date_field="expected_date")
+    assert facts.startswith("Found 1 delayed document(s) with expected date from 2025-05-01 to 2025-05-31: ASN1001")
+
+
+def test_list_query_matches_the_answer():
+    window = {"date_from": "2025-05-01", "date_field": "expected_date"}
+    assert list_query("CHECK_OVERDUE", window) == ("overdue", {"start": "2025-05-01", "end": ""})
+    assert list_query("CHECK_OVERDUE", dict(window, date_field="actual_date")) == ("overdue", {})
+    assert list_query("CHECK_DELAY", window)[0] == "window"
+    assert list_query("CHECK_DELAY", {}) == ("delayed", {"basis": "any"})
+
+
+def test_counts_by_month_and_year(ask):
+    assert ask("COUNT_DOCUMENTS", document_type="INVOICE", month="2025-05") == (
+        "There are 2 INVOICE document(s) with expected date in 2025-05."
+    )
+    assert ask("COUNT_DOCUMENTS", month="2025") == "There are 6 document(s) with expected date in 2025."
+    assert ask("COUNT_DOCUMENTS", month="2024") == "There are 0 document(s) with expected date in 2024."
+
+
+def test_group_counts(ask):
+    assert ask("GROUP_COUNT", group_by="transaction_type") == (
+        "Counts of document(s) by document type: INVOICE: 3; ASN: 2; PO: 1. Total: 6."
+    )
+
+
+def test_partner_listing_resolves_spellings_and_typos():
+    rows = ROWS + [_row(850, "PO2001", partner="Home Depot"), _row(810, "INV2001", "PO2001", partner="home-depot")]
+    indexes = build_dataset_indexes(columns_from_rows(rows))
+
+    def ask(**entities):
+        return _answer_routed("", rows, "FILTER_BY_PARTNER", entities, indexes, explain=lambda facts: facts)
+
+    assert ask(partner="Home Deopt") == "Found 2 document(s) for partner Home Depot: PO2001, INV2001."
+    assert ask(partner="homedepot", document_type="INVOICE") == "Found 1 INVOICE for partner Home Depot: INV2001."
+    assert ask(partner="Target") == "Partner Target does not exist in the uploaded CSV."
+
+
+def test_ambiguous_numeric_id_asks_for_the_type(ask):
+    assert ask("UNKNOWN", document_id="1001") == (
+        "The ID 1001 is ambiguous and matches multiple documents "
+        "(ASN1001, INV1001, PO1001). Please specify the document type."
+    )
+
+
+def test_batch_answers_keep_order_and_run_each_query_once(monkeypatch):
+    from backend import rag_service
+
+    routing = {
+        "status of po1001?": {"intent": "GET_STATUS", "entities": {"document_id": "PO1001"}},
+        "overdue invoices": {"intent": "CHECK_OVERDUE", "entities": {}},
+    }
+    monkeypatch.setattr(rag_service, "classify_intents", lambda qs: [routing[q.strip().lower()] for q in qs])
+    queries, explained = [], []
+    monkeypatch.setattr(
+        rag_service, "_answer_routed",
+        lambda question, rows, intent, entities, *args, **kwargs: queries.append(intent) or f"facts {intent}",
+    )
+    monkeypatch.setattr(rag_service, "explain_facts", lambda facts: explained.append(facts) or facts.upper())
+
+    answers = rag_service.answer_questions(
+        ["status of PO1001?", "overdue invoices", "Status of PO1001? ", "overdue invoices"],
+        ROWS, build_dataset_indexes(columns_from_rows(ROWS)),
+    )
+
+    assert answers == ["FACTS GET_STATUS", "FACTS CHECK_OVERDUE", "FACTS GET_STATUS", "FACTS CHECK_OVERDUE"]
+    assert sorted(queries) == ["CHECK_OVERDUE", "GET_STATUS"]
+    assert sorted(explained) == ["facts CHECK_OVERDUE", "facts GET_STATUS"]
+
+
+@pytest.mark.parametrize("intent, entities, error", [
+    ("UNKNOWN", {}, "intent must be one of"),
+    ("LIST_DOCUMENTS", {"price": 1}, "Unsupported entities: price"),
+    ("LIST_DOCUMENTS", {"document_type": "memo"}, "document_type must be one of"),
+    ("GET_STATUS", {"document_id": "1001"}, "document_id 1001 matches ASN1001, INV1001, PO1001"),
+    ("COUNT_DOCUMENTS", {"month": "May"}, "month must be YYYY-MM, YYYY or MM"),
+    ("GROUP_COUNT", {"group_by": "remarks"}, "group_by must be one of"),
+    ("DATE_WINDOW", {"date_from": "2025-05-01", "date_field": "due"}, "date_field must be one of"),
+    ("DATE_WINDOW", {"date_from": "May 1"}, "date_from"),
+    ("DATE_WINDOW", {"partner": "Costco"}, "DATE_WINDOW requires date_from or date_to"),
+    ("DATE_WINDOW", {"date_to": "2025-05-01", "partner": "Target"}, "Partner Target does not exist"),
+    ("GET_STATUS", {"document_id": " "}, "GET_STATUS requires document_id"),
+])
+def test_structured_entities_are_validated(intent, entities, error):
+    from backend.rag_service import normalize_entities
+
+    indexes = build_dataset_indexes(columns_from_rows(ROWS))
+    with pytest.raises(ValueError, match=error):
+        normalize_entities(intent, entities, indexes)
+
+
+def test_structured_entities_are_normalized():
+    from backend.rag_service import normalize_entities
+
+    indexes = build_dataset_indexes(columns_from_rows(ROWS))
+    assert normalize_entities(
+        "GET_STATUS", {"document_id": "1001", "document_type": " invoice ", "delayed": False, "partner": ""}, indexes,
+    ) == {"document_id": "INV1001", "document_type": "INVOICE"}
+    assert normalize_entities("LIST_DOCUMENTS", {"status": " Shipped ", "delayed": 1}, indexes) == {
+        "status": "shipped", "delayed": True,
+    }
@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from backend import result_sets
+from backend.result_sets import (
+    FACT_GROUPS_SHOWN,
+    ResultSet,
+    describe_typed_document,
+    estimate_tokens,
+    export_columns,
+    iter_export,
+    render_facts,
+)
+from backend.row_store import build_row_store
+
+PARTNERS = [f"Partner{i}" for i in range(FACT_GROUPS_SHOWN + 2)]
+
+
+def _rows(n):
+    return [
+        {
+            "transaction_type": (850, 810)[i % 2],
+            "document_id": f"{('PO', 'INV')[i % 2]}{1000 + i}",
+            "partner": PARTNERS[i % len(PARTNERS)],
+        }
+        for i in range(n)
+    ]
+
+
+def _result(n, **kwargs):
+    return ResultSet(
+        query="delayed",
+        params=(("partner", ""),),
+        label="delayed documents",
+        positions=list(range(n)),
+        **kwargs,
+    )
+
+
+def test_empty_result():
+    assert render_facts(_rows(0), _result(0)) == "Found no delayed documents."
+
+
+def test_short_results_are_listed_in_full():
+    assert render_facts(_rows(3), _result(3)) == "Found 3 delayed documents: PO1000, INV1001, PO1002."
+
+
+@pytest.mark.parametrize("n", [500, 5_000, 100_000])
+@pytest.mark.parametrize("budget", [60, 200, 600])
+def test_long_results_stay_within_budget(n, budget):
+    rows = _rows(n)
+    text = render_facts(rows, _result(n, group_by=("transaction_type", "partner"), describe=describe_typed_document), budget)
+
+    assert estimate_tokens(text) <= budget
+    assert text.startswith(f"Found {n} delayed documents")
+    assert text.endswith("Full list: GET /results/delayed.")
+    if budget >= 200:
+        assert "By document type: PO (" in text
+        assert f"and {len(PARTNERS) - FACT_GROUPS_SHOWN} more." in text
+
+
+def test_sample_and_remainder_add_up():
+    text = render_facts(_rows(1_000), _result(1_000), budget=100)
+    listed = text.split(": ", 1)[1].split(" and ", 1)[0].split(", ")
+
+    assert listed[0] == "PO1000"
+    assert f" and {1_000 - len(listed)} more." in text
+
+
+def test_row_store_and_dict_rows_render_the_same():
+    rows = _rows(2_000)
+    store = build_row_store(pd.DataFrame(rows))
+    result = _result(2_000, group_by=("transaction_type", "partner"), describe=describe_typed_document)
+
+    assert render_facts(store, result) == render_facts(rows, result)
+
+
+EXPORT_ROWS = [
+    {"document_id": "PO1", "partner": 'Acme, "West"', "expected_date": "2025-05-01"},
+    {"document_id": "PO2", "partner": "Costco", "expected_date": None},
+    {"document_id": "PO3", "partner": "Costco", "expected_date": "2025-05-03"},
+]
+
+
+@pytest.mark.parametrize("store", [False, True])
+def test_export_streams_blocks_in_result_order(store, monkeypatch):
+    monkeypatch.setattr(result_sets, "EXPORT_BLOCK_ROWS", 2)
+    rows = build_row_store(pd.DataFrame(EXPORT_ROWS)) if store else EXPORT_ROWS
+    result = ResultSet(query="delayed", params=(), label="documents", positions=[2, 0, 1])
+    columns = export_columns(rows)
+
+    ndjson = list(iter_export(rows, result, "ndjson", columns))
+    assert len(ndjson) == 2
+    assert [json.loads(line) for line in "".join(ndjson).splitlines()] == [EXPORT_ROWS[i] for i in (2, 0, 1)]
+
+    text = "".join(iter_export(rows, result, "csv", ["document_id", "partner", "expected_date"]))
+    assert list(csv.reader(io.StringIO(text))) == [
+        ["document_id", "partner", "expected_date"],
+        ["PO3", "Costco", "2025-05-03"],
+        ["PO1", 'Acme, "West"', "2025-05-01"],
+        ["PO2", "Costco", ""],
+    ]
+
+
+def test_export_columns_validate_the_projection():
+    assert export_columns(EXPORT_ROWS, " partner ,document_id") == ["partner", "document_id"]
+    with pytest.raises(ValueError, match="Unknown column"):
+        export_columns(EXPORT_ROWS, "partner,price")
+    with pytest.raises(ValueError, match="format must be one of"):
+        list(iter_export(EXPORT_ROWS, ResultSet("delayed", (), "documents", [0]), "xml", ["partner"]))
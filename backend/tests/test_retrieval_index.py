@@ -0,0 +1,41 @@
+import numpy as np
+
+from backend.retrieval_index import build_retrieval_index, tokenize
+
+COLUMNS = {
+    "transaction_type": [850, 856, 810, 850, 997],
+    "partner": ["Costco", "Amazon", "Walmart", "Target", "Kroger"],
+    "status": ["open", "shipped", "paid", "open", "open"],
+    "remarks": ["pallet damaged", "on time", "damaged carton", "rush order", "damaged box"],
+}
+
+
+def test_tokenize_drops_stopwords_and_plural_suffixes():
+    assert tokenize("Show me the delayed shipments") == ["delay", "shipment"]
+
+
+def test_bm25_ranks_rows_matching_more_terms_first():
+    index = build_retrieval_index(COLUMNS)
+
+    assert index.search("damaged pallet") == [0, 2, 4]
+    assert index.search("nothing like this") == []
+
+
+def test_type_names_are_searchable():
+    index = build_retrieval_index(COLUMNS)
+
+    assert index.search("invoice") == [2]
+    assert index.search("shipments") == [1]
+
+
+def test_rrf_promotes_rows_both_rankings_agree_on():
+    index = build_retrieval_index(COLUMNS)
+    texts = index.value_texts()
+    vectors = np.eye(len(texts), dtype=np.float32)
+    q_vec = vectors[texts.index("Walmart")] + 0.5 * vectors[texts.index("Kroger")]
+    q_vec /= np.linalg.norm(q_vec)
+
+    # BM25 alone ties the three "damaged" rows and keeps row order; the
+    # vector side ranks them 2, 4, 0, and fusion sums reciprocal ranks
+    assert index.search("damaged") == [0, 2, 4]
+    assert index.search("damaged", q_vec, vectors) == [2, 0, 4]
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from backend import row_store
+from backend.row_store import CodedColumn, DateColumn, build_row_store, load_row_store, save_row_store
+
+
+def _frame():
+    return pd.DataFrame({
+        "transaction_type": [850, 856, 850, 810],
+        "document_id": ["PO1", "ASN1", "PO2", "INV1"],
+        "related_document_id": [None, "PO1", None, "PO1"],
+        "partner": ["Costco", "Costco", None, "Walmart"],
+        "expected_date": ["2025-05-27", None, "2025-06-01", "2025-05-31"],
+        "remarks": ["a", "b", "c", "d"],
+    })
+
+
+def test_rows_read_back_what_was_stored():
+    store = build_row_store(_frame())
+
+    assert len(store) == 4
+    assert dict(store[1]) == {
+        "transaction_type": 856, "document_id": "ASN1", "related_document_id": "PO1",
+        "partner": "Costco", "expected_date": None, "remarks": "b",
+    }
+    assert store[-1]["document_id"] == "INV1"
+    assert [r["document_id"] for r in store[1:3]] == ["ASN1", "PO2"]
+    with pytest.raises(IndexError):
+        store[4]
+
+
+def test_columns_are_coded_and_id_tables_shared():
+    store = build_row_store(_frame())
+
+    assert isinstance(store.columns["transaction_type"], CodedColumn)
+    assert isinstance(store.columns["expected_date"], DateColumn)
+    assert store.columns["document_id"].values is store.columns["related_document_id"].values
+    assert store.column("missing") == [None] * 4
+
+
+def test_column_queries():
+    store = build_row_store(_frame())
+
+    assert store.positions("partner", "Costco") == [0, 1]
+    assert store.positions("related_document_id", "PO1") == [1, 3]
+    assert store.positions("partner", "Target") == []
+    assert store.mask("partner", lambda v: v is None).tolist() == [False, False, True, False]
+    assert store.value_counts("partner", [0, 1, 2]) == [("Costco", 2), (None, 1)]
+    assert store.take("expected_date", [2, 1]) == ["2025-06-01", None]
+
+
+def test_non_canonical_dates_stay_text():
+    df = _frame()
+    df["expected_date"] = ["2025-5-27", None, "2025-06-01", "2025-05-31"]
+
+    store = build_row_store(df)
+    assert isinstance(store.columns["expected_date"], CodedColumn)
+    assert store[0]["expected_date"] == "2025-5-27"
+
+
+def test_snapshot_round_trip_maps_string_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(row_store, "STRING_TABLE_MIN", 2)
+    store = build_row_store(_frame())
+
+    loaded = load_row_store(str(tmp_path), save_row_store(str(tmp_path), store))
+    assert loaded.mapped
+    assert isinstance(loaded.columns["document_id"].values, row_store.StringTable)
+    assert [dict(r) for r in loaded] == [dict(r) for r in store]
+    assert loaded.positions("document_id", "PO2") == [2]
+    assert loaded.positions("document_id", "PO3") == []
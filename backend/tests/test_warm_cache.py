@@ -0,0 +1,99 @@
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from backend import ai_explainer, intent_router, warm_cache
+
+ENTRY = ["status of po1001", {"intent": "CHECK_STATUS", "entities": {"document_id": "PO1001"}}]
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "warm.json.gz"
+    monkeypatch.setattr(warm_cache, "WARM_CACHE_PATH", str(path))
+    monkeypatch.setattr(warm_cache, "_pending_intents", None)
+    monkeypatch.setattr(warm_cache, "_dataset_hash", None)
+    intent_router.clear_intent_cache()
+    ai_explainer.clear_explanation_cache()
+    yield path
+    intent_router.clear_intent_cache()
+    ai_explainer.clear_explanation_cache()
+
+
+def _write(path, **overrides):
+    data = {
+        "format": warm_cache.WARM_CACHE_FORMAT,
+        "intents": {"classifier": intent_router.classifier_version(), "dataset": "abc", "entries": [ENTRY]},
+        "explanations": {
+            "model": ai_explainer.MODEL,
+            "prompt_version": ai_explainer.PROMPT_VERSION,
+            "entries": [["facts", "text", False]],
+        },
+    }
+    for section, values in overrides.items():
+        data[section].update(values)
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        json.dump(data, fh)
+
+
+def _counted(cache, result):
+    return warm_cache.WARM_CACHE_ENTRIES.value(cache=cache, result=result)
+
+
+def test_intents_restore_only_for_their_dataset(cache_path):
+    _write(cache_path)
+    warm_cache.load()
+    assert ai_explainer.cached_explanation("facts") == "text"
+    assert intent_router.intent_cache_entries() == []
+
+    restored = _counted("intent", "restored")
+    warm_cache.restore_intents("abc")
+    assert intent_router.intent_cache_entries() == [ENTRY]
+    assert _counted("intent", "restored") == restored + 1
+
+
+def test_intents_for_another_dataset_are_discarded(cache_path):
+    _write(cache_path)
+    warm_cache.load()
+
+    discarded = _counted("intent", "discarded")
+    warm_cache.restore_intents("other")
+    assert intent_router.intent_cache_entries() == []
+    assert _counted("intent", "discarded") == discarded + 1
+
+
+def test_stale_versions_are_discarded(cache_path):
+    _write(cache_path, intents={"classifier": "old"}, explanations={"prompt_version": -1})
+
+    intents, explanations = _counted("intent", "discarded"), _counted("explanation", "discarded")
+    warm_cache.load()
+    warm_cache.restore_intents("abc")
+    assert intent_router.intent_cache_entries() == []
+    assert ai_explainer.cached_explanation("facts") is None
+    assert _counted("intent", "discarded") == intents + 1
+    assert _counted("explanation", "discarded") == explanations + 1
+
+
+def test_save_records_the_installed_dataset_hash(cache_path):
+    warm_cache.restore_intents("def")
+    intent_router.load_intent_cache([ENTRY])
+    warm_cache.save()
+
+    with gzip.open(cache_path, "rt", encoding="utf-8") as fh:
+        intents = json.load(fh)["intents"]
+    assert intents["dataset"] == "def"
+    assert intents["entries"] == [ENTRY]
+
+
+def test_save_keeps_entries_still_waiting_for_their_dataset(cache_path):
+    _write(cache_path)
+    warm_cache.load()
+    warm_cache.save()
+
+    with gzip.open(cache_path, "rt", encoding="utf-8") as fh:
+        intents = json.load(fh)["intents"]
+    assert intents["dataset"] == "abc"
+    assert intents["entries"] == [ENTRY]
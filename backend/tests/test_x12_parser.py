@@ -0,0 +1,146 @@
+import io
+
+import pytest
+
+from backend.csv_utils import iter_edi_chunks
+from backend.edi_schema import RejectReport
+from backend.x12_parser import X12Error, is_x12, iter_x12_chunks, iter_x12_records
+
+
+def _isa(sender="ACME", element="*", terminator="~"):
+    # Fixed width: the separators sit at bytes 3 and 105
+    fields = [
+        "ISA", "00", " " * 10, "00", " " * 10, "ZZ", sender.ljust(15), "ZZ", "RETAILER".ljust(15),
+        "250521", "1200", "U", "00401", "000000001", "0", "P", ">",
+    ]
+    isa = element.join(fields) + terminator
+    assert len(isa) == 106
+    return isa
+
+
+def _interchange(*segments, element="*", terminator="~", sender="ACME"):
+    body = "".join(element.join(seg) + terminator + "\n" for seg in segments)
+    return (_isa(sender, element, terminator) + "\n" + body).encode("latin-1")
+
+
+SAMPLE = _interchange(
+    ["GS", "PO", "ACME", "RETAILER", "20250521", "1200", "7", "X", "004010"],
+    ["ST", "850", "0001"],
+    ["BEG", "00", "SA", "PO1001", "", "20250521"],
+    ["DTM", "002", "20250527"],
+    ["N1", "BY", "Costco"],
+    ["SE", "5", "0001"],
+    ["ST", "855", "0002"],
+    ["BAK", "00", "AC", "PO1001", "20250521", "", "", "", "ACK1001", "20250522"],
+    ["SE", "3", "0002"],
+    ["ST", "856", "0003"],
+    ["BSN", "00", "ASN1001", "20250523"],
+    ["PRF", "PO1001"],
+    ["DTM", "017", "20250525"],
+    ["DTM", "011", "20250524"],
+    ["SE", "6", "0003"],
+    ["ST", "810", "0004"],
+    ["BIG", "20250526", "INV1001", "", "PO1001"],
+    ["ITD", "01", "3", "", "", "", "20250625"],
+    ["NTE", "GEN", "Net 30"],
+    ["SE", "5", "0004"],
+    ["GE", "4", "7"],
+    ["GS", "FA", "RETAILER", "ACME", "20250527", "1300", "8", "X", "004010"],
+    ["ST", "997", "0001"],
+    ["AK1", "PO", "7"],
+    ["AK2", "810", "0004"],
+    ["AK5", "A"],
+    ["AK2", "850", "0001"],
+    ["AK5", "R"],
+    ["AK2", "856", "9999"],
+    ["AK9", "P", "3", "3", "2"],
+    ["SE", "9", "0001"],
+    ["GE", "1", "8"],
+    ["IEA", "1", "000000001"],
+)
+
+
+def _records(data):
+    return list(iter_x12_records(io.BytesIO(data)))
+
+
+def test_detects_interchanges():
+    assert is_x12(io.BytesIO(b"\n  " + SAMPLE))
+    assert not is_x12(io.BytesIO(b"transaction_type,document_id\n"))
+
+
+def test_transaction_sets_map_to_edi_rows():
+    rows = {r["document_id"]: r for r in _records(SAMPLE)}
+
+    assert rows["PO1001"] == {
+        "transaction_type": "850", "document_id": "PO1001", "related_document_id": None,
+        "partner": "Costco", "status": "created", "created_date": "2025-05-21",
+        "expected_date": "2025-05-27", "actual_date": None, "remarks": None,
+    }
+    ack = rows["ACK1001"]
+    assert (ack["related_document_id"], ack["status"], ack["actual_date"]) == ("PO1001", "accepted", "2025-05-22")
+    assert ack["partner"] == "ACME"   # no N1: the interchange sender
+    asn = rows["ASN1001"]
+    assert (asn["related_document_id"], asn["expected_date"], asn["actual_date"]) == ("PO1001", "2025-05-25", "2025-05-24")
+    inv = rows["INV1001"]
+    assert (inv["related_document_id"], inv["created_date"], inv["expected_date"]) == ("PO1001", "2025-05-26", "2025-06-25")
+    assert inv["remarks"] == "Net 30"
+
+
+def test_997_resolves_acknowledged_sets_to_documents():
+    fas = [r for r in _records(SAMPLE) if r["transaction_type"] == "997"]
+
+    assert [(f["document_id"], f["related_document_id"], f["status"]) for f in fas] == [
+        ("FA1001", "INV1001", "received"),
+        ("FA1001", "PO1001", "rejected"),
+        ("FA-0001-9999", None, "received"),   # unknown set, no AK5
+    ]
+    assert all(f["created_date"] == "2025-05-27" for f in fas)
+
+
+def test_separators_come_from_the_isa_segment():
+    data = _interchange(
+        ["GS", "PO", "ACME", "RETAILER", "20250521", "1200", "1", "X", "004010"],
+        ["ST", "850", "0001"],
+        ["BEG", "00", "SA", "PO7", "", "250521"],
+        ["SE", "3", "0001"],
+        element="|", terminator="\n",
+    )
+    (row,) = _records(data)
+    assert (row["document_id"], row["created_date"]) == ("PO7", "2025-05-21")
+
+
+def test_truncated_isa_is_rejected():
+    with pytest.raises(X12Error):
+        _records(b"ISA*00*short~")
+
+
+def test_chunks_share_the_csv_contract():
+    chunks = list(iter_x12_chunks(io.BytesIO(SAMPLE), chunk_rows=2))
+    assert [len(c) for c in chunks] == [2, 2, 2, 1]
+    assert list(chunks[0].columns)[:2] == ["transaction_type", "document_id"]
+
+
+def test_unsupported_sets_are_rejected_by_the_schema():
+    data = _interchange(
+        ["GS", "PO", "ACME", "RETAILER", "20250521", "1200", "1", "X", "004010"],
+        ["ST", "850", "0001"],
+        ["BEG", "00", "SA", "PO1", "", "20250521"],
+        ["SE", "3", "0001"],
+        ["ST", "940", "0002"],
+        ["W05", "N", "ORDER9"],
+        ["SE", "3", "0002"],
+        ["ST", "850", "0003"],
+        ["BEG", "00", "SA", "PO3", "", "2025-13-01"],
+        ["SE", "3", "0003"],
+    )
+    report = RejectReport()
+    (chunk, raw), = iter_edi_chunks(io.BytesIO(data), report)
+
+    assert raw == 3
+    assert list(chunk["document_id"]) == ["PO1"]
+    # X12 "lines" are document ordinals
+    assert report.sample == [
+        {"line": 2, "reasons": ["invalid transaction_type"]},
+        {"line": 3, "reasons": ["invalid created_date"]},
+    ]
@@ -0,0 +1,166 @@
+import gzip
+import json
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import ai_explainer, intent_router
+from .metrics import Counter
+
+# ------------------------------------------------------------
+# Warm caches across restarts
+# The intent cache and the explanation cache are written to one gzip'd
+# JSON file every WARM_CACHE_SAVE_SECONDS and at shutdown, and read back
+# at startup. Each section carries what its entries depend on:
+#   - explanations: LLM model + ai_explainer.PROMPT_VERSION
+#   - intents: intent_router.classifier_version() + the content hash of
+#     the dataset the entities were resolved against
+# A section whose keys differ from the running process is discarded.
+# Intent entries wait until install_dataset brings in the dataset with
+# their hash; the first other dataset installed discards them.
+#
+# Unset WARM_CACHE_PATH turns persistence off. Several workers may share
+# the file; writes are atomic and the last writer wins.
+# ------------------------------------------------------------
+
+WARM_CACHE_PATH = os.getenv("WARM_CACHE_PATH")
+WARM_CACHE_SAVE_SECONDS = float(os.getenv("WARM_CACHE_SAVE_SECONDS", "60"))
+WARM_CACHE_FORMAT = 1
+
+WARM_CACHE_ENTRIES = Counter(
+    "edi_warm_cache_entries_total",
+    "Persisted cache entries read at startup, by cache (intent, explanation) and result (restored, discarded).",
+    ("cache", "result"),
+)
+
+logger = logging.getLogger(__name__)
+
+_pending_intents: Optional[Tuple[str, List[Any]]] = None   # (dataset hash, entries) not yet restored
+_dataset_hash: Optional[str] = None                         # hash of the installed dataset
+_lock = Lock()
+_stop = Event()
+_saver: Optional[Thread] = None
+
+
+def enabled() -> bool:
+    return bool(WARM_CACHE_PATH)
+
+
+def _read() -> Optional[Dict[str, Any]]:
+    try:
+        with gzip.open(WARM_CACHE_PATH, "rt", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning("ignoring unreadable warm cache %s: %s", WARM_CACHE_PATH, exc)
+        return None
+    if not isinstance(data, dict) or data.get("format") != WARM_CACHE_FORMAT:
+        return None
+    return data
+
+
+def load() -> None:
+    """Restores explanations now and holds intent entries for their dataset."""
+    global _pending_intents
+    if not enabled():
+        return
+    data = _read() or {}
+
+    explanations = data.get("explanations") or {}
+    entries = explanations.get("entries") or []
+    if explanations.get("model") == ai_explainer.MODEL and explanations.get("prompt_version") == ai_explainer.PROMPT_VERSION:
+        WARM_CACHE_ENTRIES.inc(ai_explainer.load_explanations(entries), cache="explanation", result="restored")
+    elif entries:
+        WARM_CACHE_ENTRIES.inc(len(entries), cache="explanation", result="discarded")
+
+    intents = data.get("intents") or {}
+    entries = intents.get("entries") or []
+    if intents.get("classifier") == intent_router.classifier_version() and intents.get("dataset"):
+        with _lock:
+            _pending_intents = (intents["dataset"], entries)
+    elif entries:
+        WARM_CACHE_ENTRIES.inc(len(entries), cache="intent", result="discarded")
+
+
+def restore_intents(content_hash: Optional[str]) -> None:
+    """Called with every newly installed dataset, after the intent cache is cleared."""
+    global _pending_intents, _dataset_hash
+    with _lock:
+        pending, _pending_intents = _pending_intents, None
+        _dataset_hash = content_hash
+    if pending is None:
+        return
+    dataset, entries = pending
+    if content_hash and content_hash == dataset:
+        WARM_CACHE_ENTRIES.inc(intent_router.load_intent_cache(entries), cache="intent", result="restored")
+    else:
+        WARM_CACHE_ENTRIES.inc(len(entries), cache="intent", result="discarded")
+
+
+def save() -> None:
+    if not enabled():
+        return
+    with _lock:
+        pending, current = _pending_intents, _dataset_hash
+    if pending is not None:
+        # Nothing installed since startup: keep the entries still waiting
+        dataset, intents = pending
+    else:
+        dataset, intents = current, intent_router.intent_cache_entries()
+    data = {
+        "format": WARM_CACHE_FORMAT,
+        "saved_at": time.time(),
+        "intents": {
+            "classifier": intent_router.classifier_version(),
+            "dataset": dataset,
+            # Entities are only meaningful for the dataset they were resolved in
+            "entries": intents if dataset else [],
+        },
+        "explanations": {
+            "model": ai_explainer.MODEL,
+            "prompt_version": ai_explainer.PROMPT_VERSION,
+            "entries": ai_explainer.explanation_entries(),
+        },
+    }
+    directory = os.path.dirname(os.path.abspath(WARM_CACHE_PATH))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{WARM_CACHE_PATH}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, WARM_CACHE_PATH)
+
+
+def _save_periodically() -> None:
+    while not _stop.wait(WARM_CACHE_SAVE_SECONDS):
+        try:
+            save()
+        except Exception:
+            logger.exception("saving warm cache to %s failed", WARM_CACHE_PATH)
+
+
+def start() -> None:
+    """App startup: restore the caches, then keep saving them."""
+    global _saver
+    if not enabled():
+        return
+    load()
+    if WARM_CACHE_SAVE_SECONDS > 0 and _saver is None:
+        _stop.clear()
+        _saver = Thread(target=_save_periodically, name="warm-cache", daemon=True)
+        _saver.start()
+
+
+def stop() -> None:
+    """App shutdown: one last save."""
+    global _saver
+    if not enabled():
+        return
+    _stop.set()
+    _saver = None
+    try:
+        save()
+    except Exception:
+        logger.exception("saving warm cache to %s failed", WARM_CACHE_PATH)
@@ -0,0 +1,277 @@
+from functools import lru_cache
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .edi_schema import EDI_SCHEMA, SchemaError
+
+# ------------------------------------------------------------
+# Streaming X12 reader
+# Reads raw interchanges segment by segment (fixed-size reads, one
+# transaction set held at a time) and emits the same all-text chunks as
+# csv_utils.iter_csv_chunks, so X12 uploads go through the same schema
+# validation, row store and indexes as CSV.
+#
+# Field mapping per transaction set:
+#   850  BEG03 PO number, BEG05 date, DTM*002 requested delivery
+#   855  BAK03 PO number, BAK08 ack number, BAK09 ack date, BAK02 → status
+#   856  BSN02 shipment id, BSN03 date, PRF01 PO, DTM*017 expected, DTM*011 shipped
+#   810  BIG02 invoice number, BIG01 date, BIG04 PO, ITD06 net due date
+#   997  one row per AK2; the acknowledged set (GS06 + ST02) is resolved
+#        to a document id seen earlier in the same stream
+# Partner is the first N1 name in the set, else the interchange sender.
+# ------------------------------------------------------------
+
+X12_READ_BYTES = 1 << 20
+X12_CHUNK_ROWS = 50_000
+
+_COLUMNS = [s.name for s in EDI_SCHEMA]
+_ISA_LENGTH = 106
+_ACCEPTED_ACK_CODES = {"AC", "AD", "AE", "AK", "AP"}
+
+Record = Dict[str, Optional[str]]
+
+
+class X12Error(SchemaError):
+    pass
+
+
+def is_x12(fh: BinaryIO) -> bool:
+    start = fh.tell()
+    head = fh.read(16)
+    fh.seek(start)
+    return head.lstrip().startswith(b"ISA")
+
+
+def iter_segments(fh: BinaryIO) -> Iterator[List[str]]:
+    """
+    Yields segments as element lists. Separators come from the first ISA
+    (element separator at byte 3, segment terminator at byte 105).
+    """
+    head = fh.read(_ISA_LENGTH + 16).decode("latin-1")
+    lead = len(head) - len(head.lstrip())
+    isa = head[lead:lead + _ISA_LENGTH]
+    if len(isa) < _ISA_LENGTH or not isa.startswith("ISA"):
+        raise X12Error("Not an X12 interchange: missing or truncated ISA segment")
+    element_sep = isa[3]
+    terminator = isa[105]
+
+    tail = head[lead:]
+    while True:
+        block = fh.read(X12_READ_BYTES)
+        text = tail + block.decode("latin-1")
+        pieces = text.split(terminator)
+        # The last piece may be an incomplete segment; carry it over
+        tail = pieces.pop() if block else ""
+        for piece in pieces:
+            piece = piece.strip()
+            if piece:
+                yield piece.split(element_sep)
+        if not block:
+            return
+
+
+@lru_cache(maxsize=8192)
+def _x12_date(value: Optional[str]) -> Optional[str]:
+    # CCYYMMDD (or YYMMDD) → YYYY-MM-DD; anything else is passed through
+    # unchanged so schema validation reports it
+    if not value:
+        return None
+    if len(value) == 6 and value.isdigit():
+        value = "20" + value
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value
+
+
+def _el(segment: List[str], index: int) -> Optional[str]:
+    # Empty and absent elements are both None. Only ISA pads its elements,
+    # and its values are stripped where they are read.
+    if index < len(segment):
+        return segment[index] or None
+    return None
+
+
+class _Transaction:
+    __slots__ = ("code", "control", "segments")
+
+    def __init__(self, code: str, control: str):
+        self.code = code
+        self.control = control
+        self.segments: List[List[str]] = []
+
+    def first(self, tag: str) -> Optional[List[str]]:
+        for seg in self.segments:
+            if seg[0] == tag:
+                return seg
+        return None
+
+    def dtm(self, *qualifiers: str) -> Optional[str]:
+        for qualifier in qualifiers:
+            for seg in self.segments:
+                if seg[0] == "DTM" and _el(seg, 1) == qualifier:
+                    return _x12_date(_el(seg, 2))
+        return None
+
+    def partner(self, fallback: Optional[str]) -> Optional[str]:
+        n1 = self.first("N1")
+        return (_el(n1, 2) if n1 else None) or fallback
+
+    def remarks(self) -> Optional[str]:
+        nte = self.first("NTE")
+        return _el(nte, 2) if nte else None
+
+
+def _record(t: _Transaction, **fields: Optional[str]) -> Record:
+    row: Record = dict.fromkeys(_COLUMNS)
+    row["transaction_type"] = t.code
+    row["remarks"] = t.remarks()
+    row.update(fields)
+    return row
+
+
+def _po(t: _Transaction, ctx: Dict) -> List[Record]:
+    beg = t.first("BEG") or []
+    return [_record(
+        t,
+        document_id=_el(beg, 3),
+        partner=t.partner(ctx["sender"]),
+        status="created",
+        created_date=_x12_date(_el(beg, 5)) or ctx["group_date"],
+        expected_date=t.dtm("002", "010"),
+    )]
+
+
+def _ack(t: _Transaction, ctx: Dict) -> List[Record]:
+    bak = t.first("BAK") or []
+    accepted = _el(bak, 2) in _ACCEPTED_ACK_CODES
+    ack_date = _x12_date(_el(bak, 9)) or ctx["group_date"]
+    return [_record(
+        t,
+        document_id=_el(bak, 8),
+        related_document_id=_el(bak, 3),
+        partner=t.partner(ctx["sender"]),
+        status="accepted" if accepted else "rejected",
+        created_date=ack_date,
+        expected_date=t.dtm("067", "002") or ack_date,
+        actual_date=ack_date if accepted else None,
+    )]
+
+
+def _asn(t: _Transaction, ctx: Dict) -> List[Record]:
+    bsn = t.first("BSN") or []
+    prf = t.first("PRF") or []
+    return [_record(
+        t,
+        document_id=_el(bsn, 2),
+        related_document_id=_el(prf, 1),
+        partner=t.partner(ctx["sender"]),
+        status="shipped",
+        created_date=_x12_date(_el(bsn, 3)) or ctx["group_date"],
+        expected_date=t.dtm("017", "067"),
+        actual_date=t.dtm("011"),
+    )]
+
+
+def _invoice(t: _Transaction, ctx: Dict) -> List[Record]:
+    big = t.first("BIG") or []
+    itd = t.first("ITD") or []
+    return [_record(
+        t,
+        document_id=_el(big, 2),
+        related_document_id=_el(big, 4),
+        partner=t.partner(ctx["sender"]),
+        status="pending",
+        created_date=_x12_date(_el(big, 1)) or ctx["group_date"],
+        expected_date=_x12_date(_el(itd, 6)),
+    )]
+
+
+def _functional_ack(t: _Transaction, ctx: Dict) -> List[Record]:
+    rows: List[Record] = []
+    group = None
+    pending: Optional[Tuple[str, Optional[str]]] = None   # (acked set control, related id)
+
+    def _emit(status_code: Optional[str]) -> None:
+        control, related = pending
+        number = "".join(ch for ch in (related or "") if ch.isdigit())
+        rows.append(_record(
+            t,
+            document_id=f"FA{number}" if number else f"FA-{t.control}-{control}",
+            related_document_id=related,
+            partner=t.partner(ctx["sender"]),
+            status="rejected" if status_code == "R" else "received",
+            created_date=ctx["group_date"],
+            expected_date=ctx["group_date"],
+            actual_date=ctx["group_date"],
+        ))
+
+    for seg in t.segments:
+        if seg[0] == "AK1":
+            group = _el(seg, 2)
+        elif seg[0] == "AK2":
+            if pending:
+                _emit(None)
+            control = _el(seg, 2) or ""
+            pending = (control, ctx["controls"].get((group, control)))
+        elif seg[0] == "AK5" and pending:
+            _emit(_el(seg, 1))
+            pending = None
+    if pending:
+        _emit(None)
+    return rows
+
+
+_EXTRACTORS: Dict[str, Callable[[_Transaction, Dict], List[Record]]] = {
+    "850": _po,
+    "855": _ack,
+    "856": _asn,
+    "810": _invoice,
+    "997": _functional_ack,
+}
+
+
+def iter_x12_records(fh: BinaryIO) -> Iterator[Record]:
+    ctx: Dict = {"sender": None, "group_date": None, "group_control": None, "controls": {}}
+    current: Optional[_Transaction] = None
+
+    for seg in iter_segments(fh):
+        tag = seg[0]
+        if tag == "ISA":
+            ctx["sender"] = (_el(seg, 6) or "").strip() or None
+        elif tag == "GS":
+            ctx["group_date"] = _x12_date(_el(seg, 4))
+            ctx["group_control"] = _el(seg, 6)
+        elif tag == "ST":
+            current = _Transaction(_el(seg, 1) or "", _el(seg, 2) or "")
+        elif tag == "SE":
+            if current is None:
+                continue
+            extract = _EXTRACTORS.get(current.code)
+            if extract is None:
+                # Unsupported set: emitted so schema validation reports it
+                yield _record(current, document_id=current.control)
+            else:
+                for row in extract(current, ctx):
+                    if row["document_id"]:
+                        # Lets a later 997 resolve GS06 + ST02 to this document
+                        ctx["controls"][(ctx["group_control"], current.control)] = row["document_id"]
+                    yield row
+            current = None
+        elif current is not None:
+            current.segments.append(seg)
+
+
+def iter_x12_chunks(fh: BinaryIO, chunk_rows: int = X12_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Same contract as csv_utils.iter_csv_chunks: all-text DataFrames with
+    the EDI schema columns, missing values as None.
+    """
+    batch: List[Record] = []
+    for record in iter_x12_records(fh):
+        batch.append(record)
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame.from_records(batch, columns=_COLUMNS)
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch, columns=_COLUMNS)
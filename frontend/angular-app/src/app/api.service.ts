@@ -15,7 +15,7 @@ export class ApiService {
   uploadCsv(file: File): Observable<any> {
     const formData = new FormData();
     formData.append('file', file);
-    return this.http.post(`${this.BASE_URL}/upload-csv`, formData);
+    return this.http.post(`${this.BASE_URL}/upload-csv?wait=true`, formData);
   }
 
   askQuestion(question: string): Observable<any> {
@@ -50,7 +50,7 @@ export class ChatInputComponent {
     this.cdr.detectChanges();
 
 
-    this.http.post(`${this.API_URL}/upload-csv`, formData).subscribe({
+    this.http.post(`${this.API_URL}/upload-csv?wait=true`, formData).subscribe({
       next: () => {
         this.zone.run(() => {
           this.messages.push({
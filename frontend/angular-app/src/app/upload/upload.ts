@@ -30,7 +30,7 @@ export class UploadComponent {
     formData.append('file', this.selectedFile);
 
     this.http
-      .post<any>('http://127.0.0.1:8000/upload-csv', formData)
+      .post<any>('http://127.0.0.1:8000/upload-csv?wait=true', formData)
       .subscribe({
         next: (res) => {
           this.message = res.message + ' (Rows: ' + res.rows_loaded + ')';